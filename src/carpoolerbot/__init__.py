@@ -1,3 +1,8 @@
-from carpoolerbot.main import main
+def main() -> None:
+    # The bot is only imported when it runs, so that e.g. the Alembic migrations importing the models start quickly
+    from carpoolerbot.startup import run  # noqa: PLC0415
+
+    run()
+
 
 __all__ = ["main"]
@@ -4,24 +4,68 @@ PTBSQLAlchemyJobStore adapter for apscheduler.
 src: https://github.com/python-telegram-bot/ptbcontrib/tree/main/ptbcontrib/ptb_jobstores
 """
 
+import datetime
+import hashlib
 import logging
+import pickle
+import time
+from collections.abc import Callable, Coroutine, Mapping
 from typing import Any
 
 from apscheduler.job import Job as APSJob
+from apscheduler.jobstores.base import ConflictingIdError, JobLookupError
 from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
-from telegram.ext import Application, Job
+from apscheduler.schedulers.base import BaseScheduler
+from apscheduler.util import datetime_to_utc_timestamp, utc_timestamp_to_datetime
+from sqlalchemy import Column, Connection, Engine, Unicode, and_, bindparam, func, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.sql import ColumnElement
+from telegram.ext import Application, CallbackContext, Job, JobQueue
+
+from carpoolerbot.database.locks import LockNamespace
 
 logger = logging.getLogger(__name__)
 
+type JobCallback = Callable[[Any], Coroutine[Any, Any, Any]]
+
+
+def _state_digest(job_state: bytes) -> bytes:
+    return hashlib.blake2b(job_state, digest_size=16).digest()
+
 
 class PTBSQLAlchemyJobStore(SQLAlchemyJobStore):
-    """Wraps apscheduler.SQLAlchemyJobStore to make :class:`telegram.ext.Job` class storable."""
+    """
+    Wraps apscheduler.SQLAlchemyJobStore to make :class:`telegram.ext.Job` class storable.
+
+    The callbacks found in ``callbacks`` are stored as their key, together with the other attributes of the
+    :class:`telegram.ext.Job`, instead of being pickled. The next run time is only stored in its column, so when a
+    job is updated with no other change, e.g. after every run, only that column is written. The rows written in the
+    original format of the adapter can still be read, and are converted the next time they are updated.
+
+    When the store starts, only the jobs due within ``startup_horizon`` are loaded, the scheduler reads the others
+    when they become due. Bulk loads stream the rows instead of fetching all of them at once.
+
+    The name of the jobs is also stored in an indexed column, so that :meth:`get_jobs_by_name` only reads the jobs
+    with that name. The column is added to the tables created before it, and filled in, when the store starts.
+    """
 
-    def __init__(self, application: Application, **kwargs: Any) -> None:  # noqa: ANN401
+    # Jobs due within this window are loaded when the store starts
+    startup_horizon = datetime.timedelta(hours=1)
+    # Number of rows fetched at a time by the bulk loads
+    load_batch_size = 1000
+
+    def __init__(
+        self,
+        application: Application,
+        callbacks: Mapping[str, JobCallback] | None = None,
+        **kwargs: Any,  # noqa: ANN401
+    ) -> None:
         """
         Args:
             application (:class:`telegram.ext.Application`): Application instance
                 that will be passed to CallbackContext when recreating jobs.
+            callbacks (:obj:`dict`, optional): Job callbacks by the key stored in their
+                place, the keys must not change once the jobs are stored.
             **kwargs (:obj:`dict`): Arbitrary keyword Arguments to be passed to
                 the SQLAlchemyJobStore constructor.
 
@@ -35,35 +79,40 @@ class PTBSQLAlchemyJobStore(SQLAlchemyJobStore):
             )
 
         self.application = application
+        self.callbacks = dict(callbacks or {})
+        self._callback_keys = {callback: key for key, callback in self.callbacks.items()}
+        # Digest of the last state read or written for each job, to tell whether an update changes it
+        self._state_digests: dict[str, bytes] = {}
         super().__init__(**kwargs)
+        self.jobs_t.append_column(Column("name", Unicode(191), index=True))
 
-    @staticmethod
-    def _prepare_job(job: APSJob) -> APSJob:
+    def _encode_job(self, job: APSJob) -> bytes:
         """
-        Erase all unpickable data from telegram.ext.Job.
+        Pickle the state of the job, without the unpickable data of telegram.ext.Job and the next run time.
 
         Args:
             job (:obj:`apscheduler.job`): The job to be processed.
 
         """
-        # make new job which is copy of actual job cause
-        # modifying actual job also modifies jobs in threadpool
-        # executor which are currently running/going to run, and
-        # we'll get incorrect argument instead of CallbackContext.
-        prepped_job = APSJob.__new__(APSJob)
-        prepped_job.__setstate__(job.__getstate__())
-        # Get the tg_job instance in memory
+        # __getstate__ builds a new dict, so the job itself is left untouched
+        state = job.__getstate__()
+        del state["next_run_time"]
+
         tg_job = Job.from_aps_job(job)
-        # Extract relevant information from the job and
-        # store it in the job's args.
-        prepped_job.args = (
-            tg_job.name,
-            tg_job.data,
-            tg_job.chat_id,
-            tg_job.user_id,
-            tg_job.callback,
-        )
-        return prepped_job
+        if (callback_key := self._callback_keys.get(tg_job.callback)) is not None:
+            state["args"] = (
+                {
+                    "callback": callback_key,
+                    "name": tg_job.name,
+                    "data": tg_job.data,
+                    "chat_id": tg_job.chat_id,
+                    "user_id": tg_job.user_id,
+                },
+            )
+        else:
+            state["args"] = (tg_job.name, tg_job.data, tg_job.chat_id, tg_job.user_id, tg_job.callback)
+
+        return pickle.dumps(state, self.pickle_protocol)
 
     def _restore_job(self, job: APSJob) -> APSJob:
         """
@@ -73,22 +122,86 @@ class PTBSQLAlchemyJobStore(SQLAlchemyJobStore):
             job (:obj:`apscheduler.job`): The job to be processed.
 
         """
-        name, data, chat_id, user_id, callback = job.args
-        tg_job = Job(
-            callback=callback,
-            chat_id=chat_id,
-            user_id=user_id,
-            name=name,
-            data=data,
-        )
-        job._modify(  # noqa: SLF001
-            args=(
-                self.application.job_queue,
-                tg_job,
-            ),
-        )
+        match job.args:
+            case ({"callback": callback_key, **attributes},):
+                tg_job = Job(callback=self.callbacks[callback_key], **attributes)
+            case (name, data, chat_id, user_id, callback):
+                tg_job = Job(callback=callback, chat_id=chat_id, user_id=user_id, name=name, data=data)
+            case _:
+                msg = f"Unknown arguments of job {job.id}"
+                raise ValueError(msg)
+
+        # The arguments always fit the signature of Job.run, so the checks of Job._modify are skipped
+        job.args = (self.application.job_queue, tg_job)
         return job
 
+    def start(self, scheduler: BaseScheduler, alias: str) -> None:
+        """Create the table if needed and load the jobs due soon, logging how long it took."""
+        started_at = time.perf_counter()
+        super().start(scheduler, alias)
+        self._add_name_column()
+
+        # Restoring the jobs about to run removes those that cannot be restored before they are due, and records
+        # their state digest, so that the update after their first run only writes the next run time
+        horizon = datetime.datetime.now(datetime.UTC) + self.startup_horizon
+        due_soon = self._get_jobs(self.jobs_t.c.next_run_time <= datetime_to_utc_timestamp(horizon))
+        with self.engine.begin() as connection:
+            total = connection.scalar(select(func.count()).select_from(self.jobs_t))
+
+        logger.info(
+            "Job store started in %.1f ms with %d jobs, %d due in the next %s",
+            (time.perf_counter() - started_at) * 1000,
+            total,
+            len(due_soon),
+            self.startup_horizon,
+        )
+
+    def _add_name_column(self) -> None:
+        """Add the name column to a table created without it, and fill it in from the stored jobs."""
+        if self._has_name_column(self.engine):
+            return
+
+        name_column = self.jobs_t.c.name
+        with self.engine.begin() as connection:
+            if connection.dialect.name == "postgresql":
+                # The replicas starting at the same time add the column one after the other, the others then find it
+                connection.execute(select(func.pg_advisory_xact_lock(LockNamespace.JOB_STORE.value, 0)))
+                if self._has_name_column(connection):
+                    return
+
+            logger.info("Adding the name column to the %s table", self.jobs_t.name)
+            table = connection.dialect.identifier_preparer.format_table(self.jobs_t)
+            column_type = name_column.type.compile(dialect=connection.dialect)
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN name {column_type}"))
+            for index in self.jobs_t.indexes:
+                if name_column in index.columns.values():
+                    index.create(connection)
+
+            # Filled in by the same transaction, so the other replicas never see the column empty
+            names = []
+            for row in connection.execute(select(self.jobs_t.c.id, self.jobs_t.c.job_state)):
+                try:
+                    names.append({"job_id": row.id, "job_name": self._reconstitute_job(row.job_state).name})
+                except Exception:  # noqa: BLE001
+                    # Removed by _get_jobs when it fails to load it
+                    logger.warning('Unable to read the name of job "%s"', row.id)
+
+            if names:
+                update = (
+                    self.jobs_t.update()
+                    .values(name=bindparam("job_name"))
+                    .where(self.jobs_t.c.id == bindparam("job_id"))
+                )
+                connection.execute(update, names)
+
+    def _has_name_column(self, bind: Engine | Connection) -> bool:
+        columns = inspect(bind).get_columns(self.jobs_t.name, schema=self.jobs_t.schema)
+        return any(column["name"] == "name" for column in columns)
+
+    def get_jobs_by_name(self, name: str) -> list[APSJob]:
+        """Return the jobs with the given name, sorted by next run time."""
+        return self._get_jobs(self.jobs_t.c.name == name)
+
     def add_job(self, job: APSJob) -> None:
         """
         Add the given job to this store.
@@ -96,8 +209,20 @@ class PTBSQLAlchemyJobStore(SQLAlchemyJobStore):
         :param Job job: the job to add
         :raises ConflictingIdError: if there is another job in this store with the same ID
         """
-        job = self._prepare_job(job)
-        super().add_job(job)
+        job_state = self._encode_job(job)
+        insert = self.jobs_t.insert().values(
+            id=job.id,
+            next_run_time=datetime_to_utc_timestamp(job.next_run_time),
+            job_state=job_state,
+            name=job.name,
+        )
+        with self.engine.begin() as connection:
+            try:
+                connection.execute(insert)
+            except IntegrityError as exc:
+                raise ConflictingIdError(job.id) from exc
+
+        self._state_digests[job.id] = _state_digest(job_state)
 
     def update_job(self, job: APSJob) -> None:
         """
@@ -106,16 +231,106 @@ class PTBSQLAlchemyJobStore(SQLAlchemyJobStore):
         :param Job job: the job to update
         :raises JobLookupError: if the job does not exist
         """
-        job = self._prepare_job(job)
-        super().update_job(job)
+        job_state = self._encode_job(job)
+        state_digest = _state_digest(job_state)
+        values: dict[str, Any] = {"next_run_time": datetime_to_utc_timestamp(job.next_run_time)}
+        if self._state_digests.get(job.id) != state_digest:
+            values["job_state"] = job_state
+            values["name"] = job.name
+
+        update = self.jobs_t.update().values(**values).where(self.jobs_t.c.id == job.id)
+        with self.engine.begin() as connection:
+            result = connection.execute(update)
+            if result.rowcount == 0:
+                raise JobLookupError(job.id)
+
+        self._state_digests[job.id] = state_digest
+
+    def remove_job(self, job_id: str) -> None:
+        super().remove_job(job_id)
+        self._state_digests.pop(job_id, None)
+
+    def remove_all_jobs(self) -> None:
+        super().remove_all_jobs()
+        self._state_digests.clear()
+
+    def lookup_job(self, job_id: str) -> APSJob | None:
+        selectable = select(self.jobs_t.c.job_state, self.jobs_t.c.next_run_time).where(self.jobs_t.c.id == job_id)
+        with self.engine.begin() as connection:
+            row = connection.execute(selectable).first()
+
+        if not row:
+            return None
+
+        job = self._reconstitute_job(row.job_state)
+        self._restore_next_run_time(job, row.next_run_time)
+        return job
 
     def _reconstitute_job(self, job_state: bytes) -> APSJob:
         """
-        Is called from apscheduler's internals when loading job.
+        Is called when loading job, the next run time is restored from its column afterwards.
 
         Args:
-            job_state (:obj:`str`): String containing pickled job state.
+            job_state (:obj:`bytes`): Pickled job state.
 
         """
-        job: APSJob = super()._reconstitute_job(job_state)
+        state = pickle.loads(job_state)  # noqa: S301
+        job = APSJob.__new__(APSJob)
+        # Only the original format has the next run time in the state
+        state.setdefault("next_run_time", None)
+        job.__setstate__(state)
+        job._scheduler = self._scheduler  # noqa: SLF001
+        job._jobstore_alias = self._alias  # noqa: SLF001
+
+        self._state_digests[job.id] = _state_digest(job_state)
         return self._restore_job(job)
+
+    @staticmethod
+    def _restore_next_run_time(job: APSJob, next_run_time: float | None) -> None:
+        """Set the next run time of the job from its column, which is the source of truth, in the trigger timezone."""
+        job.next_run_time = utc_timestamp_to_datetime(next_run_time)
+        if job.next_run_time and (timezone := getattr(job.trigger, "timezone", None)):
+            job.next_run_time = job.next_run_time.astimezone(timezone)
+
+    def _get_jobs(self, *conditions: ColumnElement[bool]) -> list[APSJob]:
+        jobs = []
+        selectable = select(self.jobs_t.c.id, self.jobs_t.c.job_state, self.jobs_t.c.next_run_time).order_by(
+            self.jobs_t.c.next_run_time,
+        )
+        selectable = selectable.where(and_(*conditions)) if conditions else selectable
+        failed_job_ids = set()
+        with self.engine.begin() as connection:
+            rows = connection.execution_options(yield_per=self.load_batch_size).execute(selectable)
+            for row in rows:
+                try:
+                    job = self._reconstitute_job(row.job_state)
+                    self._restore_next_run_time(job, row.next_run_time)
+                    jobs.append(job)
+                except BaseException:
+                    logger.exception('Unable to restore job "%s" -- removing it', row.id)
+                    failed_job_ids.add(row.id)
+
+            # Remove all the jobs we failed to restore
+            if failed_job_ids:
+                connection.execute(self.jobs_t.delete().where(self.jobs_t.c.id.in_(failed_job_ids)))
+
+        return jobs
+
+
+class PTBSQLAlchemyJobQueue[CCT: CallbackContext[Any, Any, Any, Any]](JobQueue[CCT]):
+    """JobQueue looking the jobs up by name through the index of :class:`PTBSQLAlchemyJobStore`."""
+
+    def get_jobs_by_name(self, name: str) -> tuple[Job[CCT], ...]:
+        if not self.scheduler.running:
+            # The jobs are still pending, not in the job stores yet
+            return super().get_jobs_by_name(name)
+
+        aps_jobs: list[APSJob] = []
+        with self.scheduler._jobstores_lock:  # noqa: SLF001
+            for store in self.scheduler._jobstores.values():  # noqa: SLF001
+                if isinstance(store, PTBSQLAlchemyJobStore):
+                    aps_jobs.extend(store.get_jobs_by_name(name))
+                else:
+                    aps_jobs.extend(job for job in store.get_all_jobs() if job.name == name)
+
+        return tuple(Job.from_aps_job(job) for job in aps_jobs)
@@ -1,3 +1,17 @@
-from carpoolerbot.database.session import Session
+from typing import TYPE_CHECKING, Any
 
-__all__ = ["Session"]
+if TYPE_CHECKING:
+    from carpoolerbot.database.session import AsyncSession, Session
+
+__all__ = ["AsyncSession", "Session"]
+
+
+def __getattr__(name: str) -> Any:  # noqa: ANN401
+    # The engines are only created once a session is needed, the Alembic migrations only import the models
+    if name in __all__:
+        from carpoolerbot.database import session  # noqa: PLC0415
+
+        return getattr(session, name)
+
+    msg = f"module {__name__!r} has no attribute {name!r}"
+    raise AttributeError(msg)
@@ -0,0 +1,49 @@
+from collections.abc import AsyncGenerator
+from contextlib import asynccontextmanager
+from enum import IntEnum
+
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession as AsyncSessionType
+
+from carpoolerbot.database.session import AsyncSession, retry_on_disconnect
+
+
+class LockNamespace(IntEnum):
+    """First key of the Postgres advisory locks taken by the bot, so the different kinds of lock never collide."""
+
+    SCHEDULER = 1
+    CHAT = 2
+    JOB_STORE = 3
+
+
+@asynccontextmanager
+async def chat_lock(chat_id: int) -> AsyncGenerator[None]:
+    """
+    Serialize the read-modify-write sequences on a chat, across the tasks of a process and across replicas.
+
+    The lock is held by a transaction, so it is released when the block exits, even if the connection is lost. The
+    transaction keeps its pooled connection for the whole block, the repository functions called in it need another
+    one, so the block should be short and not wait on the Bot API.
+    """
+    async with await _locked_session(chat_id) as s:
+        yield
+        await s.commit()
+
+
+async def lock_chat(s: AsyncSessionType, chat_id: int) -> None:
+    """Take the lock of the chat until the end of the transaction of the session, see :func:`chat_lock`."""
+    # Chat IDs do not fit the 32 bit key, a collision only makes two chats wait for each other
+    await s.execute(select(func.pg_advisory_xact_lock(LockNamespace.CHAT.value, func.hashtext(str(chat_id)))))
+
+
+@retry_on_disconnect
+async def _locked_session(chat_id: int) -> AsyncSessionType:
+    # Taking the lock is the first statement of the transaction, so it can run again on a new connection
+    s = AsyncSession()
+    try:
+        await s.begin()
+        await lock_chat(s, chat_id)
+    except BaseException:
+        await s.close()
+        raise
+    return s
@@ -2,7 +2,7 @@ from __future__ import annotations
 
 from typing import TYPE_CHECKING, Self
 
-from sqlalchemy import BigInteger, ForeignKey
+from sqlalchemy import BigInteger, ForeignKey, Index
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship
 from sqlalchemy.types import JSON
 
@@ -30,6 +30,8 @@ class TelegramUser(Base):
 
 class WeeklyPoll(Base):
     __tablename__ = "weekly_polls"
+    # Serves both the latest poll of a chat (ordered by message_id) and the lookup by message
+    __table_args__ = (Index("ix_weekly_polls_chat_id_message_id", "chat_id", "message_id"),)
 
     poll_id: Mapped[str] = mapped_column(primary_key=True)
     chat_id: Mapped[int] = mapped_column(BigInteger)
@@ -44,11 +46,13 @@ class WeeklyPoll(Base):
 class PollReport(Base):
     __tablename__ = "poll_reports"
 
-    poll_id: Mapped[str] = mapped_column(ForeignKey("weekly_polls.poll_id"))
+    poll_id: Mapped[str] = mapped_column(ForeignKey("weekly_polls.poll_id"), index=True)
     chat_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     message_id: Mapped[int] = mapped_column(BigInteger, primary_key=True)
     poll_option_id: Mapped[int | None]
     sent_timestamp: Mapped[int]
+    # Hash of the last text and markup sent for this report, used to skip no-op edits.
+    content_hash: Mapped[str | None] = mapped_column(default=None)
 
     weekly_poll: Mapped[WeeklyPoll] = relationship(back_populates="poll_reports")
 
@@ -57,7 +61,8 @@ class PollAnswer(Base):
     __tablename__ = "poll_answers"
 
     user_id: Mapped[int] = mapped_column(BigInteger, ForeignKey("telegram_users.user_id"), primary_key=True)
-    poll_id: Mapped[str] = mapped_column(ForeignKey("weekly_polls.poll_id"), primary_key=True)
+    # The primary key starts with user_id, so it cannot serve the lookups by poll
+    poll_id: Mapped[str] = mapped_column(ForeignKey("weekly_polls.poll_id"), primary_key=True, index=True)
     poll_option_id: Mapped[int] = mapped_column(primary_key=True)
     poll_answer: Mapped[bool]
 
@@ -0,0 +1,143 @@
+from collections import Counter
+from dataclasses import dataclass, field
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from carpoolerbot.database.models import PollAnswer, PollReport, TelegramUser, WeeklyPoll
+from carpoolerbot.database.session import AsyncSession, retry_on_disconnect
+from carpoolerbot.settings import settings
+
+
+@dataclass
+class CachedPoll:
+    """A poll with everything needed to render its reports, the instances are detached from any session."""
+
+    poll: WeeklyPoll
+    users: dict[int, TelegramUser] = field(default_factory=dict)
+    # Keyed by (user_id, poll_option_id)
+    answers: dict[tuple[int, int], PollAnswer] = field(default_factory=dict)
+    # Keyed by (chat_id, message_id)
+    reports: dict[tuple[int, int], PollReport] = field(default_factory=dict)
+
+
+@retry_on_disconnect
+async def _load_poll(poll_id: str) -> CachedPoll | None:
+    async with AsyncSession() as s:
+        poll = await s.scalar(
+            select(WeeklyPoll)
+            .options(selectinload(WeeklyPoll.poll_reports))
+            .options(selectinload(WeeklyPoll.poll_answers).selectinload(PollAnswer.user))
+            .where(WeeklyPoll.poll_id == poll_id),
+        )
+        if poll is None:
+            return None
+
+        cached = CachedPoll(poll=poll)
+        for report in poll.poll_reports:
+            # Resolved from the identity map, so the report can still reach its poll once detached
+            assert report.weekly_poll is poll
+            cached.reports[report.chat_id, report.message_id] = report
+        for answer in poll.poll_answers:
+            cached.users[answer.user_id] = answer.user
+            cached.answers[answer.user_id, answer.poll_option_id] = answer
+
+    return cached
+
+
+class PollStateCache:
+    """
+    Per-poll aggregate of the open polls, kept in sync by the repositories writing through it.
+
+    The cache is only coherent as long as this process is the only one writing to the database, so it is disabled
+    by default.
+    """
+
+    def __init__(self, *, enabled: bool) -> None:
+        self.enabled = enabled
+        self._polls: dict[str, CachedPoll] = {}
+        self._report_polls: dict[tuple[int, int], str] = {}
+        # Number of writes per poll, used to discard loads that raced with a write
+        self._writes: Counter[str] = Counter()
+
+    async def get(self, poll_id: str) -> CachedPoll | None:
+        """Return the cached poll, loading it from the database the first time."""
+        if not self.enabled:
+            return None
+
+        if poll_id not in self._polls:
+            writes_before_load = self._writes[poll_id]
+            cached = await _load_poll(poll_id)
+            if cached is None or not cached.poll.is_open:
+                return cached
+            if self._writes[poll_id] != writes_before_load:
+                # Something changed while loading, the loaded state may already be stale
+                return cached
+
+            self._polls[poll_id] = cached
+            self._report_polls.update(dict.fromkeys(cached.reports, poll_id))
+
+        return self._polls[poll_id]
+
+    async def get_by_report(self, chat_id: int, message_id: int) -> CachedPoll | None:
+        if not self.enabled or (poll_id := self._report_polls.get((chat_id, message_id))) is None:
+            return None
+
+        return await self.get(poll_id)
+
+    def invalidate(self, poll_id: str) -> None:
+        self._writes[poll_id] += 1
+        if cached := self._polls.pop(poll_id, None):
+            for report_key in cached.reports:
+                del self._report_polls[report_key]
+
+    def upsert_answers(self, poll_id: str, user: TelegramUser, answers: dict[int, bool]) -> None:
+        """Apply a vote of the user, ``answers`` maps every option id to whether it was selected."""
+        self._writes[poll_id] += 1
+        if (cached := self._polls.get(poll_id)) is None:
+            return
+
+        if cached_user := cached.users.get(user.user_id):
+            cached_user.user_fullname = user.user_fullname
+        else:
+            cached_user = cached.users[user.user_id] = user
+
+        for poll_option_id, poll_answer in answers.items():
+            if answer := cached.answers.get((user.user_id, poll_option_id)):
+                answer.poll_answer = poll_answer
+            else:
+                answer = PollAnswer(
+                    user_id=user.user_id,
+                    poll_id=poll_id,
+                    poll_option_id=poll_option_id,
+                    poll_answer=poll_answer,
+                    override_answer=None,
+                    driver_id=None,
+                    return_time=0,
+                )
+                answer.user = cached_user
+                cached.answers[user.user_id, poll_option_id] = answer
+
+    def update_answer(self, updated: PollAnswer) -> None:
+        """Copy the columns of an answer just written to the database onto the cached one."""
+        self._writes[updated.poll_id] += 1
+        if (cached := self._polls.get(updated.poll_id)) is None:
+            return
+
+        if answer := cached.answers.get((updated.user_id, updated.poll_option_id)):
+            answer.poll_answer = updated.poll_answer
+            answer.override_answer = updated.override_answer
+            answer.driver_id = updated.driver_id
+            answer.return_time = updated.return_time
+
+    def add_report(self, report: PollReport) -> None:
+        self._writes[report.poll_id] += 1
+        if (cached := self._polls.get(report.poll_id)) is None:
+            return
+
+        report.weekly_poll = cached.poll
+        cached.reports[report.chat_id, report.message_id] = report
+        self._report_polls[report.chat_id, report.message_id] = report.poll_id
+
+
+poll_cache = PollStateCache(enabled=settings.POLL_STATE_CACHE)
@@ -1,23 +1,90 @@
-from sqlalchemy import select
+from collections.abc import Collection
 
-from carpoolerbot.database import Session
+from sqlalchemy import select, update
+from sqlalchemy.sql.dml import ReturningUpdate
+
+from carpoolerbot.database import AsyncSession
+from carpoolerbot.database.locks import lock_chat
 from carpoolerbot.database.models import WeeklyPoll
+from carpoolerbot.database.poll_cache import poll_cache
+from carpoolerbot.database.session import retry_on_disconnect
+from carpoolerbot.metrics import tracked_queries
 
+# Poll options never change once the poll is sent, so their count is cached until the poll is closed.
+_poll_options_count: dict[str, int] = {}
 
-def get_latest_poll(chat_id: int) -> WeeklyPoll | None:
-    with Session() as s:
-        return s.scalars(
-            select(WeeklyPoll).where(WeeklyPoll.chat_id == chat_id).order_by(WeeklyPoll.message_id.desc()),
-        ).first()
+
+def _close_open_polls(chat_id: int) -> ReturningUpdate[tuple[str, int]]:
+    return (
+        update(WeeklyPoll)
+        .where(WeeklyPoll.chat_id == chat_id, WeeklyPoll.is_open)
+        .values(is_open=False)
+        .returning(WeeklyPoll.poll_id, WeeklyPoll.message_id)
+    )
+
+
+@tracked_queries
+async def replace_open_poll(chat_id: int, message_id: int, poll_id: str, options: list[str]) -> list[int]:
+    """
+    Close the open polls of the chat and insert the new one, return the message IDs of the closed polls.
+
+    The chat is locked for the transaction, so polls sent to the chat at the same time leave a single one open.
+    """
+    async with AsyncSession.begin() as s:
+        await lock_chat(s, chat_id)
+        closed_polls = (await s.execute(_close_open_polls(chat_id))).all()
+        s.add(
+            WeeklyPoll(
+                chat_id=chat_id,
+                message_id=message_id,
+                poll_id=poll_id,
+                options=options,
+            ),
+        )
+
+    for closed_poll in closed_polls:
+        poll_cache.invalidate(closed_poll.poll_id)
+        # Closed polls get no more votes
+        _poll_options_count.pop(closed_poll.poll_id, None)
+    _poll_options_count[poll_id] = len(options)
+    return [closed_poll.message_id for closed_poll in closed_polls]
 
 
-def close_poll(chat_id: int, message_id: int) -> None:
-    with Session() as s:
-        poll = s.scalars(
-            select(WeeklyPoll).where(WeeklyPoll.chat_id == chat_id, WeeklyPoll.message_id == message_id),
+@tracked_queries
+@retry_on_disconnect
+async def get_poll_options_count(poll_id: str) -> int | None:
+    if poll_id not in _poll_options_count:
+        async with AsyncSession() as s:
+            options = (await s.scalars(select(WeeklyPoll.options).where(WeeklyPoll.poll_id == poll_id))).first()
+
+        if options is None:
+            return None
+
+        _poll_options_count[poll_id] = len(options)
+
+    return _poll_options_count[poll_id]
+
+
+@tracked_queries
+@retry_on_disconnect
+async def get_latest_poll(chat_id: int) -> WeeklyPoll | None:
+    async with AsyncSession() as s:
+        return (
+            await s.scalars(
+                select(WeeklyPoll).where(WeeklyPoll.chat_id == chat_id).order_by(WeeklyPoll.message_id.desc()).limit(1),
+            )
         ).first()
 
-    if poll:
-        with Session.begin() as s:
-            poll.is_open = False
-            s.add(poll)
+
+@tracked_queries
+@retry_on_disconnect
+async def get_latest_polls(chat_ids: Collection[int]) -> dict[int, WeeklyPoll]:
+    """Return the latest poll of each chat, with a single query for all the chats."""
+    async with AsyncSession() as s:
+        latest_polls = await s.scalars(
+            select(WeeklyPoll)
+            .distinct(WeeklyPoll.chat_id)
+            .where(WeeklyPoll.chat_id.in_(chat_ids))
+            .order_by(WeeklyPoll.chat_id, WeeklyPoll.message_id.desc()),
+        )
+        return {latest_poll.chat_id: latest_poll for latest_poll in latest_polls}
@@ -1,106 +1,210 @@
-from collections.abc import Sequence
+from collections.abc import Collection, Sequence
+from typing import Any
 
 import telegram
-from sqlalchemy import select
-from sqlalchemy.orm import selectinload
+from sqlalchemy import BigInteger, Select, case, literal, select, update
+from sqlalchemy.dialects.postgresql import insert
 
-from carpoolerbot.database import Session
+from carpoolerbot.database import AsyncSession
 from carpoolerbot.database.models import PollAnswer, TelegramUser, WeeklyPoll
-from carpoolerbot.poll_report.types import NotVotedError, ReturnTime
-
+from carpoolerbot.database.poll_cache import poll_cache
+from carpoolerbot.database.repositories.poll import get_poll_options_count
+from carpoolerbot.database.session import retry_on_disconnect
+from carpoolerbot.metrics import tracked_queries
+from carpoolerbot.poll_report.render_cache import report_render_cache
+from carpoolerbot.poll_report.types import LatestPollAnswers, NotVotedError, PollAnswerRow, ReturnTime
+
+
+def _answer_row(answer: PollAnswer) -> PollAnswerRow:
+    return PollAnswerRow(
+        answer.user_id,
+        answer.user.user_fullname,
+        answer.poll_id,
+        answer.poll_option_id,
+        answer.poll_answer,
+        answer.override_answer,
+        answer.driver_id,
+        answer.return_time,
+    )
+
+
+@tracked_queries
+@retry_on_disconnect
+async def get_all_poll_answers(poll_id: str) -> list[PollAnswerRow]:
+    """Return the answers of the poll with the user names, with a single query."""
+    if cached := await poll_cache.get(poll_id):
+        return [_answer_row(answer) for answer in cached.answers.values()]
+
+    stmt = (
+        select(
+            PollAnswer.user_id,
+            TelegramUser.user_fullname,
+            PollAnswer.poll_id,
+            PollAnswer.poll_option_id,
+            PollAnswer.poll_answer,
+            PollAnswer.override_answer,
+            PollAnswer.driver_id,
+            PollAnswer.return_time,
+        )
+        .join(PollAnswer.user)
+        .where(PollAnswer.poll_id == poll_id)
+    )
+
+    async with AsyncSession() as s:
+        rows = (await s.execute(stmt)).all()
+
+    return [PollAnswerRow._make(row) for row in rows]
+
+
+@tracked_queries
+@retry_on_disconnect
+async def get_latest_poll_answers(chat_id: int) -> LatestPollAnswers | None:
+    """Return the latest poll of the chat with its answers and user names, with a single query."""
+    return (await get_latest_polls_answers([chat_id])).get(chat_id)
+
+
+def _latest_poll_ids(chat_ids: Collection[int]) -> Select[tuple[str]]:
+    return (
+        select(WeeklyPoll.poll_id)
+        .distinct(WeeklyPoll.chat_id)
+        .where(WeeklyPoll.chat_id.in_(chat_ids))
+        .order_by(WeeklyPoll.chat_id, WeeklyPoll.message_id.desc())
+    )
+
+
+@tracked_queries
+@retry_on_disconnect
+async def get_latest_polls_answers(chat_ids: Collection[int]) -> dict[int, LatestPollAnswers]:
+    """Return the latest poll of each chat with its answers and user names, with a single query for all the chats."""
+    stmt = (
+        select(
+            WeeklyPoll.chat_id,
+            PollAnswer.user_id,
+            TelegramUser.user_fullname,
+            WeeklyPoll.poll_id,
+            PollAnswer.poll_option_id,
+            PollAnswer.poll_answer,
+            PollAnswer.override_answer,
+            PollAnswer.driver_id,
+            PollAnswer.return_time,
+        )
+        .select_from(WeeklyPoll)
+        .outerjoin(PollAnswer, PollAnswer.poll_id == WeeklyPoll.poll_id)
+        .outerjoin(TelegramUser, TelegramUser.user_id == PollAnswer.user_id)
+        .where(WeeklyPoll.poll_id.in_(_latest_poll_ids(chat_ids)))
+    )
 
-def get_all_poll_answers(poll_id: str) -> Sequence[PollAnswer]:
-    with Session() as s:
-        poll_answers = s.scalars(
-            select(PollAnswer)
-            .options(selectinload(PollAnswer.user))
-            .options(selectinload(PollAnswer.weekly_poll))
-            .where(PollAnswer.poll_id == poll_id),
-        ).all()
+    read_at = report_render_cache.write_count
+    async with AsyncSession() as s:
+        rows = (await s.execute(stmt)).all()
 
-    if not poll_answers:
-        return []
+    latest_polls: dict[int, LatestPollAnswers] = {}
+    for chat_id, *answer_columns in rows:
+        answer = PollAnswerRow._make(answer_columns)
+        latest_poll = latest_polls.setdefault(chat_id, LatestPollAnswers(answer.poll_id, [], read_at))
+        # A poll without answers is still returned once, with all the answer columns set to NULL
+        if answer.user_id is not None:
+            latest_poll.answers.append(answer)
 
-    return poll_answers
+    return latest_polls
 
 
-def upsert_poll_answers(poll_id: str, selected_options: Sequence[int], user: telegram.User) -> None:
-    with Session() as s:
-        poll_options = s.scalars(select(WeeklyPoll.options).where(WeeklyPoll.poll_id == poll_id)).first()
+@tracked_queries
+@retry_on_disconnect
+async def upsert_poll_answers(poll_id: str, selected_options: Sequence[int], user: telegram.User) -> None:
+    options_count = await get_poll_options_count(poll_id)
 
-    if poll_options is None:
+    if options_count is None:
         msg = f"Poll with ID {poll_id} does not exist or has no options."
         raise ValueError(msg)
 
-    answers = [
-        PollAnswer(
-            user_id=user.id,
-            poll_id=poll_id,
-            poll_option_id=option_id,
-            poll_answer=option_id in selected_options,
+    answers = {option_id: option_id in selected_options for option_id in range(options_count)}
+
+    user_upsert = insert(TelegramUser).values(user_id=user.id, user_fullname=user.full_name)
+    user_upsert = user_upsert.on_conflict_do_update(
+        index_elements=[TelegramUser.user_id],
+        set_={TelegramUser.user_fullname: user_upsert.excluded.user_fullname},
+    )
+
+    answers_upsert = insert(PollAnswer).values(
+        [
+            {
+                PollAnswer.user_id: user.id,
+                PollAnswer.poll_id: poll_id,
+                PollAnswer.poll_option_id: option_id,
+                PollAnswer.poll_answer: poll_answer,
+                # The column defaults are not applied to the rows of a multi-row INSERT with a CTE
+                PollAnswer.return_time: ReturnTime.AFTER_WORK,
+            }
+            for option_id, poll_answer in answers.items()
+        ],
+    )
+    # Only the vote itself is replaced, the daily report overrides of the user are kept.
+    answers_upsert = answers_upsert.on_conflict_do_update(
+        index_elements=[PollAnswer.user_id, PollAnswer.poll_id, PollAnswer.poll_option_id],
+        set_={PollAnswer.poll_answer: answers_upsert.excluded.poll_answer},
+    ).add_cte(user_upsert.cte("user_upsert"))
+
+    async with AsyncSession.begin() as s:
+        await s.execute(answers_upsert)
+
+    poll_cache.upsert_answers(poll_id, TelegramUser.from_telegram_user(user), answers)
+    report_render_cache.user_seen(user.id, user.full_name)
+    report_render_cache.answers_changed(poll_id)
+
+
+async def _update_poll_answer(
+    user_id: int,
+    poll_id: str,
+    poll_option_id: int,
+    values: dict[Any, Any],
+) -> PollAnswer:
+    stmt = (
+        update(PollAnswer)
+        .where(
+            PollAnswer.user_id == user_id,
+            PollAnswer.poll_id == poll_id,
+            PollAnswer.poll_option_id == poll_option_id,
         )
-        for option_id in range(len(poll_options))
-    ]
-
-    with Session.begin() as s:
-        s.merge(TelegramUser.from_telegram_user(user))
-        for answer in answers:
-            s.merge(answer)
-
-
-def set_override_answer(user_id: int, poll_id: str, poll_option_id: int, *, value: bool) -> None:
-    with Session() as s:
-        poll_answer = s.scalars(
-            select(PollAnswer).where(
-                PollAnswer.user_id == user_id,
-                PollAnswer.poll_id == poll_id,
-                PollAnswer.poll_option_id == poll_option_id,
-            ),
-        ).first()
-
-    if not poll_answer:
-        raise NotVotedError(user_id, poll_id, poll_option_id)
+        .values(values)
+        .returning(PollAnswer)
+        .execution_options(synchronize_session=False)
+    )
 
-    with Session.begin() as s:
-        poll_answer.override_answer = value
-        s.add(poll_answer)
-
-
-def set_return_time(user_id: int, poll_id: str, poll_option_id: int, return_time: ReturnTime) -> None:
-    with Session() as s:
-        poll_answer = s.scalars(
-            select(PollAnswer).where(
-                PollAnswer.user_id == user_id,
-                PollAnswer.poll_id == poll_id,
-                PollAnswer.poll_option_id == poll_option_id,
-            ),
-        ).first()
+    async with AsyncSession.begin() as s:
+        poll_answer = (await s.scalars(stmt)).first()
 
     if not poll_answer:
         raise NotVotedError(user_id, poll_id, poll_option_id)
 
-    with Session.begin() as s:
-        poll_answer.return_time = return_time
-        s.add(poll_answer)
-
-
-def set_driver_id(user_id: int, poll_id: str, poll_option_id: int, driver_id: int, *, toggle: bool = False) -> None:
-    with Session() as s:
-        poll_answer = s.scalars(
-            select(PollAnswer).where(
-                PollAnswer.user_id == user_id,
-                PollAnswer.poll_id == poll_id,
-                PollAnswer.poll_option_id == poll_option_id,
-            ),
-        ).first()
-
-    if not poll_answer:
-        raise NotVotedError(user_id, poll_id, poll_option_id)
-
-    if toggle and poll_answer.driver_id == driver_id:
-        poll_answer.driver_id = None
-    else:
-        poll_answer.driver_id = driver_id
-
-    with Session.begin() as s:
-        s.add(poll_answer)
+    poll_cache.update_answer(poll_answer)
+    report_render_cache.answers_changed(poll_id, poll_option_id)
+    return poll_answer
+
+
+@tracked_queries
+@retry_on_disconnect
+async def set_override_answer(user_id: int, poll_id: str, poll_option_id: int, *, value: bool) -> PollAnswer:
+    return await _update_poll_answer(user_id, poll_id, poll_option_id, {PollAnswer.override_answer: value})
+
+
+@tracked_queries
+@retry_on_disconnect
+async def set_return_time(user_id: int, poll_id: str, poll_option_id: int, return_time: ReturnTime) -> PollAnswer:
+    return await _update_poll_answer(user_id, poll_id, poll_option_id, {PollAnswer.return_time: return_time})
+
+
+@tracked_queries
+async def set_driver_id(
+    user_id: int,
+    poll_id: str,
+    poll_option_id: int,
+    driver_id: int,
+    *,
+    toggle: bool = False,
+) -> PollAnswer:
+    # The toggle is evaluated by the database, so two overlapping presses cannot lose an update.
+    new_driver_id = (
+        case((PollAnswer.driver_id == driver_id, None), else_=literal(driver_id, BigInteger)) if toggle else driver_id
+    )
+    return await _update_poll_answer(user_id, poll_id, poll_option_id, {PollAnswer.driver_id: new_driver_id})
@@ -1,35 +1,74 @@
 from collections.abc import Sequence
 
-from sqlalchemy import select
+from sqlalchemy import select, update
 from sqlalchemy.orm import selectinload
 from telegram import Message
 
 from carpoolerbot.database.models import PollReport
-from carpoolerbot.database.session import Session
+from carpoolerbot.database.poll_cache import poll_cache
+from carpoolerbot.database.session import AsyncSession, retry_on_disconnect
+from carpoolerbot.metrics import tracked_queries
 from carpoolerbot.poll_report.types import PollNotFoundError
 
 
-def insert_poll_report(poll_id: str, message: Message, *, poll_option_id: int | None) -> None:
-    with Session.begin() as s:
-        s.add(
-            PollReport(
-                poll_id=poll_id,
-                poll_option_id=poll_option_id,
-                chat_id=message.chat_id,
-                message_id=message.id,
-                sent_timestamp=message.date.timestamp(),
-            ),
+@tracked_queries
+async def insert_poll_report(
+    poll_id: str,
+    message: Message,
+    *,
+    poll_option_id: int | None,
+    content_hash: str | None = None,
+) -> None:
+    report = PollReport(
+        poll_id=poll_id,
+        poll_option_id=poll_option_id,
+        chat_id=message.chat_id,
+        message_id=message.id,
+        sent_timestamp=message.date.timestamp(),
+        content_hash=content_hash,
+    )
+    async with AsyncSession.begin() as s:
+        s.add(report)
+
+    poll_cache.add_report(report)
+
+
+@tracked_queries
+@retry_on_disconnect
+async def set_poll_report_content_hash(chat_id: int, message_id: int, content_hash: str) -> None:
+    async with AsyncSession.begin() as s:
+        await s.execute(
+            update(PollReport)
+            .where(PollReport.chat_id == chat_id, PollReport.message_id == message_id)
+            .values(content_hash=content_hash),
         )
 
+    if (cached := await poll_cache.get_by_report(chat_id, message_id)) and (
+        report := cached.reports.get((chat_id, message_id))
+    ):
+        report.content_hash = content_hash
 
-def get_all_poll_reports(poll_id: str) -> Sequence[PollReport]:
-    with Session() as s:
-        return s.scalars(select(PollReport).where(PollReport.poll_id == poll_id)).all()
 
+@tracked_queries
+@retry_on_disconnect
+async def get_all_poll_reports(poll_id: str) -> Sequence[PollReport]:
+    if cached := await poll_cache.get(poll_id):
+        return list(cached.reports.values())
 
-def get_poll_report(chat_id: int, message_id: int) -> PollReport:
-    with Session() as s:
-        report = s.scalar(
+    async with AsyncSession() as s:
+        return (await s.scalars(select(PollReport).where(PollReport.poll_id == poll_id))).all()
+
+
+@tracked_queries
+@retry_on_disconnect
+async def get_poll_report(chat_id: int, message_id: int) -> PollReport:
+    if (cached := await poll_cache.get_by_report(chat_id, message_id)) and (
+        report := cached.reports.get((chat_id, message_id))
+    ):
+        return report
+
+    async with AsyncSession() as s:
+        report = await s.scalar(
             select(PollReport)
             .options(selectinload(PollReport.weekly_poll))
             .where(
@@ -41,4 +80,10 @@ def get_poll_report(chat_id: int, message_id: int) -> PollReport:
     if report is None:
         raise PollNotFoundError(chat_id, message_id)
 
+    # Load the poll of the report, so that the following interactions with the report need no reads
+    if (cached := await poll_cache.get(report.poll_id)) and (
+        cached_report := cached.reports.get((chat_id, message_id))
+    ):
+        return cached_report
+
     return report
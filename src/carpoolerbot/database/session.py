@@ -1,8 +1,76 @@
+import functools
+import logging
+import uuid
+from collections.abc import Callable, Coroutine
+from typing import Any
+
 from sqlalchemy import create_engine
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
 
-from carpoolerbot.settings import settings
+from carpoolerbot.metrics import callable_name
+from carpoolerbot.settings import Settings, settings
+
+logger = logging.getLogger(__name__)
+
+
+def pool_options(config: Settings, *, pre_ping: bool) -> dict[str, Any]:
+    """Arguments of the engines for the configured connection pool."""
+    return {
+        "pool_size": config.DB_POOL_SIZE,
+        "max_overflow": config.DB_MAX_OVERFLOW,
+        "pool_recycle": config.DB_POOL_RECYCLE,
+        "pool_pre_ping": pre_ping,
+    }
+
+
+def async_connect_args(config: Settings) -> dict[str, Any]:
+    """Arguments of the asyncpg connections, PgBouncer can run each transaction on a different server connection."""
+    if not config.DB_PGBOUNCER:
+        return {}
+
+    return {
+        # The statements prepared on a server connection must not be used or named again on another one
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid.uuid4()}__",
+    }
+
 
-engine = create_engine(settings.db_url, pool_pre_ping=True)
+# The sync engine is still needed by the APScheduler job store and by Alembic. The job store has no retry, so its
+# connections are always checked before use.
+engine = create_engine(settings.db_url, **pool_options(settings, pre_ping=True))
 
 Session = sessionmaker(engine)
+
+async_engine = create_async_engine(
+    settings.async_db_url,
+    connect_args=async_connect_args(settings),
+    **pool_options(settings, pre_ping=settings.DB_POOL_PRE_PING),
+)
+
+AsyncSession = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+def retry_on_disconnect[**P, R](func: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, Coroutine[Any, Any, R]]:
+    """
+    Run the repository function again if its connection turns out to be closed, e.g. after a database restart.
+
+    SQLAlchemy discards all the pooled connections opened before the disconnect, so the second attempt runs on a new
+    one. The transaction of the first attempt is rolled back with the lost connection, except in the unlikely case
+    of a connection lost while committing, so only the functions that give the same outcome when run twice can be
+    decorated: the reads and the writes setting given values, not e.g. inserts or toggles.
+    """
+
+    @functools.wraps(func)
+    async def _retry_on_disconnect(*args: P.args, **kwargs: P.kwargs) -> R:
+        try:
+            return await func(*args, **kwargs)
+        except DBAPIError as e:
+            if not e.connection_invalidated:
+                raise
+            logger.warning("Lost the database connection in %s, running it again", callable_name(func))
+            return await func(*args, **kwargs)
+
+    return _retry_on_disconnect
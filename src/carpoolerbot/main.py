@@ -1,20 +1,68 @@
 import importlib.metadata
 import logging
+from typing import TYPE_CHECKING, Any, TypedDict
+from urllib.parse import urlsplit
 
-from telegram import Update
-from telegram.ext import Application
+from telegram.ext import Application, ContextTypes
 
-from carpoolerbot.apscheduler_sqlalchemy_adapter import PTBSQLAlchemyJobStore
-from carpoolerbot.database.session import engine
+from carpoolerbot.apscheduler_sqlalchemy_adapter import PTBSQLAlchemyJobQueue, PTBSQLAlchemyJobStore
+from carpoolerbot.database.session import async_engine, engine
+from carpoolerbot.metrics import instrument_engine, start_metrics_server
 from carpoolerbot.poll import handlers as poll_handlers
 from carpoolerbot.poll_report import handlers as poll_report_handlers
+from carpoolerbot.rate_limiter import TokenBucketRateLimiter
+from carpoolerbot.routing import IndexedRouter, allowed_updates
 from carpoolerbot.scheduling import handlers as scheduling_handlers
-from carpoolerbot.settings import settings
+from carpoolerbot.scheduling.common import JOB_CALLBACKS
+from carpoolerbot.scheduling.leader import SchedulerLeader
+from carpoolerbot.settings import RunMode, Settings, settings
+from carpoolerbot.startup import startup_profile
 from carpoolerbot.utils import version_command_handler
 
+if TYPE_CHECKING:
+    from tornado.httpserver import HTTPServer
+
 logger = logging.getLogger(__name__)
 
 
+class WebhookOptions(TypedDict):
+    listen: str
+    port: int
+    url_path: str
+    webhook_url: str
+    secret_token: str
+    max_connections: int
+
+
+def webhook_options(config: Settings) -> WebhookOptions:
+    """Arguments of :meth:`telegram.ext.Updater.start_webhook` for the configured webhook."""
+    assert config.WEBHOOK_URL
+    assert config.WEBHOOK_SECRET_TOKEN
+
+    return WebhookOptions(
+        listen=config.WEBHOOK_LISTEN,
+        port=config.WEBHOOK_PORT,
+        url_path=urlsplit(config.WEBHOOK_URL).path,
+        webhook_url=config.WEBHOOK_URL,
+        secret_token=config.WEBHOOK_SECRET_TOKEN,
+        max_connections=config.WEBHOOK_MAX_CONNECTIONS,
+    )
+
+
+class ProfiledApplication(Application[Any, Any, Any, Any, Any, Any]):
+    """Application recording its initialization and start in the startup profile."""
+
+    async def initialize(self) -> None:
+        with startup_profile.step("initialize the application"):
+            await super().initialize()
+
+    async def start(self) -> None:
+        # Starts the job queue, and so the job store
+        with startup_profile.step("start the application"):
+            await super().start()
+        startup_profile.log_report()
+
+
 async def _set_commands(app: Application) -> None:
     await app.bot.set_my_commands(
         (
@@ -33,14 +81,62 @@ def main() -> None:
     version = importlib.metadata.version("carpoolerbot")
     logger.info("Starting CarpoolerBot version %s", version)
 
-    application = Application.builder().token(settings.TELEGRAM_TOKEN).post_init(_set_commands).build()
+    instrument_engine(engine)
+    instrument_engine(async_engine.sync_engine)
+
+    job_queue = PTBSQLAlchemyJobQueue[ContextTypes.DEFAULT_TYPE]()
+    # Replicas share the job store, only the leader runs the jobs
+    scheduler_leader = SchedulerLeader(job_queue.scheduler, async_engine) if settings.REPLICA_MODE else None
+    metrics_servers: list[HTTPServer] = []
+
+    async def _post_init(app: Application) -> None:
+        with startup_profile.step("set the commands"):
+            await _set_commands(app)
+        if scheduler_leader:
+            with startup_profile.step("start the scheduler leader"):
+                await scheduler_leader.start()
+        if settings.METRICS_PORT is not None:
+            metrics_servers.append(start_metrics_server(settings.METRICS_PORT, settings.METRICS_LISTEN))
+            logger.info("Serving the metrics on %s:%d", settings.METRICS_LISTEN, settings.METRICS_PORT)
+
+    async def _post_stop(_app: Application) -> None:
+        if scheduler_leader:
+            await scheduler_leader.stop()
+        for server in metrics_servers:
+            server.stop()
+
+    with startup_profile.step("build the application"):
+        application = (
+            Application.builder()
+            .application_class(ProfiledApplication)
+            .token(settings.TELEGRAM_TOKEN)
+            .rate_limiter(TokenBucketRateLimiter())
+            .concurrent_updates(settings.CONCURRENT_UPDATES)
+            .job_queue(job_queue)
+            .post_init(_post_init)
+            .post_stop(_post_stop)
+            .build()
+        )
+
+        assert application.job_queue
+        application.job_queue.scheduler.add_jobstore(
+            PTBSQLAlchemyJobStore(application=application, callbacks=JOB_CALLBACKS, engine=engine),
+        )
 
-    assert application.job_queue
-    application.job_queue.scheduler.add_jobstore(PTBSQLAlchemyJobStore(application=application, engine=engine))
+        handlers = [
+            *poll_handlers.handlers(),
+            *poll_report_handlers.handlers(),
+            *scheduling_handlers.handlers(),
+            version_command_handler(),
+        ]
+        application.add_handler(IndexedRouter(handlers))
 
-    application.add_handlers(poll_handlers.handlers())
-    application.add_handlers(poll_report_handlers.handlers())
-    application.add_handlers(scheduling_handlers.handlers())
-    application.add_handler(version_command_handler())
+    # Updates no handler can match, e.g. plain messages in groups, are not even sent by Telegram
+    update_types = allowed_updates(handlers)
 
-    application.run_polling(allowed_updates=Update.ALL_TYPES)
+    match settings.RUN_MODE:
+        case RunMode.POLLING:
+            application.run_polling(allowed_updates=update_types)
+        case RunMode.WEBHOOK:
+            logger.info("Serving the webhook on %s:%d", settings.WEBHOOK_LISTEN, settings.WEBHOOK_PORT)
+            application.run_webhook(**webhook_options(settings), allowed_updates=update_types)
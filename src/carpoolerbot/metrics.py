@@ -0,0 +1,294 @@
+import contextlib
+import contextvars
+import functools
+import logging
+import math
+import time
+from collections import defaultdict
+from collections.abc import Callable, Coroutine, Generator, Sequence
+from dataclasses import dataclass, field
+from typing import Any
+
+import tornado.httpserver
+import tornado.web
+from sqlalchemy import Engine, event
+
+from carpoolerbot.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the histogram buckets in seconds, the defaults of the Prometheus clients
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+type Labels = tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], labels: Labels, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(labelnames, labels, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == math.inf else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: defaultdict[Labels, float] = defaultdict(float)
+
+    def _labels(self, labels: dict[str, str]) -> Labels:
+        return tuple(labels[name] for name in self.labelnames)
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        self._values[self._labels(labels)] += amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._labels(labels), 0)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        lines.extend(
+            f"{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}"
+            for labels, value in sorted(self._values.items())
+        )
+        return lines
+
+
+class Histogram(Counter):
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, documentation, labelnames)
+        self.buckets = (*sorted(buckets), math.inf)
+        # Observations per bucket, not cumulative, the last one is the +Inf bucket
+        self._bucket_counts: dict[Labels, list[int]] = {}
+        self._sums: defaultdict[Labels, float] = defaultdict(float)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._labels(labels)
+        if key not in self._bucket_counts:
+            self._bucket_counts[key] = [0] * len(self.buckets)
+        self._bucket_counts[key][next(i for i, bound in enumerate(self.buckets) if value <= bound)] += 1
+        self._sums[key] += value
+        self._values[key] += 1
+
+    @contextlib.contextmanager
+    def time(self, **labels: str) -> Generator[None]:
+        """Observe the time spent in the block, even when it raises."""
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started_at, **labels)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, bucket_counts in sorted(self._bucket_counts.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets, bucket_counts, strict=True):
+                cumulative += count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, labels, le)} {cumulative}")
+            formatted_labels = _format_labels(self.labelnames, labels)
+            lines.append(f"{self.name}_sum{formatted_labels} {_format_value(self._sums[labels])}")
+            lines.append(f"{self.name}_count{formatted_labels} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """The metrics of the bot, rendered in the Prometheus text format."""
+
+    def __init__(self) -> None:
+        self._metrics: dict[str, Counter] = {}
+
+    def _register[M: Counter](self, metric: M) -> M:
+        if metric.name in self._metrics:
+            msg = f"Metric {metric.name} is already registered"
+            raise ValueError(msg)
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames))
+
+    def render(self) -> str:
+        return "".join(f"{line}\n" for metric in self._metrics.values() for line in metric.render())
+
+
+registry = MetricsRegistry()
+
+handler_duration = registry.histogram(
+    "carpoolerbot_handler_duration_seconds",
+    "Time spent handling an update or running a job, by callback.",
+    ("handler",),
+)
+db_statements = registry.counter(
+    "carpoolerbot_db_statements_total",
+    "SQL statements executed, by repository function.",
+    ("function",),
+)
+db_statement_duration = registry.histogram(
+    "carpoolerbot_db_statement_duration_seconds",
+    "Time spent executing an SQL statement, by repository function.",
+    ("function",),
+)
+telegram_api_calls = registry.counter(
+    "carpoolerbot_telegram_api_calls_total",
+    "Bot API requests, by method and by the class of the error raised, empty on success.",
+    ("method", "error"),
+)
+
+# Repository function running the current SQL statements, the statements outside of the repositories are "other"
+_repository_function: contextvars.ContextVar[str] = contextvars.ContextVar("repository_function", default="other")
+
+
+@dataclass
+class StatementCount:
+    """SQL statements executed while handling an update or running a job."""
+
+    name: str
+    # Executions of each statement, keyed by the repository function running it and the statement
+    statements: defaultdict[tuple[str, str], int] = field(default_factory=lambda: defaultdict(int))
+
+    @property
+    def total(self) -> int:
+        return sum(self.statements.values())
+
+    def by_function(self) -> dict[str, int]:
+        functions: defaultdict[str, int] = defaultdict(int)
+        for (function, _statement), count in self.statements.items():
+            functions[function] += count
+        return dict(functions)
+
+    def repeated(self, limit: int) -> list[tuple[str, str, int]]:
+        """Return the statements executed more than ``limit`` times, usually a query run once per row (N+1)."""
+        return [
+            (function, statement, count) for (function, statement), count in self.statements.items() if count > limit
+        ]
+
+    def check_budget(self, budget: int, repeated_limit: int) -> None:
+        """Log a warning if more statements than the budget were executed, or if the same one was repeated."""
+        if self.total > budget:
+            logger.warning(
+                "%s executed %d SQL statements, over the budget of %d, by repository function: %s",
+                self.name,
+                self.total,
+                budget,
+                self.by_function(),
+            )
+        for function, statement, count in self.repeated(repeated_limit):
+            logger.warning(
+                "%s executed the same SQL statement %d times in %s, likely an N+1 query: %s",
+                self.name,
+                count,
+                function,
+                statement,
+            )
+
+
+# Statements of the update or job being handled, None outside of them
+_statement_count: contextvars.ContextVar[StatementCount | None] = contextvars.ContextVar(
+    "statement_count",
+    default=None,
+)
+
+
+@contextlib.contextmanager
+def counted_statements(name: str) -> Generator[StatementCount]:
+    """
+    Count the SQL statements executed in the block under the given name, replacing the count of an outer block.
+
+    A warning is logged when SQL_STATEMENT_BUDGET statements are exceeded, or when the same statement is executed
+    more than SQL_REPEATED_STATEMENT_LIMIT times.
+    """
+    count = StatementCount(name)
+    token = _statement_count.set(count)
+    try:
+        yield count
+    finally:
+        _statement_count.reset(token)
+        count.check_budget(settings.SQL_STATEMENT_BUDGET, settings.SQL_REPEATED_STATEMENT_LIMIT)
+
+
+def callable_name(func: Callable[..., object]) -> str:
+    """Name of the callable in the metrics, partials and other callables without a name are shown as their repr."""
+    return getattr(func, "__qualname__", repr(func))
+
+
+@contextlib.contextmanager
+def tracked_handler(name: str) -> Generator[None]:
+    """Time the update handler or job, and count the SQL statements it executes."""
+    with handler_duration.time(handler=name), counted_statements(name):
+        yield
+
+
+def timed_callback[**P](
+    callback: Callable[P, Coroutine[Any, Any, None]],
+) -> Callable[P, Coroutine[Any, Any, None]]:
+    """Track every call of the callback, see :func:`tracked_handler`."""
+
+    @functools.wraps(callback)
+    async def _timed_callback(*args: P.args, **kwargs: P.kwargs) -> None:
+        with tracked_handler(callable_name(callback)):
+            await callback(*args, **kwargs)
+
+    return _timed_callback
+
+
+def tracked_queries[**P, R](func: Callable[P, Coroutine[Any, Any, R]]) -> Callable[P, Coroutine[Any, Any, R]]:
+    """Count the SQL statements executed by the repository function under its name."""
+
+    @functools.wraps(func)
+    async def _tracked_queries(*args: P.args, **kwargs: P.kwargs) -> R:
+        token = _repository_function.set(callable_name(func))
+        try:
+            return await func(*args, **kwargs)
+        finally:
+            _repository_function.reset(token)
+
+    return _tracked_queries
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Count and time the statements executed through the engine, for async engines pass their sync_engine."""
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn: Any, *_args: Any) -> None:  # noqa: ANN401
+        # Overwritten by the next statement, so a failed statement leaves nothing behind
+        conn.info["statement_started_at"] = time.perf_counter()
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn: Any, _cursor: Any, statement: str, *_args: Any) -> None:  # noqa: ANN401
+        duration = time.perf_counter() - conn.info["statement_started_at"]
+        function = _repository_function.get()
+        db_statements.inc(function=function)
+        db_statement_duration.observe(duration, function=function)
+        if statement_count := _statement_count.get():
+            statement_count.statements[function, statement] += 1
+
+
+class _MetricsHandler(tornado.web.RequestHandler):
+    def get(self, *args: str, **kwargs: str) -> None:  # noqa: ARG002
+        self.set_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.write(registry.render())
+
+
+def start_metrics_server(port: int, address: str) -> tornado.httpserver.HTTPServer:
+    """Serve the metrics on ``/metrics``, in the running event loop."""
+    return tornado.web.Application([(r"/metrics", _MetricsHandler)]).listen(port, address)
@@ -3,26 +3,29 @@ import logging
 import telegram.error
 from telegram import Bot
 
-from carpoolerbot.database import Session
 from carpoolerbot.database.models import WeeklyPoll
-from carpoolerbot.database.repositories.poll import close_poll, get_latest_poll
+from carpoolerbot.database.repositories.poll import get_latest_poll, replace_open_poll
 
 logger = logging.getLogger(__name__)
 
 
+async def _stop_poll(bot: Bot, chat_id: int, message_id: int) -> None:
+    try:
+        await bot.stop_poll(chat_id, message_id)
+        await bot.unpin_chat_message(chat_id, message_id)
+    except telegram.error.BadRequest:
+        logger.warning("Failed to stop/unpin poll with message_id %s in chat_id %s", message_id, chat_id)
+
+
 async def send_poll(bot: Bot, chat_id: int) -> None:
-    if latest_poll := get_latest_poll(chat_id):
-        try:
-            await bot.stop_poll(chat_id, latest_poll.message_id)
-            await bot.unpin_chat_message(chat_id, latest_poll.message_id)
-        except telegram.error.BadRequest:
-            logger.warning(
-                "Failed to stop/unpin poll with message_id %s in chat_id %s",
-                latest_poll.message_id,
-                chat_id,
-            )
-
-        close_poll(chat_id, latest_poll.message_id)
+    await send_prefetched_poll(bot, chat_id, await get_latest_poll(chat_id))
+
+
+async def send_prefetched_poll(bot: Bot, chat_id: int, latest_poll: WeeklyPoll | None) -> None:
+    """Stop the latest poll of the chat, already read from the database, and send a new one."""
+    # Only the database update of the polls locks the chat, the Bot API requests would hold its connection meanwhile
+    if latest_poll:
+        await _stop_poll(bot, chat_id, latest_poll.message_id)
 
     options = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
     message = await bot.send_poll(
@@ -35,12 +38,8 @@ async def send_poll(bot: Bot, chat_id: int) -> None:
     await message.pin()
     assert message.poll
 
-    with Session.begin() as s:
-        s.add(
-            WeeklyPoll(
-                chat_id=chat_id,
-                message_id=message.id,
-                poll_id=message.poll.id,
-                options=options,
-            ),
-        )
+    closed_message_ids = await replace_open_poll(chat_id, message.id, message.poll.id, options)
+    # A poll sent to the chat at the same time was closed as well
+    for message_id in closed_message_ids:
+        if not latest_poll or message_id != latest_poll.message_id:
+            await _stop_poll(bot, chat_id, message_id)
@@ -6,7 +6,7 @@ from telegram.ext import CommandHandler, ContextTypes, PollAnswerHandler
 
 from carpoolerbot.database.repositories.poll_answers import upsert_poll_answers
 from carpoolerbot.poll.common import send_poll
-from carpoolerbot.poll_report.common import update_all_poll_reports
+from carpoolerbot.poll_report.refresher import poll_report_refresher
 from carpoolerbot.scheduling.common import jobs_exist
 from carpoolerbot.utils import TypedBaseHandler
 
@@ -44,10 +44,10 @@ async def handle_poll_answer(update: Update, _: ContextTypes.DEFAULT_TYPE) -> No
     answering_user = update.poll_answer.user
 
     logger.info("Handling poll update")
-    upsert_poll_answers(poll_id, update.poll_answer.option_ids, answering_user)
+    await upsert_poll_answers(poll_id, update.poll_answer.option_ids, answering_user)
     logger.info("Updated answers of user %s, poll_id = %s", answering_user.id, poll_id)
 
-    await update_all_poll_reports(update.get_bot(), poll_id)
+    poll_report_refresher.schedule(update.get_bot(), poll_id)
 
 
 def handlers() -> list[TypedBaseHandler]:
@@ -1,42 +1,95 @@
 import asyncio
 import datetime
+import hashlib
+import json
 import logging
 from collections.abc import Sequence
 
 import telegram
 from telegram import InlineKeyboardMarkup, constants
 
-from carpoolerbot.database.models import PollAnswer, PollReport
-from carpoolerbot.database.repositories.poll import get_latest_poll
-from carpoolerbot.database.repositories.poll_answers import get_all_poll_answers
-from carpoolerbot.database.repositories.poll_reports import get_all_poll_reports, insert_poll_report
+from carpoolerbot.database.models import PollReport
+from carpoolerbot.database.repositories.poll_answers import get_all_poll_answers, get_latest_poll_answers
+from carpoolerbot.database.repositories.poll_reports import (
+    get_all_poll_reports,
+    insert_poll_report,
+    set_poll_report_content_hash,
+)
 from carpoolerbot.poll_report.message_serializers import full_poll_result, whos_on_text
-from carpoolerbot.poll_report.types import DAILY_MSG_KEYBOARD_DEFAULT
+from carpoolerbot.poll_report.render_cache import report_render_cache
+from carpoolerbot.poll_report.types import DAILY_MSG_KEYBOARD_DEFAULT, LatestPollAnswers, PollAnswerRow, RenderKey
+from carpoolerbot.settings import settings
 
 logger = logging.getLogger(__name__)
 
+# Last content sent for each report, keyed by (chat_id, message_id), the least recently sent are dropped first. A
+# report that is not here, e.g. after a restart, is edited anyway. In replica mode the persisted
+# PollReport.content_hash is used instead, as other replicas edit the same reports, and it is updated on every edit.
+_report_content_hashes: dict[tuple[int, int], str] = {}
+_MAX_REPORT_CONTENT_HASHES = 4096
 
-async def update_all_poll_reports(bot: telegram.Bot, poll_id: str) -> None:
-    poll_reports = get_all_poll_reports(poll_id)
-    latest_poll = get_all_poll_answers(poll_id)
 
-    for report in poll_reports:
-        await update_poll_report(bot, latest_poll, report)
+def report_content_hash(text: str, reply_markup: InlineKeyboardMarkup | None) -> str:
+    markup = json.dumps(reply_markup.to_dict(), sort_keys=True) if reply_markup else ""
+    return hashlib.sha256(f"{text}\0{markup}".encode()).hexdigest()
+
+
+def remember_report_content(chat_id: int, message_id: int, content_hash: str) -> None:
+    if settings.REPLICA_MODE:
+        return
+
+    report_key = (chat_id, message_id)
+    # Moved to the end, as the most recently sent
+    _report_content_hashes.pop(report_key, None)
+    if len(_report_content_hashes) >= _MAX_REPORT_CONTENT_HASHES:
+        del _report_content_hashes[next(iter(_report_content_hashes))]
+    _report_content_hashes[report_key] = content_hash
+
+
+async def update_all_poll_reports(bot: telegram.Bot, poll_id: str) -> None:
+    poll_reports = await get_all_poll_reports(poll_id)
+    render_key = RenderKey(poll_id, report_render_cache.write_count)
+    latest_poll = await get_all_poll_answers(poll_id)
+
+    # The rate limiter of the bot spaces out the edits, so reports in different chats are edited concurrently.
+    results = await asyncio.gather(
+        *(update_poll_report(bot, latest_poll, report, render_key) for report in poll_reports),
+        return_exceptions=True,
+    )
+    for report, result in zip(poll_reports, results, strict=True):
+        if isinstance(result, Exception):
+            logger.error(
+                "Failed to update poll report with message_id %s in chat_id %s: %s",
+                report.message_id,
+                report.chat_id,
+                result,
+            )
 
 
-async def update_poll_report(bot: telegram.Bot, poll_answers: Sequence[PollAnswer], poll_report: PollReport) -> None:
+async def update_poll_report(
+    bot: telegram.Bot,
+    poll_answers: Sequence[PollAnswerRow],
+    poll_report: PollReport,
+    render_key: RenderKey | None = None,
+) -> None:
     match poll_report.poll_option_id:
         case None:
-            text = full_poll_result(poll_answers)
+            text = full_poll_result(poll_answers, render_key)
             reply_markup = None
 
         case _:
             day_after_sent_report = datetime.datetime.fromtimestamp(poll_report.sent_timestamp) + datetime.timedelta(
                 days=1,
             )
-            text = whos_on_text(poll_answers, day_after_sent_report)
+            text = whos_on_text(poll_answers, day_after_sent_report, render_key)
             reply_markup = InlineKeyboardMarkup(DAILY_MSG_KEYBOARD_DEFAULT)
 
+    report_key = (poll_report.chat_id, poll_report.message_id)
+    content_hash = report_content_hash(text, reply_markup)
+    sent_content_hash = poll_report.content_hash if settings.REPLICA_MODE else _report_content_hashes.get(report_key)
+    if sent_content_hash == content_hash:
+        return
+
     try:
         await bot.edit_message_text(
             chat_id=poll_report.chat_id,
@@ -45,7 +98,6 @@ async def update_poll_report(bot: telegram.Bot, poll_answers: Sequence[PollAnswe
             parse_mode=constants.ParseMode.HTML,
             reply_markup=reply_markup,
         )
-        await asyncio.sleep(0.2)
     except telegram.error.BadRequest as err:
         if (
             err.message != "Message is not modified: specified new message content and reply "
@@ -53,23 +105,41 @@ async def update_poll_report(bot: telegram.Bot, poll_answers: Sequence[PollAnswe
         ):
             raise
 
+    remember_report_content(*report_key, content_hash)
+    if settings.REPLICA_MODE:
+        await set_poll_report_content_hash(*report_key, content_hash)
+
 
 async def send_daily_poll_report(bot: telegram.Bot, chat_id: int) -> None:
-    latest_poll = get_latest_poll(chat_id)
+    await send_prefetched_daily_poll_report(bot, chat_id, await get_latest_poll_answers(chat_id))
+
 
+async def send_prefetched_daily_poll_report(
+    bot: telegram.Bot,
+    chat_id: int,
+    latest_poll: LatestPollAnswers | None,
+) -> None:
+    """Send the daily report of the latest poll of the chat, already read from the database."""
     if not latest_poll:
         await bot.send_message(chat_id, "No Polls found.")
         return
 
-    latest_poll_results = get_all_poll_answers(latest_poll.poll_id)
-
     tomorrow = datetime.datetime.today() + datetime.timedelta(days=1)
+    text = whos_on_text(latest_poll.answers, tomorrow, latest_poll.render_key)
+    reply_markup = InlineKeyboardMarkup(DAILY_MSG_KEYBOARD_DEFAULT)
 
     poll_report = await bot.send_message(
         chat_id,
-        whos_on_text(latest_poll_results, tomorrow),
+        text,
         parse_mode=constants.ParseMode.HTML,
-        reply_markup=InlineKeyboardMarkup(DAILY_MSG_KEYBOARD_DEFAULT),
+        reply_markup=reply_markup,
     )
 
-    insert_poll_report(latest_poll.poll_id, poll_report, poll_option_id=tomorrow.weekday())
+    content_hash = report_content_hash(text, reply_markup)
+    remember_report_content(poll_report.chat_id, poll_report.id, content_hash)
+    await insert_poll_report(
+        latest_poll.poll_id,
+        poll_report,
+        poll_option_id=tomorrow.weekday(),
+        content_hash=content_hash,
+    )
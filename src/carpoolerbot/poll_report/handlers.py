@@ -1,25 +1,33 @@
 import logging
 
 from telegram import Update, constants
-from telegram.ext import CallbackQueryHandler, CommandHandler, ContextTypes
+from telegram.ext import CommandHandler, ContextTypes
 
-from carpoolerbot.database.repositories.poll import get_latest_poll
 from carpoolerbot.database.repositories.poll_answers import (
     get_all_poll_answers,
+    get_latest_poll_answers,
     set_driver_id,
     set_override_answer,
     set_return_time,
 )
 from carpoolerbot.database.repositories.poll_reports import get_poll_report, insert_poll_report
-from carpoolerbot.poll_report.common import send_daily_poll_report, update_poll_report
+from carpoolerbot.poll_report.common import (
+    remember_report_content,
+    report_content_hash,
+    send_daily_poll_report,
+    update_poll_report,
+)
 from carpoolerbot.poll_report.message_serializers import full_poll_result
+from carpoolerbot.poll_report.render_cache import report_render_cache
 from carpoolerbot.poll_report.types import (
     DAILY_MSG_HELP,
     DailyReportCommands,
     NotVotedError,
     PollNotFoundError,
+    RenderKey,
     ReturnTime,
 )
+from carpoolerbot.routing import PrefixCallbackQueryHandler
 from carpoolerbot.utils import TypedBaseHandler
 
 logger = logging.getLogger(__name__)
@@ -28,18 +36,18 @@ logger = logging.getLogger(__name__)
 async def get_poll_results_cmd(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
     assert update.effective_chat
 
-    latest_poll = get_latest_poll(update.effective_chat.id)
+    latest_poll = await get_latest_poll_answers(update.effective_chat.id)
     if not latest_poll:
         await update.effective_chat.send_message("No Polls found.")
         return
 
-    latest_poll_results = get_all_poll_answers(latest_poll.poll_id)
+    text = full_poll_result(latest_poll.answers, latest_poll.render_key)
+
+    poll_report = await update.effective_chat.send_message(text, parse_mode=constants.ParseMode.HTML)
 
-    poll_report = await update.effective_chat.send_message(
-        full_poll_result(latest_poll_results),
-        parse_mode=constants.ParseMode.HTML,
-    )
-    insert_poll_report(latest_poll.poll_id, poll_report, poll_option_id=None)
+    content_hash = report_content_hash(text, None)
+    remember_report_content(poll_report.chat_id, poll_report.id, content_hash)
+    await insert_poll_report(latest_poll.poll_id, poll_report, poll_option_id=None, content_hash=content_hash)
 
 
 async def whos_tomorrow_cmd(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
@@ -57,7 +65,7 @@ async def daily_poll_report_callback_handler(update: Update, _: ContextTypes.DEF
     user_id = update.effective_user.id
 
     try:
-        poll_report = get_poll_report(update.effective_chat.id, update.effective_message.id)
+        poll_report = await get_poll_report(update.effective_chat.id, update.effective_message.id)
     except PollNotFoundError as e:
         logger.error("Poll not found, could be older than the bot's first start: %s", e)
         await update.callback_query.answer("Poll not found.")
@@ -76,19 +84,19 @@ async def daily_poll_report_callback_handler(update: Update, _: ContextTypes.DEF
     try:
         match DailyReportCommands(update.callback_query.data):
             case DailyReportCommands.CONFIRM:
-                set_override_answer(user_id, poll_id, poll_option_id, value=True)
+                await set_override_answer(user_id, poll_id, poll_option_id, value=True)
             case DailyReportCommands.REJECT:
-                set_override_answer(user_id, poll_id, poll_option_id, value=False)
+                await set_override_answer(user_id, poll_id, poll_option_id, value=False)
             case DailyReportCommands.DRIVE:
-                set_driver_id(user_id, poll_id, poll_option_id, user_id, toggle=True)
+                await set_driver_id(user_id, poll_id, poll_option_id, user_id, toggle=True)
             case DailyReportCommands.ALONE:
-                set_driver_id(user_id, poll_id, poll_option_id, -1, toggle=True)
+                await set_driver_id(user_id, poll_id, poll_option_id, -1, toggle=True)
             case DailyReportCommands.WORK:
-                set_return_time(user_id, poll_id, poll_option_id, ReturnTime.AFTER_WORK)
+                await set_return_time(user_id, poll_id, poll_option_id, ReturnTime.AFTER_WORK)
             case DailyReportCommands.DINNER:
-                set_return_time(user_id, poll_id, poll_option_id, ReturnTime.AFTER_DINNER)
+                await set_return_time(user_id, poll_id, poll_option_id, ReturnTime.AFTER_DINNER)
             case DailyReportCommands.LATE:
-                set_return_time(user_id, poll_id, poll_option_id, ReturnTime.LATE)
+                await set_return_time(user_id, poll_id, poll_option_id, ReturnTime.LATE)
             case DailyReportCommands.HELP:
                 await update.callback_query.answer(DAILY_MSG_HELP, show_alert=True)
                 return
@@ -100,14 +108,15 @@ async def daily_poll_report_callback_handler(update: Update, _: ContextTypes.DEF
 
     await update.callback_query.answer()
 
-    await update_poll_report(update.get_bot(), get_all_poll_answers(poll_id), poll_report)
+    render_key = RenderKey(poll_id, report_render_cache.write_count)
+    await update_poll_report(update.get_bot(), await get_all_poll_answers(poll_id), poll_report, render_key)
 
 
 def handlers() -> list[TypedBaseHandler]:
     return [
         CommandHandler("get_poll_results", get_poll_results_cmd),
         CommandHandler("whos_tomorrow", whos_tomorrow_cmd),
-        CallbackQueryHandler(daily_poll_report_callback_handler, lambda x: x in DailyReportCommands),
+        PrefixCallbackQueryHandler("daily_msg", daily_poll_report_callback_handler, lambda x: x in DailyReportCommands),
     ]
 
 
@@ -0,0 +1,59 @@
+import datetime
+import functools
+import importlib.util
+import sys
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from carpoolerbot.settings import settings
+
+if TYPE_CHECKING:
+    from holidays import HolidayBase
+
+
+def _country_holidays_class(country: str) -> type["HolidayBase"]:
+    """
+    Return the holidays class of the country, importing the module of that country only.
+
+    Importing any module of ``holidays.countries`` imports the package, which imports the modules of all the countries,
+    so the module is loaded from its file instead. The other modules it needs are imported as usual.
+    """
+    import holidays  # noqa: PLC0415
+    from holidays.registry import COUNTRIES  # noqa: PLC0415
+
+    # Keyed by module name, the values are the class name followed by the codes of the country
+    entity = next(((module_name, names) for module_name, names in COUNTRIES.items() if country in names[1:]), None)
+    if entity is None:
+        return type(holidays.country_holidays(country))
+    module_name, (class_name, *_codes) = entity
+
+    name = f"holidays.countries.{module_name}"
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(
+            name,
+            Path(holidays.__file__).parent / "countries" / f"{module_name}.py",
+        )
+        assert spec
+        assert spec.loader
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        try:
+            spec.loader.exec_module(module)
+        except BaseException:
+            del sys.modules[name]
+            raise
+
+    return getattr(sys.modules[name], class_name)
+
+
+@functools.cache
+def _holidays_of_year(year: int) -> dict[datetime.date, str]:
+    """Expand the holidays of the configured country for the given year, once per process."""
+    country_holidays = _country_holidays_class(settings.HOLIDAYS_COUNTRY)(subdiv=settings.HOLIDAYS_SUBDIV, years=year)
+    return dict(country_holidays.items())
+
+
+def get_holiday(day: datetime.date) -> str | None:
+    """Return the name of the holiday on the given day, if any."""
+    # A datetime does not hash like the date it falls on
+    return _holidays_of_year(day.year).get(datetime.date(day.year, day.month, day.day))
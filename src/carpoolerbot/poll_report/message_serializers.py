@@ -1,17 +1,14 @@
 import calendar
 import datetime
-from collections import defaultdict
 from collections.abc import Sequence
 
-import holidays
+from carpoolerbot.poll_report.holiday_calendar import get_holiday
+from carpoolerbot.poll_report.render_cache import report_render_cache
+from carpoolerbot.poll_report.types import PollAnswerRow, RenderKey, ReturnTime
 
-from carpoolerbot.database.models import PollAnswer
-from carpoolerbot.poll_report.types import ReturnTime
-from carpoolerbot.settings import settings
 
-
-def _format_user_answer(answer: PollAnswer) -> str:
-    formatted_user = answer.user.user_fullname
+def _format_user_answer(answer: PollAnswerRow) -> str:
+    formatted_user = answer.user_fullname
 
     if answer.driver_id == answer.user_id:
         formatted_user = f"🚗 {formatted_user}"
@@ -29,14 +26,22 @@ def _format_user_answer(answer: PollAnswer) -> str:
     return f'<a href="tg://user?id={answer.user_id}">{formatted_user}</a>'
 
 
-def _sorted_positive_answers(answers: Sequence[PollAnswer]) -> list[PollAnswer]:
+def _sorted_positive_answers(answers: Sequence[PollAnswerRow]) -> list[PollAnswerRow]:
     return sorted(
         filter(lambda x: x.poll_answer and x.override_answer is not False, answers),
-        key=lambda x: x.user.user_fullname.lower(),
+        key=lambda x: x.user_fullname.lower(),
     )
 
 
-def whos_on_text(poll_answers: Sequence[PollAnswer], day: datetime.datetime) -> str:
+def _render_users(day_answers: Sequence[PollAnswerRow]) -> str:
+    return "\n".join(_format_user_answer(answer) for answer in _sorted_positive_answers(day_answers))
+
+
+def whos_on_text(
+    poll_answers: Sequence[PollAnswerRow],
+    day: datetime.datetime,
+    render_key: RenderKey | None = None,
+) -> str:
     day_of_the_week = day.weekday()
 
     if day_of_the_week in (calendar.SATURDAY, calendar.SUNDAY):
@@ -44,31 +49,24 @@ def whos_on_text(poll_answers: Sequence[PollAnswer], day: datetime.datetime) ->
 
     day_name = calendar.day_name[day_of_the_week]
 
-    if holiday := holidays.country_holidays(settings.HOLIDAYS_COUNTRY, subdiv=settings.HOLIDAYS_SUBDIV).get(day):
+    if holiday := get_holiday(day):
         return f"I hope you are on holiday tomorrow, happy <b>{holiday}</b>!"
 
-    relevant_answers = _sorted_positive_answers(poll_answers)
-    relevant_answers = list(filter(lambda x: x.poll_option_id == day_of_the_week, relevant_answers))
-    if len(relevant_answers) == 0:
+    formatted_users = report_render_cache.section(render_key, day_of_the_week, poll_answers, _render_users)
+    if not formatted_users:
         return f"Nobody is going on site on <b>{day_name}</b>."
 
-    formatted_users = [_format_user_answer(answer) for answer in relevant_answers]
-
     return f"""\
 On <b>{day_name}</b> is going on site:
 
-{"\n".join(formatted_users)}"""
-
+{formatted_users}"""
 
-def full_poll_result(poll_answers: Sequence[PollAnswer]) -> str:
-    grouped_answers: dict[int, list[PollAnswer]] = defaultdict(list)
-    for answer in poll_answers:
-        grouped_answers[answer.poll_option_id].append(answer)
 
+def full_poll_result(poll_answers: Sequence[PollAnswerRow], render_key: RenderKey | None = None) -> str:
     formatted_days_answers = [
         f"<b>{calendar.day_name[day]}</b>:\n"
-        + "\n".join(_format_user_answer(answer) for answer in _sorted_positive_answers(answers))
-        for day, answers in sorted(grouped_answers.items(), key=lambda x: x[0])
+        + report_render_cache.section(render_key, day, poll_answers, _render_users)
+        for day in report_render_cache.days(render_key, poll_answers)
     ]
 
     return "\n\n".join(formatted_days_answers)
@@ -0,0 +1,48 @@
+import asyncio
+import logging
+
+import telegram
+
+from carpoolerbot.metrics import counted_statements
+from carpoolerbot.poll_report.common import update_all_poll_reports
+from carpoolerbot.settings import settings
+
+logger = logging.getLogger(__name__)
+
+
+class PollReportRefresher:
+    """
+    Coalesce the refreshes of the reports of a poll.
+
+    Every poll has at most one refresh task, which waits for ``delay`` seconds before re-rendering the reports, so
+    all the answers received in the meantime are collapsed into a single edit per report. Answers arriving while
+    the reports are being edited trigger one more round once the current one is done.
+    """
+
+    def __init__(self, delay: float) -> None:
+        self.delay = delay
+        self._dirty: set[str] = set()
+        self._tasks: dict[str, asyncio.Task[None]] = {}
+
+    def schedule(self, bot: telegram.Bot, poll_id: str) -> None:
+        """Mark the reports of the poll as outdated, without waiting for them to be refreshed."""
+        self._dirty.add(poll_id)
+        if poll_id not in self._tasks:
+            self._tasks[poll_id] = asyncio.create_task(self._run(bot, poll_id), name=f"refresh_poll_reports_{poll_id}")
+
+    async def _run(self, bot: telegram.Bot, poll_id: str) -> None:
+        try:
+            while poll_id in self._dirty:
+                await asyncio.sleep(self.delay)
+                self._dirty.discard(poll_id)
+                try:
+                    # Counted apart from the statements of the update that scheduled the refresh
+                    with counted_statements("refresh_poll_reports"):
+                        await update_all_poll_reports(bot, poll_id)
+                except Exception:
+                    logger.exception("Failed to refresh the reports of poll_id %s", poll_id)
+        finally:
+            del self._tasks[poll_id]
+
+
+poll_report_refresher = PollReportRefresher(settings.POLL_REPORT_REFRESH_DELAY)
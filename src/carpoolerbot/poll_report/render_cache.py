@@ -0,0 +1,105 @@
+from collections.abc import Callable, Sequence
+from dataclasses import dataclass, field
+
+from carpoolerbot.poll_report.types import PollAnswerRow, RenderKey
+from carpoolerbot.settings import settings
+
+
+@dataclass
+class _CachedPoll:
+    # The days with answers and the rendered users of each day, with the write they are up to date with
+    days: tuple[int, list[int]] | None = None
+    sections: dict[int, tuple[int, str]] = field(default_factory=dict)
+
+
+class ReportRenderCache:
+    """
+    Rendered day sections of the poll reports, shared by the full report and the daily reports of a poll.
+
+    The repositories count every write to the answers of a poll, either to those of a single day or to all of them,
+    and a day section is only rendered again when its day was written since. The answers read before a write must not
+    be cached after it, so :attr:`write_count` is taken before reading them and passed along in the RenderKey.
+
+    Only the writes of this process are counted, so the cache is disabled in replica mode.
+    """
+
+    def __init__(self, *, enabled: bool, max_polls: int = 256) -> None:
+        self.enabled = enabled
+        self.max_polls = max_polls
+        self.write_count = 0
+        # Keyed by (poll_id, day), with the day set to None for the writes to every day of the poll
+        self._last_writes: dict[tuple[str, int | None], int] = {}
+        # Last write of the polls dropped from the cache, the default of the polls without writes of their own
+        self._evicted_write = 0
+        self._polls: dict[str, _CachedPoll] = {}
+        self._user_names: dict[int, str] = {}
+
+    def answers_changed(self, poll_id: str, day: int | None = None) -> None:
+        """Count a write to the answers of the given day of the poll, or of all of its days."""
+        self.write_count += 1
+        self._last_writes[poll_id, day] = self.write_count
+
+    def user_seen(self, user_id: int, user_fullname: str) -> None:
+        """Drop the cached sections if the user changed name, they could be in the sections of any poll."""
+        if self._user_names.get(user_id, user_fullname) != user_fullname:
+            self._evicted_write = self.write_count
+            self._last_writes.clear()
+            self._polls.clear()
+            self._user_names.clear()
+
+    def _last_write(self, poll_id: str, day: int | None = None) -> int:
+        last_write = self._last_writes.get((poll_id, None), self._evicted_write)
+        return max(last_write, self._last_writes.get((poll_id, day), 0)) if day is not None else last_write
+
+    def _cached_poll(self, poll_id: str) -> _CachedPoll:
+        if poll_id not in self._polls:
+            if len(self._polls) >= self.max_polls:
+                evicted_poll_id = next(iter(self._polls))
+                del self._polls[evicted_poll_id]
+                for key in [key for key in self._last_writes if key[0] == evicted_poll_id]:
+                    self._evicted_write = max(self._evicted_write, self._last_writes.pop(key))
+            self._polls[poll_id] = _CachedPoll()
+
+        return self._polls[poll_id]
+
+    def days(self, key: RenderKey | None, answers: Sequence[PollAnswerRow]) -> list[int]:
+        """Return the days with answers, in order."""
+        if not self.enabled or key is None:
+            return sorted({answer.poll_option_id for answer in answers})
+
+        # Only the writes to every day can add answers, the others update the existing ones
+        last_write = self._last_write(key.poll_id)
+        cached_poll = self._polls.get(key.poll_id)
+        if cached_poll and cached_poll.days and cached_poll.days[0] == last_write:
+            return cached_poll.days[1]
+
+        days = sorted({answer.poll_option_id for answer in answers})
+        if last_write <= key.read_at:
+            self._cached_poll(key.poll_id).days = (last_write, days)
+        return days
+
+    def section(
+        self,
+        key: RenderKey | None,
+        day: int,
+        answers: Sequence[PollAnswerRow],
+        render: Callable[[list[PollAnswerRow]], str],
+    ) -> str:
+        """Return the section of the day, rendered from the answers of that day only when it changed."""
+        if not self.enabled or key is None:
+            return render([answer for answer in answers if answer.poll_option_id == day])
+
+        last_write = self._last_write(key.poll_id, day)
+        cached_poll = self._polls.get(key.poll_id)
+        if cached_poll and (cached := cached_poll.sections.get(day)) and cached[0] == last_write:
+            return cached[1]
+
+        day_answers = [answer for answer in answers if answer.poll_option_id == day]
+        text = render(day_answers)
+        if last_write <= key.read_at:
+            self._cached_poll(key.poll_id).sections[day] = (last_write, text)
+            self._user_names.update((answer.user_id, answer.user_fullname) for answer in day_answers)
+        return text
+
+
+report_render_cache = ReportRenderCache(enabled=not settings.REPLICA_MODE)
@@ -1,4 +1,5 @@
 from enum import IntEnum, StrEnum
+from typing import NamedTuple
 
 from telegram import InlineKeyboardButton
 
@@ -22,6 +23,37 @@ class ReturnTime(IntEnum):
     LATE = 2
 
 
+class PollAnswerRow(NamedTuple):
+    """Answer of a user together with the user name, the immutable record the reports are rendered from."""
+
+    user_id: int
+    user_fullname: str
+    poll_id: str
+    poll_option_id: int
+    poll_answer: bool
+    override_answer: bool | None
+    driver_id: int | None
+    return_time: int
+
+
+class RenderKey(NamedTuple):
+    """Poll the answers to render belong to, and the write count of the render cache taken before reading them."""
+
+    poll_id: str
+    read_at: int
+
+
+class LatestPollAnswers(NamedTuple):
+    poll_id: str
+    answers: list[PollAnswerRow]
+    # Write count of the render cache taken before reading the answers
+    read_at: int
+
+    @property
+    def render_key(self) -> RenderKey:
+        return RenderKey(self.poll_id, self.read_at)
+
+
 DAILY_MSG_KEYBOARD_DEFAULT = [
     [
         InlineKeyboardButton("✅", callback_data=DailyReportCommands.CONFIRM),
@@ -0,0 +1,164 @@
+import asyncio
+import contextlib
+import logging
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+from telegram.error import RetryAfter, TelegramError
+from telegram.ext import BaseRateLimiter
+
+from carpoolerbot.metrics import telegram_api_calls
+
+logger = logging.getLogger(__name__)
+
+type JSONDict = dict[str, Any]
+type RequestCallback = Callable[..., Coroutine[Any, Any, bool | JSONDict | list[JSONDict]]]
+
+
+class TokenBucket:
+    """Asyncio token bucket, waiters are served in FIFO order."""
+
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated_at = asyncio.get_running_loop().time()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    def is_idle(self) -> bool:
+        """Whether the bucket is full, so dropping it is the same as keeping it."""
+        loop = asyncio.get_running_loop()
+        self._refill(loop.time())
+        return not self._lock.locked() and self._tokens >= self.capacity and self._paused_until <= loop.time()
+
+    def pause(self, seconds: float) -> None:
+        """Hand out no tokens for the given amount of seconds."""
+        self._paused_until = max(self._paused_until, asyncio.get_running_loop().time() + seconds)
+
+    async def acquire(self) -> None:
+        loop = asyncio.get_running_loop()
+        async with self._lock:
+            while True:
+                now = loop.time()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+
+                self._refill(now)
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class TokenBucketRateLimiter(BaseRateLimiter[int]):
+    """
+    Throttle the requests to the Bot API with a global and a per-chat token bucket.
+
+    The defaults follow the limits documented in the Bot API FAQ: about 30 messages per second overall, one message
+    per second in a private chat and 20 messages per minute in a group. Requests to different chats only share the
+    global bucket, so they are sent concurrently. When a :exc:`~telegram.error.RetryAfter` is raised, the bucket of
+    the chat (or the global one for requests without a chat) is paused and the request is retried up to
+    ``max_retries`` times, a different amount can be passed per request through ``rate_limit_args``.
+    """
+
+    # Prune the idle per-chat buckets once there are more than this many.
+    _MAX_IDLE_CHAT_BUCKETS = 512
+
+    def __init__(
+        self,
+        *,
+        overall_max_rate: float = 30,
+        private_chat_max_rate: float = 1,
+        group_max_rate: float = 20 / 60,
+        group_burst: float = 20,
+        max_retries: int = 3,
+    ) -> None:
+        self._overall_max_rate = overall_max_rate
+        self._private_chat_max_rate = private_chat_max_rate
+        self._group_max_rate = group_max_rate
+        self._group_burst = group_burst
+        self._max_retries = max_retries
+        self._overall_bucket: TokenBucket | None = None
+        self._chat_buckets: dict[int | str, TokenBucket] = {}
+
+    async def initialize(self) -> None:
+        self._overall_bucket = TokenBucket(self._overall_max_rate, self._overall_max_rate)
+
+    async def shutdown(self) -> None:
+        self._overall_bucket = None
+        self._chat_buckets.clear()
+
+    def _get_chat_bucket(self, chat_id: int | str) -> TokenBucket:
+        if chat_id not in self._chat_buckets:
+            if len(self._chat_buckets) > self._MAX_IDLE_CHAT_BUCKETS:
+                for key in [key for key, bucket in self._chat_buckets.items() if bucket.is_idle()]:
+                    del self._chat_buckets[key]
+
+            # Negative IDs are groups and string IDs can only be channel or supergroup usernames
+            is_group = isinstance(chat_id, str) or chat_id < 0
+            self._chat_buckets[chat_id] = (
+                TokenBucket(self._group_max_rate, self._group_burst)
+                if is_group
+                else TokenBucket(self._private_chat_max_rate, 1)
+            )
+
+        return self._chat_buckets[chat_id]
+
+    async def process_request(  # noqa: PLR0913
+        self,
+        callback: RequestCallback,
+        args: Any,  # noqa: ANN401
+        kwargs: dict[str, Any],
+        endpoint: str,
+        data: dict[str, Any],
+        rate_limit_args: int | None,
+    ) -> bool | JSONDict | list[JSONDict]:
+        assert self._overall_bucket, "The rate limiter must be initialized first"
+
+        max_retries = rate_limit_args if rate_limit_args is not None else self._max_retries
+
+        chat_id = data.get("chat_id")
+        # In case the chat ID of a user or group is passed as string
+        if chat_id is not None:
+            with contextlib.suppress(ValueError, TypeError):
+                chat_id = int(chat_id)
+
+        # Requests not directed to a chat, e.g. answering a callback query, are only subject to flood control
+        chat_bucket = self._get_chat_bucket(chat_id) if isinstance(chat_id, int | str) else None
+
+        retries = 0
+        while True:
+            if chat_bucket:
+                await chat_bucket.acquire()
+                await self._overall_bucket.acquire()
+
+            try:
+                result = await callback(*args, **kwargs)
+            except RetryAfter as exc:
+                telegram_api_calls.inc(method=endpoint, error=type(exc).__name__)
+                if retries == max_retries:
+                    logger.error("Rate limit hit on %s after maximum of %d retries", endpoint, max_retries)
+                    raise
+
+                retries += 1
+                # Same as AIORateLimiter, avoids the deprecation warning of the int valued RetryAfter.retry_after
+                retry_after = exc._retry_after.total_seconds() + 0.1  # noqa: SLF001
+                logger.info("Rate limit hit on %s, retrying after %.1f seconds", endpoint, retry_after)
+                if chat_bucket:
+                    chat_bucket.pause(retry_after)
+                else:
+                    self._overall_bucket.pause(retry_after)
+                    await asyncio.sleep(retry_after)
+            except TelegramError as exc:
+                telegram_api_calls.inc(method=endpoint, error=type(exc).__name__)
+                raise
+            else:
+                telegram_api_calls.inc(method=endpoint, error="")
+                return result
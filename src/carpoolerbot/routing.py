@@ -0,0 +1,137 @@
+from collections import defaultdict
+from collections.abc import Callable, Coroutine, Sequence
+from typing import Any, cast
+
+from telegram import MessageEntity, Update
+from telegram.ext import (
+    Application,
+    BaseHandler,
+    CallbackQueryHandler,
+    CommandHandler,
+    ContextTypes,
+    PollAnswerHandler,
+)
+
+from carpoolerbot.metrics import callable_name, tracked_handler
+from carpoolerbot.utils import TypedBaseHandler
+
+# The update types each kind of handler can match, CommandHandler accepts edited messages by default
+_HANDLER_UPDATE_TYPES: dict[type[TypedBaseHandler], tuple[str, ...]] = {
+    CommandHandler: (Update.MESSAGE, Update.EDITED_MESSAGE),
+    CallbackQueryHandler: (Update.CALLBACK_QUERY,),
+    PollAnswerHandler: (Update.POLL_ANSWER,),
+}
+
+type CheckResult = tuple[TypedBaseHandler, object]
+
+
+def _handler_update_types(handler: TypedBaseHandler) -> tuple[str, ...]:
+    for handler_type, update_types in _HANDLER_UPDATE_TYPES.items():
+        if isinstance(handler, handler_type):
+            return update_types
+
+    msg = f"Unknown update types for {type(handler).__name__}"
+    raise TypeError(msg)
+
+
+def allowed_updates(handlers: Sequence[TypedBaseHandler]) -> list[str]:
+    """Return the update types to subscribe to, so that Telegram only sends the updates the handlers can match."""
+    update_types = {update_type for handler in handlers for update_type in _handler_update_types(handler)}
+    return sorted(update_types)
+
+
+async def _routed_callback(_update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Do nothing, the router hands the updates to the callbacks of the routed handlers instead."""
+
+
+def callback_data_prefix(data: str) -> str:
+    return data.split(":", 1)[0]
+
+
+class PrefixCallbackQueryHandler(CallbackQueryHandler[ContextTypes.DEFAULT_TYPE, None]):
+    """CallbackQueryHandler for the callback data of the form ``<prefix>:...``, indexed by the prefix in the router."""
+
+    def __init__(
+        self,
+        prefix: str,
+        callback: Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]],
+        pattern: Callable[[object], bool] | None = None,
+    ) -> None:
+        def _has_prefix(data: object) -> bool:
+            return isinstance(data, str) and callback_data_prefix(data) == prefix
+
+        super().__init__(callback, pattern or _has_prefix)
+        self.prefix = prefix
+
+
+class IndexedRouter(BaseHandler[Update, ContextTypes.DEFAULT_TYPE, Any]):
+    """
+    Dispatch the updates to the given handlers, finding the candidates with a dictionary lookup.
+
+    PTB checks every handler of a group in turn, the router instead looks the candidates up by command name, callback
+    data prefix or update type, and only checks those. As with the handlers of a group, the first candidate matching the
+    update handles it. Only commands, prefixed callback queries and poll answers can be indexed.
+    """
+
+    def __init__(self, handlers: Sequence[TypedBaseHandler]) -> None:
+        super().__init__(_routed_callback)
+        self._commands: defaultdict[str, list[TypedBaseHandler]] = defaultdict(list)
+        self._callback_prefixes: defaultdict[str, list[TypedBaseHandler]] = defaultdict(list)
+        self._poll_answers: list[TypedBaseHandler] = []
+
+        for handler in handlers:
+            if not handler.block:
+                msg = "Non-blocking handlers cannot be routed"
+                raise ValueError(msg)
+
+            match handler:
+                case CommandHandler():
+                    for command in handler.commands:
+                        self._commands[command].append(handler)
+                case PrefixCallbackQueryHandler():
+                    self._callback_prefixes[handler.prefix].append(handler)
+                case PollAnswerHandler():
+                    self._poll_answers.append(handler)
+                case _:
+                    msg = f"{type(handler).__name__} cannot be indexed"
+                    raise TypeError(msg)
+
+    def _candidates(self, update: Update) -> Sequence[TypedBaseHandler]:
+        if update.poll_answer:
+            return self._poll_answers
+
+        if update.callback_query:
+            data = update.callback_query.data
+            return self._callback_prefixes.get(callback_data_prefix(data), ()) if data else ()
+
+        message = update.message or update.edited_message
+        if message and message.text and message.text.startswith("/") and message.entities:
+            entity = message.entities[0]
+            if entity.type == MessageEntity.BOT_COMMAND and entity.offset == 0:
+                command = message.text[1 : entity.length].split("@", 1)[0].lower()
+                return self._commands.get(command, ())
+
+        return ()
+
+    def check_update(self, update: object) -> CheckResult | None:
+        if not isinstance(update, Update):
+            return None
+
+        for handler in self._candidates(update):
+            check_result = handler.check_update(update)
+            if check_result is not None and check_result is not False:
+                return handler, check_result
+
+        return None
+
+    async def handle_update(
+        self,
+        update: Update,
+        application: Application[Any, ContextTypes.DEFAULT_TYPE, Any, Any, Any, Any],
+        check_result: object,
+        context: ContextTypes.DEFAULT_TYPE,
+    ) -> Any:  # noqa: ANN401
+        # Returned by check_update for the updates it matches
+        handler, handler_check_result = cast("CheckResult", check_result)
+        with tracked_handler(callable_name(handler.callback)):
+            return await handler.handle_update(update, application, handler_check_result, context)
@@ -0,0 +1,78 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+
+import telegram
+
+from carpoolerbot.metrics import callable_name, counted_statements
+
+logger = logging.getLogger(__name__)
+
+
+class BatchDispatcher[T]:
+    """
+    Run the scheduled sends of the chats due at the same time as a single batch.
+
+    The job of every chat submits its chat and waits for the send. The first submission opens a batch, which collects
+    the chats submitted during the next ``window`` seconds, reads what all of them need with a single ``prefetch``
+    call, then runs the sends concurrently, at most ``concurrency`` at a time, while the rate limiter of the bot
+    spaces out the requests. The failure of a send is only raised in the job of its chat.
+    """
+
+    def __init__(
+        self,
+        prefetch: Callable[[list[int]], Awaitable[T]],
+        send: Callable[[telegram.Bot, int, T], Awaitable[None]],
+        window: float,
+        concurrency: int,
+    ) -> None:
+        self.prefetch = prefetch
+        self.send = send
+        self.window = window
+        self.concurrency = concurrency
+        # Outcome of the send of each chat of the batch still collecting chats
+        self._batch: dict[int, asyncio.Future[None]] | None = None
+        self._tasks: set[asyncio.Task[None]] = set()
+
+    async def submit(self, bot: telegram.Bot, chat_id: int) -> None:
+        """Add the chat to the next batch, and wait for its send."""
+        if self._batch is None:
+            self._batch = {}
+            task = asyncio.create_task(self._run(bot, self._batch), name="scheduled_send_batch")
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+        if chat_id not in self._batch:
+            self._batch[chat_id] = asyncio.get_running_loop().create_future()
+
+        # A cancelled job must not cancel the send shared with the other jobs of the same chat
+        await asyncio.shield(self._batch[chat_id])
+
+    async def _run(self, bot: telegram.Bot, batch: dict[int, asyncio.Future[None]]) -> None:
+        await asyncio.sleep(self.window)
+        self._batch = None
+
+        chat_ids = list(batch)
+        try:
+            # The batch runs in the context of the job opening it, its statements are counted apart from the job's
+            with counted_statements(f"{callable_name(self.prefetch)}_batch"):
+                prefetched = await self.prefetch(chat_ids)
+        except Exception as exc:  # noqa: BLE001
+            for outcome in batch.values():
+                outcome.set_exception(exc)
+            return
+
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def _send(chat_id: int) -> None:
+            async with semaphore:
+                try:
+                    with counted_statements(callable_name(self.send)):
+                        await self.send(bot, chat_id, prefetched)
+                except Exception as exc:  # noqa: BLE001
+                    batch[chat_id].set_exception(exc)
+                else:
+                    batch[chat_id].set_result(None)
+
+        await asyncio.gather(*(_send(chat_id) for chat_id in chat_ids))
+        logger.info("Ran a batch of %d scheduled sends", len(chat_ids))
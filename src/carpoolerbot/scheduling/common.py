@@ -1,10 +1,18 @@
 import logging
+from collections.abc import Mapping
 
 import telegram
 from telegram.ext import CallbackContext, ContextTypes
 
-from carpoolerbot.poll.common import send_poll
-from carpoolerbot.poll_report.common import send_daily_poll_report
+from carpoolerbot.database.models import WeeklyPoll
+from carpoolerbot.database.repositories.poll import get_latest_polls
+from carpoolerbot.database.repositories.poll_answers import get_latest_polls_answers
+from carpoolerbot.metrics import timed_callback
+from carpoolerbot.poll.common import send_prefetched_poll
+from carpoolerbot.poll_report.common import send_prefetched_daily_poll_report
+from carpoolerbot.poll_report.types import LatestPollAnswers
+from carpoolerbot.scheduling.batching import BatchDispatcher
+from carpoolerbot.settings import settings
 
 logger = logging.getLogger(__name__)
 
@@ -28,15 +36,51 @@ def remove_job_if_exists(name: str, context: ContextTypes.DEFAULT_TYPE) -> bool:
     return True
 
 
+async def _send_daily_poll_report(
+    bot: telegram.Bot,
+    chat_id: int,
+    latest_polls: Mapping[int, LatestPollAnswers],
+) -> None:
+    await send_prefetched_daily_poll_report(bot, chat_id, latest_polls.get(chat_id))
+
+
+async def _send_poll(bot: telegram.Bot, chat_id: int, latest_polls: Mapping[int, WeeklyPoll]) -> None:
+    await send_prefetched_poll(bot, chat_id, latest_polls.get(chat_id))
+
+
+# The jobs of all the chats due at the same time are sent as a batch, see BatchDispatcher.
+daily_report_dispatcher = BatchDispatcher(
+    get_latest_polls_answers,
+    _send_daily_poll_report,
+    settings.SCHEDULED_SEND_BATCH_WINDOW,
+    settings.scheduled_send_concurrency,
+)
+poll_dispatcher = BatchDispatcher(
+    get_latest_polls,
+    _send_poll,
+    settings.SCHEDULED_SEND_BATCH_WINDOW,
+    settings.scheduled_send_concurrency,
+)
+
+
+@timed_callback
 async def send_whos_tomorrow_callback(context: CallbackContextType) -> None:
     assert context.job
     assert context.job.chat_id
 
-    await send_daily_poll_report(context.bot, context.job.chat_id)
+    await daily_report_dispatcher.submit(context.bot, context.job.chat_id)
 
 
+@timed_callback
 async def send_poll_callback(context: CallbackContextType) -> None:
     assert context.job
     assert context.job.chat_id
 
-    await send_poll(context.bot, context.job.chat_id)
+    await poll_dispatcher.submit(context.bot, context.job.chat_id)
+
+
+# Stored by the job store in place of the callbacks, the keys must not change once jobs are scheduled.
+JOB_CALLBACKS = {
+    "send_whos_tomorrow": send_whos_tomorrow_callback,
+    "send_poll": send_poll_callback,
+}
@@ -5,6 +5,7 @@ from apscheduler.triggers.cron import CronTrigger
 from telegram import Update
 from telegram.ext import CommandHandler, ContextTypes
 
+from carpoolerbot.database.locks import chat_lock
 from carpoolerbot.scheduling.common import (
     jobs_exist,
     remove_job_if_exists,
@@ -22,14 +23,6 @@ async def enable_schedule_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE
     assert update.effective_message
     assert update.effective_user
 
-    chat_id = update.effective_message.chat_id
-    if jobs_exist(str(chat_id), context):
-        await update.effective_chat.send_message(
-            "Schedule is already present, delete it first.",
-            disable_notification=True,
-        )
-        return
-
     parser = argparse.ArgumentParser(exit_on_error=False, add_help=False)
     parser.add_argument("poll_hour", type=int)
     parser.add_argument("tomorrow_message_hour", type=int)
@@ -43,18 +36,32 @@ async def enable_schedule_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE
         )
         return
 
-    context.job_queue.run_custom(
-        send_poll_callback,
-        {"trigger": CronTrigger(day_of_week="sun", hour=args.poll_hour)},
-        chat_id=chat_id,
-        name=str(chat_id),
-    )
-    context.job_queue.run_custom(
-        send_whos_tomorrow_callback,
-        {"trigger": CronTrigger(day_of_week="sun, mon-thu", hour=args.tomorrow_message_hour)},
-        chat_id=chat_id,
-        name=str(chat_id),
-    )
+    chat_id = update.effective_message.chat_id
+    # Checking for the schedule and adding it must not interleave with another command in the same chat, the answer
+    # is sent once the lock is released
+    async with chat_lock(chat_id):
+        already_present = jobs_exist(str(chat_id), context)
+        if not already_present:
+            context.job_queue.run_custom(
+                send_poll_callback,
+                {"trigger": CronTrigger(day_of_week="sun", hour=args.poll_hour)},
+                chat_id=chat_id,
+                name=str(chat_id),
+            )
+            context.job_queue.run_custom(
+                send_whos_tomorrow_callback,
+                {"trigger": CronTrigger(day_of_week="sun, mon-thu", hour=args.tomorrow_message_hour)},
+                chat_id=chat_id,
+                name=str(chat_id),
+            )
+
+    if already_present:
+        await update.effective_chat.send_message(
+            "Schedule is already present, delete it first.",
+            disable_notification=True,
+        )
+        return
+
     message_text = f"""\
 Schedule has been enabled with the following settings:
 
@@ -70,7 +77,9 @@ async def disable_schedule_cmd(update: Update, context: ContextTypes.DEFAULT_TYP
     assert update.effective_user
 
     chat_id = update.effective_message.chat_id
-    job_removed = remove_job_if_exists(str(chat_id), context)
+    # Not interleaved with an enable_schedule_cmd adding the jobs of the chat
+    async with chat_lock(chat_id):
+        job_removed = remove_job_if_exists(str(chat_id), context)
     message_text = "Schedule has been disabled." if job_removed else "Schedule was not enabled."
     logger.info("User %s disabled schedule in chat %s", update.effective_user.id, chat_id)
     await update.effective_chat.send_message(message_text, disable_notification=True)
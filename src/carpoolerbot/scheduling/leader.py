@@ -0,0 +1,120 @@
+import asyncio
+import contextlib
+import logging
+
+from apscheduler.schedulers.base import STATE_PAUSED, BaseScheduler
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncEngine
+
+from carpoolerbot.database.locks import LockNamespace
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerLeader:
+    """
+    Only run the scheduled jobs in the replica holding a Postgres advisory lock.
+
+    Every replica shares the same job store, so they can all add and remove jobs, but the scheduler stays paused
+    unless the replica holds the lock. The lock is bound to a connection kept open by the leader, when the leader
+    stops or dies Postgres releases it and another replica takes over. The leader also wakes its scheduler up at every
+    check, to pick up the jobs added by the other replicas.
+
+    When the server drops the connection of the leader, e.g. on a restart, another replica can take the lock before the
+    leader notices. The leader pauses its scheduler once a check fails or takes longer than half ``check_interval``,
+    so within one and a half ``check_interval`` of losing the lock, and a new leader only resumes its scheduler
+    ``takeover_delay`` seconds after taking the lock, so that the jobs never run in both.
+    """
+
+    def __init__(self, scheduler: BaseScheduler, engine: AsyncEngine, check_interval: float = 15) -> None:
+        self.scheduler = scheduler
+        self.engine = engine
+        self.check_interval = check_interval
+        self.takeover_delay = 2 * check_interval
+        self._connection: AsyncConnection | None = None
+        self._task: asyncio.Task[None] | None = None
+
+    @property
+    def is_leader(self) -> bool:
+        return self._connection is not None
+
+    async def start(self) -> None:
+        """Start the scheduler paused and keep trying to become the leader in the background."""
+        if not self.scheduler.running:
+            self.scheduler.start(paused=True)
+        else:
+            self.scheduler.pause()
+
+        self._task = asyncio.create_task(self._run(), name="scheduler_leader")
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+            self._task = None
+
+        await self._step_down()
+
+    async def _try_acquire(self) -> None:
+        connection = await self.engine.connect()
+        try:
+            acquired = await connection.scalar(
+                select(func.pg_try_advisory_lock(LockNamespace.SCHEDULER.value, 0)),
+            )
+            # Without this the connection would sit idle in transaction
+            await connection.commit()
+        except Exception:
+            await connection.close()
+            raise
+
+        if not acquired:
+            await connection.close()
+            return
+
+        self._connection = connection
+        logger.info("Became the scheduler leader, running the scheduled jobs in %s seconds", self.takeover_delay)
+        # Wait for a previous leader that lost the lock without noticing it to pause
+        await asyncio.sleep(self.takeover_delay)
+        await self._check_alive()
+
+    async def _check_alive(self) -> None:
+        assert self._connection
+        try:
+            async with asyncio.timeout(self.check_interval / 2):
+                await self._connection.scalar(select(1))
+                await self._connection.commit()
+        except Exception:
+            logger.exception("Lost the connection holding the scheduler lock")
+            await self._step_down()
+            return
+
+        if self.scheduler.state == STATE_PAUSED:
+            self.scheduler.resume()
+        else:
+            self.scheduler.wakeup()
+
+    async def _step_down(self) -> None:
+        if self._connection is None:
+            return
+
+        if self.scheduler.running:
+            self.scheduler.pause()
+        connection, self._connection = self._connection, None
+        # Closing the connection releases the lock, even when unlocking fails
+        with contextlib.suppress(Exception):
+            await connection.invalidate()
+        await connection.close()
+        logger.info("Stopped being the scheduler leader")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                if self.is_leader:
+                    await self._check_alive()
+                else:
+                    await self._try_acquire()
+            except Exception:
+                logger.exception("Failed to check the scheduler leadership")
+
+            await asyncio.sleep(self.check_interval)
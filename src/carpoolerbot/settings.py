@@ -1,7 +1,15 @@
-from pydantic import Field, computed_field
+from enum import StrEnum
+from typing import Self
+
+from pydantic import Field, computed_field, model_validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
+class RunMode(StrEnum):
+    POLLING = "polling"
+    WEBHOOK = "webhook"
+
+
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file=".env")
 
@@ -10,14 +18,98 @@ class Settings(BaseSettings):
     DB_NAME: str = Field(default=...)
     DB_USERNAME: str = Field(default=...)
     DB_PASSWORD: str = Field(default=...)
+    DB_PORT: int = Field(default=5432)
+
+    # Connections kept open by each engine, and the extra ones opened under load and closed once returned to the pool.
+    DB_POOL_SIZE: int = Field(default=5)
+    DB_MAX_OVERFLOW: int = Field(default=10)
+    # Seconds after which a pooled connection is replaced, keep it below the idle timeout of the server or proxy.
+    # -1 keeps the connections open.
+    DB_POOL_RECYCLE: int = Field(default=-1)
+    # Check the pooled connections of the bot with a round trip before every use. Without it a repository function
+    # finding its connection closed runs again on a new connection.
+    DB_POOL_PRE_PING: bool = Field(default=False)
+    # Connect through PgBouncer in transaction pooling mode, which does not support the prepared statements of asyncpg.
+    DB_PGBOUNCER: bool = Field(default=False)
 
     HOLIDAYS_COUNTRY: str = Field(default=...)
     HOLIDAYS_SUBDIV: str | None = Field(default=None)
 
+    # Seconds during which poll answers are collapsed into a single refresh of the poll reports.
+    POLL_REPORT_REFRESH_DELAY: float = Field(default=2.0)
+    # Keep the open polls in memory, only safe when a single bot process uses the database.
+    POLL_STATE_CACHE: bool = Field(default=False)
+
+    # Several bot processes share the database, e.g. behind a load balancer in webhook mode. Only one of them runs
+    # the scheduled jobs and the in-memory state that the other replicas could make stale is not used.
+    REPLICA_MODE: bool = Field(default=False)
+
+    # Receive the updates with long polling or by serving a webhook.
+    RUN_MODE: RunMode = Field(default=RunMode.POLLING)
+    # Public URL Telegram posts the updates to, the local server listens on the same path.
+    WEBHOOK_URL: str | None = Field(default=None)
+    WEBHOOK_LISTEN: str = Field(default="0.0.0.0")  # noqa: S104
+    WEBHOOK_PORT: int = Field(default=8080)
+    # Sent by Telegram with every update, requests without it are rejected.
+    WEBHOOK_SECRET_TOKEN: str | None = Field(default=None)
+    # Maximum number of simultaneous connections Telegram opens to the webhook.
+    WEBHOOK_MAX_CONNECTIONS: int = Field(default=40)
+    # Number of updates handled at the same time, with 1 they are handled one after the other in arrival order.
+    CONCURRENT_UPDATES: int = Field(default=1)
+
+    # Seconds during which the scheduled sends due at the same time are collected into a single batch.
+    SCHEDULED_SEND_BATCH_WINDOW: float = Field(default=1.0)
+    # Number of scheduled sends of a batch in flight at the same time, the rate limiter still spaces them out. Capped
+    # below DB_POOL_SIZE + DB_MAX_OVERFLOW, so the updates handled meanwhile still get a database connection.
+    SCHEDULED_SEND_CONCURRENCY: int = Field(default=10)
+
+    # Port of the Prometheus metrics endpoint, served on /metrics, disabled when not set.
+    METRICS_PORT: int | None = Field(default=None)
+    METRICS_LISTEN: str = Field(default="127.0.0.1")
+    # SQL statements an update or a job can execute before a warning listing them by repository function is logged.
+    SQL_STATEMENT_BUDGET: int = Field(default=15)
+    # Executions of the same SQL statement by an update or a job before it is logged as a likely N+1 query.
+    SQL_REPEATED_STATEMENT_LIMIT: int = Field(default=3)
+
+    @model_validator(mode="after")
+    def _check_replica_settings(self) -> Self:
+        if self.REPLICA_MODE and self.POLL_STATE_CACHE:
+            msg = "POLL_STATE_CACHE cannot be enabled when REPLICA_MODE is"
+            raise ValueError(msg)
+        return self
+
+    @model_validator(mode="after")
+    def _check_pgbouncer_settings(self) -> Self:
+        # The scheduler lock is held by a database session, which transaction pooling does not keep
+        if self.REPLICA_MODE and self.DB_PGBOUNCER:
+            msg = "REPLICA_MODE cannot be enabled when DB_PGBOUNCER is"
+            raise ValueError(msg)
+        return self
+
+    @model_validator(mode="after")
+    def _check_webhook_settings(self) -> Self:
+        if self.RUN_MODE == RunMode.WEBHOOK and not (self.WEBHOOK_URL and self.WEBHOOK_SECRET_TOKEN):
+            msg = "WEBHOOK_URL and WEBHOOK_SECRET_TOKEN are required when RUN_MODE is webhook"
+            raise ValueError(msg)
+        return self
+
+    @computed_field
+    @property
+    def scheduled_send_concurrency(self) -> int:
+        # Every send holds at most one pooled connection at a time
+        return max(1, min(self.SCHEDULED_SEND_CONCURRENCY, self.DB_POOL_SIZE + self.DB_MAX_OVERFLOW - 1))
+
     @computed_field
     @property
     def db_url(self) -> str:
-        return f"postgresql://{self.DB_USERNAME}:{self.DB_PASSWORD}@{self.DB_HOST}:5432/{self.DB_NAME}"
+        return f"postgresql://{self.DB_USERNAME}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+
+    @computed_field
+    @property
+    def async_db_url(self) -> str:
+        return (
+            f"postgresql+asyncpg://{self.DB_USERNAME}:{self.DB_PASSWORD}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
+        )
 
 
 settings = Settings()
@@ -0,0 +1,74 @@
+import argparse
+import contextlib
+import importlib
+import logging
+import time
+from collections.abc import Generator, Sequence
+
+logger = logging.getLogger(__name__)
+
+# The heaviest dependencies of the bot then its own modules, imported in this order with --startup-profile so that the
+# time of each one only covers the modules it adds
+PROFILED_IMPORTS = (
+    "carpoolerbot.settings",
+    "sqlalchemy.orm",
+    "carpoolerbot.database.session",
+    "telegram.ext",
+    "carpoolerbot.metrics",
+    "carpoolerbot.apscheduler_sqlalchemy_adapter",
+    "carpoolerbot.poll.handlers",
+    "carpoolerbot.poll_report.handlers",
+    "carpoolerbot.scheduling.handlers",
+    "carpoolerbot.main",
+)
+
+
+class StartupProfile:
+    """Durations of the steps of the startup of the bot, only recorded with --startup-profile."""
+
+    def __init__(self) -> None:
+        self.enabled = False
+        self.started_at = time.perf_counter()
+        self.steps: list[tuple[str, float]] = []
+
+    @contextlib.contextmanager
+    def step(self, name: str) -> Generator[None]:
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                self.steps.append((name, time.perf_counter() - started_at))
+
+    def report(self) -> str:
+        width = max((len(name) for name, _ in self.steps), default=0)
+        lines = [f"{name:<{width}} {duration * 1e3:8.1f} ms" for name, duration in self.steps]
+        lines.append(f"{'started in':<{width}} {(time.perf_counter() - self.started_at) * 1e3:8.1f} ms")
+        return "\n".join(lines)
+
+    def log_report(self) -> None:
+        if self.enabled:
+            logger.info("Startup profile:\n%s", self.report())
+
+
+startup_profile = StartupProfile()
+
+
+def run(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(prog="carpoolerbot", description="Interactive Telegram bot to do carpooling.")
+    parser.add_argument(
+        "--startup-profile",
+        action="store_true",
+        help="log the time spent importing and initializing each part of the bot once it has started",
+    )
+    args = parser.parse_args(argv)
+
+    startup_profile.enabled = args.startup_profile
+    if startup_profile.enabled:
+        for module in PROFILED_IMPORTS:
+            with startup_profile.step(f"import {module}"):
+                importlib.import_module(module)
+
+    from carpoolerbot.main import main  # noqa: PLC0415
+
+    main()
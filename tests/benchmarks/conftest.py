@@ -0,0 +1,16 @@
+import timeit
+from collections.abc import Callable
+
+import pytest
+
+type Measure = Callable[[Callable[[], object]], float]
+
+
+@pytest.fixture
+def measure() -> Measure:
+    """Return the best time in seconds of a single call of the given function, over a few repetitions."""
+
+    def _measure(func: Callable[[], object], number: int = 100, repeat: int = 5) -> float:
+        return min(timeit.repeat(func, number=number, repeat=repeat)) / number
+
+    return _measure
@@ -0,0 +1,373 @@
+import argparse
+import asyncio
+import itertools
+import logging
+import math
+import os
+import random
+from collections import Counter
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from fake_bot_api import BOT_USER, POLLING_METHODS, FakeBotApiServer, JSONDict
+from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from carpoolerbot.database.models import Base
+from carpoolerbot.database.session import AsyncSession, pool_options
+from carpoolerbot.poll import handlers as poll_handlers
+from carpoolerbot.poll_report import handlers as poll_report_handlers
+from carpoolerbot.poll_report.refresher import poll_report_refresher
+from carpoolerbot.poll_report.types import DailyReportCommands
+from carpoolerbot.rate_limiter import TokenBucketRateLimiter
+from carpoolerbot.routing import IndexedRouter, allowed_updates
+from carpoolerbot.scheduling import handlers as scheduling_handlers
+from carpoolerbot.settings import settings
+from carpoolerbot.utils import TypedBaseHandler, version_command_handler
+
+logger = logging.getLogger(__name__)
+
+# Buttons of the daily report changing the answer of the user who presses them
+BUTTONS = (DailyReportCommands.CONFIRM, DailyReportCommands.REJECT, DailyReportCommands.DRIVE, DailyReportCommands.LATE)
+FIRST_CHAT_ID = -1001000000000
+
+
+@dataclass
+class Phase:
+    """Latencies in seconds and Bot API requests of the updates of one kind."""
+
+    name: str
+    events: int = 0
+    latencies: list[float] = field(default_factory=list)
+    calls: Counter[str] = field(default_factory=Counter)
+
+    def percentile(self, q: float) -> float:
+        latencies = sorted(self.latencies)
+        return latencies[max(0, math.ceil(q * len(latencies)) - 1)] if latencies else math.nan
+
+    def calls_per_event(self) -> float:
+        return self.calls.total() / self.events if self.events else math.nan
+
+    def format(self) -> str:
+        percentiles = ", ".join(f"p{q * 100:g} {self.percentile(q) * 1e3:.0f} ms" for q in (0.5, 0.9, 0.99, 1))
+        calls = ", ".join(f"{method} {count}" for method, count in self.calls.most_common())
+        return (
+            f"{self.name}: {self.events} updates, {self.events - len(self.latencies)} without an answer\n"
+            f"  latency: {percentiles}\n"
+            f"  API calls per update: {self.calls_per_event():.2f} ({calls})"
+        )
+
+
+@dataclass
+class LoadReport:
+    chats: int
+    users: int
+    votes: Phase
+    presses: Phase
+    rate_limited: Counter[str]
+
+    def format(self) -> str:
+        return "\n".join(
+            (
+                f"{self.chats} chats x {self.users} users",
+                self.votes.format(),
+                self.presses.format(),
+                f"429 injected: {self.rate_limited.total()}",
+            ),
+        )
+
+
+def _handlers() -> list[TypedBaseHandler]:
+    return [
+        *poll_handlers.handlers(),
+        *poll_report_handlers.handlers(),
+        *scheduling_handlers.handlers(),
+        version_command_handler(),
+    ]
+
+
+class LoadGenerator:
+    """
+    Simulate the users of many chats voting in the weekly poll, then pressing the buttons of the daily report.
+
+    Each chat gets a poll, a full report and a daily report through the commands of the bot. A vote is answered once
+    the bot edits the full report of the chat to show the user, a button press once the bot answers the callback
+    query, the latency runs from the update being queued on the fake Bot API. On Fridays and Saturdays the daily
+    report is of the weekend, so pressing its buttons only answers the callback query.
+    """
+
+    def __init__(self, server: FakeBotApiServer, *, chats: int, users: int, seed: int = 0) -> None:
+        self.server = server
+        self.users = users
+        self.chat_ids = [FIRST_CHAT_ID - i for i in range(chats)]
+        self._rng = random.Random(seed)
+        self._callback_query_ids = itertools.count(1)
+        self._pushed = 0
+        self._processed = 0
+        self._phase: Phase | None = None
+        self._pending: dict[tuple[int, int] | str, float] = {}
+        self._answered = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._called = asyncio.Event()
+        self._full_reports: dict[int, int] = {}
+        self._daily_reports: dict[int, JSONDict] = {}
+        server.observers.append(self._observe)
+
+        handlers = _handlers()
+        self.allowed_updates = allowed_updates(handlers)
+        self.application = (
+            Application.builder()
+            .token("123:fake")
+            .base_url(server.base_url)
+            .rate_limiter(TokenBucketRateLimiter())
+            .concurrent_updates(settings.CONCURRENT_UPDATES)
+            .build()
+        )
+        self.application.add_handler(IndexedRouter(handlers))
+        # Runs once the handlers of the bot are done with the update
+        self.application.add_handler(TypeHandler(Update, self._count_processed), group=1)
+
+    def user(self, chat_id: int, index: int) -> JSONDict:
+        user_id = (FIRST_CHAT_ID - chat_id) * self.users + index + 1
+        return {"id": user_id, "is_bot": False, "first_name": "User", "last_name": str(user_id)}
+
+    async def _count_processed(self, _update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
+        self._processed += 1
+        if self._processed == self._pushed:
+            self._idle.set()
+
+    def _observe(self, method: str, params: JSONDict, now: float) -> None:
+        if method in POLLING_METHODS or not self._phase:
+            return
+
+        self._called.set()
+        self._phase.calls[method] += 1
+        match method:
+            case "editMessageText" if self._full_reports.get(int(params["chat_id"])) == int(params["message_id"]):
+                chat_id = int(params["chat_id"])
+                for key in [key for key in self._pending if isinstance(key, tuple) and key[0] == chat_id]:
+                    if f'"tg://user?id={key[1]}"' in str(params["text"]):
+                        self._answer(key, now)
+            case "answerCallbackQuery":
+                self._answer(str(params["callback_query_id"]), now)
+
+    def _answer(self, key: tuple[int, int] | str, now: float) -> None:
+        if self._phase and key in self._pending:
+            self._phase.latencies.append(now - self._pending.pop(key))
+            if not self._pending:
+                self._answered.set()
+
+    def _count_pushed(self) -> None:
+        self._pushed += 1
+        self._idle.clear()
+
+    async def _wait_processed(self) -> None:
+        await self._idle.wait()
+
+    async def setup(self) -> None:
+        """Send a poll, a full report and a daily report in every chat, as its users would."""
+        for chat_id in self.chat_ids:
+            for command in ("poll", "get_poll_results", "whos_tomorrow"):
+                self.server.push_command(chat_id, self.user(chat_id, 0), command)
+                self._count_pushed()
+        await self._wait_processed()
+
+        for chat_id in self.chat_ids:
+            for message in self.server.chat(chat_id).messages.values():
+                if message["from"] == BOT_USER and "text" in message:
+                    if "reply_markup" in message:
+                        self._daily_reports[chat_id] = message
+                    else:
+                        self._full_reports[chat_id] = message["message_id"]
+
+    async def _run_phase(
+        self,
+        name: str,
+        updates: Sequence[tuple[tuple[int, int] | str, JSONDict]],
+        max_wait: float,
+    ) -> Phase:
+        loop = asyncio.get_running_loop()
+        phase = self._phase = Phase(name, events=len(updates))
+        self._answered.clear()
+        for key, update in updates:
+            self._pending[key] = loop.time()
+            self.server.push_update(**update)
+            self._count_pushed()
+
+        try:
+            await asyncio.wait_for(self._answered.wait(), max_wait)
+        except TimeoutError:
+            logger.warning("%d updates of %s without an answer", len(self._pending), name)
+        self._pending.clear()
+
+        # The coalesced refreshes of the reports go on after the last answer
+        await self._wait_processed()
+        while True:
+            self._called.clear()
+            try:
+                await asyncio.wait_for(self._called.wait(), poll_report_refresher.delay + 0.5)
+            except TimeoutError:
+                break
+        self._phase = None
+        return phase
+
+    async def vote(self, max_wait: float) -> Phase:
+        """Every user votes for some of the days, the votes of the chats are interleaved."""
+        updates = []
+        for chat_id in self.chat_ids:
+            (poll_id,) = self.server.chat(chat_id).polls
+            for index in range(self.users):
+                user = self.user(chat_id, index)
+                option_ids = sorted(self._rng.sample(range(5), self._rng.randint(1, 5)))
+                poll_answer = {
+                    "poll_id": poll_id,
+                    "user": user,
+                    "option_ids": option_ids,
+                    "option_persistent_ids": [str(option_id) for option_id in option_ids],
+                }
+                updates.append(((chat_id, user["id"]), {"poll_answer": poll_answer}))
+        self._rng.shuffle(updates)
+        return await self._run_phase("votes", updates, max_wait)
+
+    async def press(self, max_wait: float) -> Phase:
+        """Every user presses a button of the daily report of the chat."""
+        updates = []
+        for chat_id in self.chat_ids:
+            for index in range(self.users):
+                callback_query_id = str(next(self._callback_query_ids))
+                callback_query = {
+                    "id": callback_query_id,
+                    "from": self.user(chat_id, index),
+                    "chat_instance": str(chat_id),
+                    "data": self._rng.choice(BUTTONS),
+                    "message": self._daily_reports[chat_id],
+                }
+                updates.append((callback_query_id, {"callback_query": callback_query}))
+        self._rng.shuffle(updates)
+        return await self._run_phase("button presses", updates, max_wait)
+
+
+async def run_load(
+    *,
+    chats: int,
+    users: int,
+    latency: float = 0.0,
+    rate_limit_ratio: float = 0.0,
+    refresh_delay: float | None = None,
+    max_wait: float = 60,
+    seed: int = 0,
+) -> LoadReport:
+    """
+    Run the bot against a fake Bot API and the load of the given chats and users.
+
+    The repositories must be bound to a database with the schema of the bot. Rate limit errors are only injected
+    once the chats are set up.
+    """
+    server = FakeBotApiServer(latency=latency, seed=seed)
+    await server.start()
+    original_delay = poll_report_refresher.delay
+    if refresh_delay is not None:
+        poll_report_refresher.delay = refresh_delay
+
+    generator = LoadGenerator(server, chats=chats, users=users, seed=seed)
+    application = generator.application
+    try:
+        async with application:
+            assert application.updater
+            await application.updater.start_polling(
+                poll_interval=0,
+                timeout=1,
+                allowed_updates=generator.allowed_updates,
+            )
+            await application.start()
+            try:
+                await generator.setup()
+                server.rate_limit_ratio = rate_limit_ratio
+                votes = await generator.vote(max_wait)
+                presses = await generator.press(max_wait)
+            finally:
+                await application.updater.stop()
+                await application.stop()
+    finally:
+        poll_report_refresher.delay = original_delay
+        await server.stop()
+
+    return LoadReport(chats, users, votes, presses, server.rate_limited)
+
+
+async def _run_on_database(url: str, args: argparse.Namespace) -> LoadReport:
+    engine = create_engine(url)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    async_engine = create_async_engine(
+        engine.url.set(drivername="postgresql+asyncpg"),
+        **pool_options(settings, pre_ping=settings.DB_POOL_PRE_PING),
+    )
+    AsyncSession.configure(bind=async_engine)
+    try:
+        return await run_load(
+            chats=args.chats,
+            users=args.users,
+            latency=args.latency,
+            rate_limit_ratio=args.rate_limit_ratio,
+            refresh_delay=args.refresh_delay,
+            max_wait=args.max_wait,
+            seed=args.seed,
+        )
+    finally:
+        await async_engine.dispose()
+        Base.metadata.drop_all(engine)
+        engine.dispose()
+
+
+def main(argv: Sequence[str] | None = None) -> None:
+    parser = argparse.ArgumentParser(
+        description="Run the bot against a local fake Bot API with many chats voting and pressing buttons. The "
+        "database is the throwaway one of the tests, given with TEST_DATABASE_URL, its tables are dropped.",
+    )
+    parser.add_argument("--chats", type=int, default=10, help="number of group chats (default: %(default)s)")
+    parser.add_argument("--users", type=int, default=20, help="number of users in each chat (default: %(default)s)")
+    parser.add_argument(
+        "--latency",
+        type=float,
+        default=0.05,
+        help="seconds taken by the fake Bot API to answer each request (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--rate-limit-ratio",
+        type=float,
+        default=0.01,
+        help="share of the requests answered with a 429 error (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--refresh-delay",
+        type=float,
+        default=None,
+        help="POLL_REPORT_REFRESH_DELAY of the bot, the configured one by default",
+    )
+    parser.add_argument(
+        "--max-wait",
+        type=float,
+        default=120,
+        help="seconds to wait for the answers of each phase (default: %(default)s)",
+    )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=0,
+        help="seed of the votes and of the errors (default: %(default)s)",
+    )
+    args = parser.parse_args(argv)
+
+    if not (url := os.environ.get("TEST_DATABASE_URL")):
+        parser.error("TEST_DATABASE_URL is not set")
+
+    logging.basicConfig(format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.WARNING)
+    print(asyncio.run(_run_on_database(url, args)).format())  # noqa: T201
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+import datetime
+import logging
+from collections.abc import Callable
+from typing import TYPE_CHECKING
+
+import holidays
+import pytest
+
+from carpoolerbot.poll_report import holiday_calendar
+from carpoolerbot.poll_report.holiday_calendar import get_holiday
+from carpoolerbot.poll_report.message_serializers import whos_on_text
+from carpoolerbot.settings import settings
+
+if TYPE_CHECKING:
+    from holidays import HolidayBase
+
+logger = logging.getLogger(__name__)
+
+MONDAY = datetime.datetime(2025, 11, 3)
+
+
+def test_holiday_lookup(measure: Callable[..., float], monkeypatch: pytest.MonkeyPatch) -> None:
+    """Compare building the holiday calendar on every render with the cached per-year index."""
+    built_countries = []
+    country_holidays_class = holiday_calendar._country_holidays_class  # noqa: SLF001
+
+    def _counting_class(country: str) -> type["HolidayBase"]:
+        built_countries.append(country)
+        return country_holidays_class(country)
+
+    def _rebuild() -> object:
+        return holidays.country_holidays(settings.HOLIDAYS_COUNTRY, subdiv=settings.HOLIDAYS_SUBDIV).get(MONDAY)
+
+    holiday_calendar._holidays_of_year.cache_clear()  # noqa: SLF001
+    monkeypatch.setattr(holiday_calendar, "_country_holidays_class", _counting_class)
+
+    rebuild = measure(_rebuild, number=20)
+    cached = measure(lambda: get_holiday(MONDAY), number=10_000)
+    render = measure(lambda: whos_on_text([], MONDAY), number=10_000)
+
+    logger.info(
+        "holiday lookup: rebuilt %.1f us, cached %.2f us, whos_on_text %.2f us per render",
+        rebuild * 1e6,
+        cached * 1e6,
+        render * 1e6,
+    )
+    # The calendar of the year is built by the first lookup only, every render after it hits the cache
+    assert built_countries == [settings.HOLIDAYS_COUNTRY]
@@ -0,0 +1,141 @@
+import asyncio
+import datetime
+import logging
+import random
+import time
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.util import datetime_to_utc_timestamp
+from sqlalchemy import Engine, insert
+from telegram.ext import Application, JobQueue
+
+from carpoolerbot.apscheduler_sqlalchemy_adapter import PTBSQLAlchemyJobQueue, PTBSQLAlchemyJobStore
+from carpoolerbot.scheduling.common import JOB_CALLBACKS, send_poll_callback, send_whos_tomorrow_callback
+
+logger = logging.getLogger(__name__)
+
+CHATS = 10_000
+
+type AnyApplication = Application[Any, Any, Any, Any, Any, Any]
+
+
+def _application() -> AnyApplication:
+    return Application.builder().token("123:test").updater(None).job_queue(PTBSQLAlchemyJobQueue()).build()
+
+
+def _scheduled_jobs() -> list[dict[str, Any]]:
+    """Schedule the weekly poll and the daily report of every chat, at random hours, and return their rows."""
+    rng = random.Random(42)
+
+    async def _run() -> list[dict[str, Any]]:
+        application = _application()
+        assert application.job_queue
+        # Scheduled in memory, only to have the jobs complete with the defaults of the scheduler
+        application.job_queue.scheduler.start(paused=True)
+        store = PTBSQLAlchemyJobStore(application=application, callbacks=JOB_CALLBACKS, url="sqlite://")
+
+        rows = []
+        for chat_id in range(-1001000000000, -1001000000000 - CHATS, -1):
+            for callback, trigger in (
+                (send_poll_callback, CronTrigger(day_of_week="sun", hour=rng.randint(0, 23))),
+                (send_whos_tomorrow_callback, CronTrigger(day_of_week="sun, mon-thu", hour=rng.randint(0, 23))),
+            ):
+                job = application.job_queue.run_custom(
+                    callback,
+                    {"trigger": trigger},
+                    chat_id=chat_id,
+                    name=str(chat_id),
+                )
+                rows.append(
+                    {
+                        "id": job.job.id,
+                        "next_run_time": datetime_to_utc_timestamp(job.job.next_run_time),
+                        "job_state": store._encode_job(job.job),  # noqa: SLF001
+                        "name": job.job.name,
+                    },
+                )
+
+        application.job_queue.scheduler.shutdown(wait=False)
+        return rows
+
+    return asyncio.run(_run())
+
+
+@pytest.fixture(scope="module")
+def seeded_engine(pg_engine: Engine) -> Iterator[Engine]:
+    """Seed the job store with the jobs of every chat."""
+    store = PTBSQLAlchemyJobStore(application=_application(), engine=pg_engine)
+    store.jobs_t.create(pg_engine, checkfirst=True)
+    with pg_engine.begin() as conn:
+        conn.execute(insert(store.jobs_t), _scheduled_jobs())
+
+    yield pg_engine
+    store.jobs_t.drop(pg_engine)
+
+
+def _timed_start(engine: Engine) -> tuple[float, float]:
+    """Return the time to start a scheduler on the seeded store, and to load all the jobs afterwards."""
+
+    async def _run() -> tuple[float, float]:
+        application = _application()
+        assert application.job_queue
+        store = PTBSQLAlchemyJobStore(application=application, callbacks=JOB_CALLBACKS, engine=engine)
+        application.job_queue.scheduler.add_jobstore(store)
+
+        started_at = time.perf_counter()
+        application.job_queue.scheduler.start(paused=True)
+        # What the scheduler reads when it wakes up the first time
+        store.get_due_jobs(datetime.datetime.now(datetime.UTC))
+        store.get_next_run_time()
+        startup = time.perf_counter() - started_at
+
+        started_at = time.perf_counter()
+        jobs = store.get_all_jobs()
+        full_load = time.perf_counter() - started_at
+        assert len(jobs) == 2 * CHATS
+
+        application.job_queue.scheduler.shutdown(wait=False)
+        return startup, full_load
+
+    return asyncio.run(_run())
+
+
+def test_startup(seeded_engine: Engine) -> None:
+    """Compare starting the job store of 10k scheduled chats with loading all of their jobs."""
+    startup, full_load = min(_timed_start(seeded_engine) for _ in range(3))
+
+    logger.info(
+        "job store of %d chats: startup %.1f ms, loading all jobs %.1f ms",
+        CHATS,
+        startup * 1e3,
+        full_load * 1e3,
+    )
+    assert startup < full_load
+
+
+def test_get_jobs_by_name(seeded_engine: Engine, measure: Callable[..., float]) -> None:
+    """Compare looking the jobs of a chat up by scanning all the jobs with the lookup through the name index."""
+
+    async def _run() -> tuple[float, float]:
+        application = _application()
+        job_queue = application.job_queue
+        assert job_queue
+        store = PTBSQLAlchemyJobStore(application=application, callbacks=JOB_CALLBACKS, engine=seeded_engine)
+        job_queue.scheduler.add_jobstore(store)
+        job_queue.scheduler.start(paused=True)
+        name = str(-1001000000000 - CHATS // 2)
+
+        assert len(job_queue.get_jobs_by_name(name)) == 2
+        scan = measure(lambda: JobQueue.get_jobs_by_name(job_queue, name), number=1, repeat=3)
+        indexed = measure(lambda: job_queue.get_jobs_by_name(name), number=100)
+
+        job_queue.scheduler.shutdown(wait=False)
+        return scan, indexed
+
+    scan, indexed = asyncio.run(_run())
+
+    logger.info("jobs of a chat out of %d chats: scan %.1f ms, indexed %.2f ms", CHATS, scan * 1e3, indexed * 1e3)
+    assert indexed < scan
@@ -0,0 +1,21 @@
+import asyncio
+import logging
+
+import pytest
+from load_generator import run_load
+
+logger = logging.getLogger(__name__)
+
+
+@pytest.mark.usefixtures("pg_repositories")
+def test_votes_and_presses() -> None:
+    """Run the bot against the fake Bot API, with rate limit errors, and check that every update is answered."""
+    report = asyncio.run(
+        run_load(chats=3, users=8, latency=0.005, rate_limit_ratio=0.05, refresh_delay=0.2, max_wait=30),
+    )
+
+    logger.info("Load report:\n%s", report.format())
+    assert len(report.votes.latencies) == report.votes.events
+    assert len(report.presses.latencies) == report.presses.events
+    # The refreshes of the reports are coalesced, editing both reports of the chat for every vote takes 2 calls
+    assert report.votes.calls_per_event() < 2
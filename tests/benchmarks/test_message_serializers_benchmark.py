@@ -0,0 +1,130 @@
+import datetime
+import itertools
+import logging
+import random
+from collections.abc import Callable, Sequence
+
+import pytest
+
+from carpoolerbot.poll_report import message_serializers
+from carpoolerbot.poll_report.message_serializers import _format_user_answer, full_poll_result, whos_on_text
+from carpoolerbot.poll_report.render_cache import ReportRenderCache
+from carpoolerbot.poll_report.types import PollAnswerRow, RenderKey, ReturnTime
+
+logger = logging.getLogger(__name__)
+
+USERS = 300
+MONDAY = datetime.datetime(2025, 11, 3)
+# Minimum speedups of the render cache over rendering from scratch, well below the measured ones (about 50 and 4)
+CACHED_SPEEDUP = 10
+ONE_DAY_CHANGED_SPEEDUP = 2
+
+
+def _large_poll() -> list[PollAnswerRow]:
+    """Answers of every user on every day, going through all the driver, return time and override combinations."""
+    rng = random.Random(42)
+    combinations = list(
+        itertools.product(
+            [None, "self", "other", -1],
+            list(ReturnTime),
+            [None, True, False],
+        ),
+    )
+    answers = []
+    for user_id, day in itertools.product(range(1, USERS + 1), range(5)):
+        driver, return_time, override_answer = combinations[(user_id + day) % len(combinations)]
+        match driver:
+            case "self":
+                driver_id = user_id
+            case "other":
+                driver_id = rng.randint(1, USERS)
+            case int() | None:
+                driver_id = driver
+        answers.append(
+            PollAnswerRow(
+                user_id,
+                f"User {rng.choice('ABCDEFGHIJKLMNOPQRSTUVWXYZ')}{user_id:04}",
+                "large_poll",
+                day,
+                poll_answer=rng.random() < 0.7,
+                override_answer=override_answer,
+                driver_id=driver_id,
+                return_time=return_time,
+            ),
+        )
+
+    return answers
+
+
+@pytest.fixture(scope="module")
+def large_poll() -> list[PollAnswerRow]:
+    return _large_poll()
+
+
+def test_format_user_answer(
+    large_poll: list[PollAnswerRow],
+    measure: Callable[..., float],
+) -> None:
+    """Time the formatting of a single answer."""
+    formatted = measure(lambda: [_format_user_answer(answer) for answer in large_poll], number=10) / len(large_poll)
+
+    logger.info("_format_user_answer %.2f us per answer", formatted * 1e6)
+
+
+def test_whos_on_text(
+    large_poll: list[PollAnswerRow],
+    measure: Callable[..., float],
+) -> None:
+    """Time rendering the daily report of a poll with hundreds of users."""
+    rendered = measure(lambda: whos_on_text(large_poll, MONDAY), number=20)
+
+    logger.info("whos_on_text of %d users %.1f us per render", USERS, rendered * 1e6)
+
+
+def test_full_poll_result(
+    large_poll: list[PollAnswerRow],
+    measure: Callable[..., float],
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    """Time rendering the full report of a poll with hundreds of users, from scratch and from the render cache."""
+    rendered_days = 0
+    render_users = message_serializers._render_users  # noqa: SLF001
+
+    def _counting_render_users(day_answers: Sequence[PollAnswerRow]) -> str:
+        nonlocal rendered_days
+        rendered_days += 1
+        return render_users(day_answers)
+
+    monkeypatch.setattr(message_serializers, "_render_users", _counting_render_users)
+    uncached = measure(lambda: full_poll_result(large_poll), number=20)
+
+    cache = ReportRenderCache(enabled=True)
+    monkeypatch.setattr("carpoolerbot.poll_report.message_serializers.report_render_cache", cache)
+
+    def _one_day_changed() -> None:
+        cache.answers_changed("large_poll", 2)
+        full_poll_result(large_poll, RenderKey("large_poll", cache.write_count))
+
+    full_poll_result(large_poll, RenderKey("large_poll", cache.write_count))
+    cached = measure(lambda: full_poll_result(large_poll, RenderKey("large_poll", cache.write_count)), number=200)
+    one_day = measure(_one_day_changed, number=20)
+
+    logger.info(
+        "full_poll_result of %d users: %.1f us from scratch, %.2f us cached, %.1f us with one day changed",
+        USERS,
+        uncached * 1e6,
+        cached * 1e6,
+        one_day * 1e6,
+    )
+    # Ratios of timings on the same machine, so that slower machines, e.g. the CI runners, do not fail them
+    assert cached * CACHED_SPEEDUP < uncached
+    assert one_day * ONE_DAY_CHANGED_SPEEDUP < uncached
+
+    # Only the days whose answers changed are rendered again
+    rendered_days = 0
+    full_poll_result(large_poll, RenderKey("large_poll", cache.write_count))
+    assert rendered_days == 0
+    _one_day_changed()
+    assert rendered_days == 1
+    full_poll_result(large_poll)
+    assert rendered_days == 1 + 5
@@ -0,0 +1,131 @@
+import logging
+import random
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from telegram import Bot, Update
+
+from carpoolerbot.poll import handlers as poll_handlers
+from carpoolerbot.poll_report import handlers as poll_report_handlers
+from carpoolerbot.routing import IndexedRouter, allowed_updates
+from carpoolerbot.scheduling import handlers as scheduling_handlers
+from carpoolerbot.utils import TypedBaseHandler, version_command_handler
+
+logger = logging.getLogger(__name__)
+
+UPDATES = 1_000
+
+
+def _busy_group_updates(bot: Bot) -> list[Update]:
+    """Mostly chatter, reactions and member changes, with the odd command, vote and button press."""
+    rng = random.Random(42)
+    user = {"id": 112233445, "is_bot": False, "first_name": "Alice"}
+    chat = {"id": -1001234567890, "type": "supergroup", "title": "Carpool"}
+
+    def _message(text: str, entities: list[dict[str, Any]] | None = None) -> dict[str, Any]:
+        return {
+            "message_id": 1,
+            "date": 1792224000,
+            "chat": chat,
+            "from": user,
+            "text": text,
+            "entities": entities or [],
+        }
+
+    kinds: list[tuple[float, Callable[[], dict[str, Any]]]] = [
+        (0.6, lambda: {"message": _message("see you tomorrow at the usual place " * rng.randint(1, 5))}),
+        (0.1, lambda: {"edited_message": _message("see you tomorrow at 8")}),
+        (0.05, lambda: {"message": _message("/other_bot_cmd", [{"offset": 0, "length": 14, "type": "bot_command"}])}),
+        (
+            0.1,
+            lambda: {
+                "message_reaction": {
+                    "chat": chat,
+                    "message_id": 1,
+                    "user": user,
+                    "date": 1792224000,
+                    "old_reaction": [],
+                    "new_reaction": [{"type": "emoji", "emoji": "👍"}],
+                },
+            },
+        ),
+        (0.05, lambda: {"message": _message("/whos_tomorrow", [{"offset": 0, "length": 14, "type": "bot_command"}])}),
+        (
+            0.05,
+            lambda: {
+                "poll_answer": {"poll_id": "1", "user": user, "option_ids": [0], "option_persistent_ids": ["0"]},
+            },
+        ),
+        (
+            0.05,
+            lambda: {
+                "callback_query": {"id": "1", "from": user, "chat_instance": "1", "data": "daily_msg:confirm"},
+            },
+        ),
+    ]
+    weights, factories = zip(*kinds, strict=True)
+    return [
+        Update.de_json({"update_id": update_id, **rng.choices(factories, weights)[0]()}, bot)
+        for update_id in range(UPDATES)
+    ]
+
+
+def test_dispatch(bot: Bot, measure: Callable[..., float], monkeypatch: pytest.MonkeyPatch) -> None:
+    """Compare checking every handler in turn with the router, on the same updates."""
+    handlers: list[TypedBaseHandler] = [
+        *poll_handlers.handlers(),
+        *poll_report_handlers.handlers(),
+        *scheduling_handlers.handlers(),
+        version_command_handler(),
+    ]
+    router = IndexedRouter(handlers)
+    updates = _busy_group_updates(bot)
+    update_types = set(allowed_updates(handlers))
+    subscribed = [update for update in updates if any(getattr(update, update_type) for update_type in update_types)]
+
+    def _linear() -> None:
+        for update in subscribed:
+            for handler in handlers:
+                check_result = handler.check_update(update)
+                if check_result is not None and check_result is not False:
+                    break
+
+    def _routed() -> None:
+        for update in subscribed:
+            router.check_update(update)
+
+    linear = measure(_linear, number=10) / len(subscribed)
+    routed = measure(_routed, number=10) / len(subscribed)
+
+    checks = 0
+
+    def _counting(check_update: Callable[[TypedBaseHandler, object], object]) -> Callable[..., object]:
+        def _counting_check_update(self: TypedBaseHandler, update: object) -> object:
+            nonlocal checks
+            checks += 1
+            return check_update(self, update)
+
+        return _counting_check_update
+
+    # Patched in the class defining check_update, so that no check is counted twice
+    for handler_class in {next(c for c in type(h).__mro__ if "check_update" in vars(c)) for h in handlers}:
+        monkeypatch.setattr(handler_class, "check_update", _counting(vars(handler_class)["check_update"]))
+
+    _linear()
+    linear_checks, checks = checks, 0
+    _routed()
+    routed_checks = checks
+
+    logger.info(
+        "dispatch of %d busy group updates, %d subscribed: linear %.2f us and %.2f checks, "
+        "routed %.2f us and %.2f checks per update",
+        UPDATES,
+        len(subscribed),
+        linear * 1e6,
+        linear_checks / len(subscribed),
+        routed * 1e6,
+        routed_checks / len(subscribed),
+    )
+    # The router checks at most the single candidate of each update, the handlers in turn check several of them
+    assert routed_checks <= len(subscribed) < linear_checks
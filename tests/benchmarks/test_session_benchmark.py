@@ -0,0 +1,63 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import Engine, text
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from carpoolerbot.database.session import pool_options
+from carpoolerbot.settings import Settings
+
+logger = logging.getLogger(__name__)
+
+# Session blocks of the heaviest handler, a button of the daily report: the report lookup, the answer update, the
+# answers of the poll and the content hash of the edited report
+HANDLER_SESSIONS = 4
+HANDLERS = 200
+
+
+async def _time_handlers(pg_engine: Engine, *, pre_ping: bool) -> float:
+    """Return the best time of a handler running its session blocks on pooled connections, over a few repetitions."""
+    async_engine = create_async_engine(
+        pg_engine.url.set(drivername="postgresql+asyncpg"),
+        **pool_options(Settings(), pre_ping=pre_ping),
+    )
+    session_factory = async_sessionmaker(async_engine)
+
+    async def _handler() -> None:
+        for _ in range(HANDLER_SESSIONS):
+            async with session_factory() as s:
+                await s.execute(text("SELECT 1"))
+
+    # Open the connection of the pool beforehand, as in a running bot
+    await _handler()
+    timings = []
+    for _ in range(5):
+        started_at = time.perf_counter()
+        for _ in range(HANDLERS):
+            await _handler()
+        timings.append((time.perf_counter() - started_at) / HANDLERS)
+
+    await async_engine.dispose()
+    return min(timings)
+
+
+def test_checkout(pg_engine: Engine) -> None:
+    """Compare the connection checkouts of a handler with the pre-ping of every connection and without it."""
+
+    async def _run() -> tuple[float, float]:
+        return (
+            await _time_handlers(pg_engine, pre_ping=True),
+            await _time_handlers(pg_engine, pre_ping=False),
+        )
+
+    pre_ping, no_pre_ping = asyncio.run(_run())
+
+    logger.info(
+        "handler with %d sessions: pre-ping %.1f us, retry on disconnect %.1f us, %.1f us per checkout",
+        HANDLER_SESSIONS,
+        pre_ping * 1e6,
+        no_pre_ping * 1e6,
+        (pre_ping - no_pre_ping) / HANDLER_SESSIONS * 1e6,
+    )
+    assert no_pre_ping < pre_ping
@@ -0,0 +1,134 @@
+import asyncio
+import contextlib
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+import pytest
+from fake_bot_api import BOT_USER, FakeBotApiRequest, FakeBotApiServer
+from sqlalchemy import Engine, insert
+from telegram import Update
+from telegram.ext import Application, CallbackContext, ContextTypes
+
+from carpoolerbot.database.models import PollAnswer, PollReport, TelegramUser, WeeklyPoll
+from carpoolerbot.metrics import StatementCount
+from carpoolerbot.poll.handlers import handle_poll_answer, poll_cmd
+from carpoolerbot.poll_report.handlers import (
+    daily_poll_report_callback_handler,
+    get_poll_results_cmd,
+    whos_tomorrow_cmd,
+)
+from carpoolerbot.poll_report.types import DailyReportCommands
+
+CHAT_ID = -1001234567890
+OPTIONS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+USERS = 20
+
+type MaxStatements = Callable[[int], contextlib.AbstractContextManager[StatementCount]]
+type Callback = Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]]
+
+
+@pytest.fixture
+def seeded_engine(pg_repositories: Engine) -> Engine:
+    """Seed an open poll answered by every user on every day, with a daily report of Monday."""
+    with pg_repositories.begin() as conn:
+        conn.execute(
+            insert(TelegramUser),
+            [{"user_id": user_id, "user_fullname": f"User {user_id}"} for user_id in range(1, USERS + 1)],
+        )
+        conn.execute(
+            insert(WeeklyPoll),
+            [{"poll_id": "poll", "chat_id": CHAT_ID, "message_id": 10, "options": OPTIONS, "is_open": True}],
+        )
+        conn.execute(
+            insert(PollAnswer),
+            [
+                {"user_id": user_id, "poll_id": "poll", "poll_option_id": day, "poll_answer": True, "return_time": 0}
+                for user_id in range(1, USERS + 1)
+                for day in range(len(OPTIONS))
+            ],
+        )
+        conn.execute(
+            insert(PollReport),
+            [{"poll_id": "poll", "chat_id": CHAT_ID, "message_id": 20, "poll_option_id": 0, "sent_timestamp": 0}],
+        )
+
+    return pg_repositories
+
+
+def _message(text: str) -> dict[str, Any]:
+    return {
+        "message_id": 20,
+        "date": 1792224000,
+        "chat": {"id": CHAT_ID, "type": "supergroup", "title": "Carpool"},
+        "from": {"id": 1, "is_bot": False, "first_name": "User 1"},
+        "text": text,
+    }
+
+
+def _command(command: str) -> dict[str, Any]:
+    message = _message(f"/{command}")
+    message["entities"] = [{"offset": 0, "length": len(command) + 1, "type": "bot_command"}]
+    return {"update_id": 1, "message": message}
+
+
+def _handle(callback: Callback, update_data: dict[str, Any], max_statements: MaxStatements, limit: int) -> None:
+    """Run the handler on the update, asserting that it executes at most ``limit`` SQL statements."""
+
+    async def _run() -> None:
+        api = FakeBotApiServer()
+        # The poll and the daily report of the seeded database
+        chat = api.chat(CHAT_ID)
+        chat.add_poll({"question": "Carpool", "options": [{"text": option} for option in OPTIONS]}, message_id=10)
+        chat.add_message(BOT_USER, message_id=20, text="Daily report")
+        application = Application.builder().token("123:test").request(FakeBotApiRequest(api)).updater(None).build()
+        async with application:
+            update = Update.de_json(update_data, application.bot)
+            with max_statements(limit):
+                await callback(update, CallbackContext.from_update(update, application))
+
+    asyncio.run(_run())
+
+
+@pytest.mark.usefixtures("seeded_engine")
+class TestHandlerStatements:
+    """Tests for the number of SQL statements executed by the handlers, fixed whatever the number of users."""
+
+    def test_poll_answer(self, max_statements: MaxStatements) -> None:
+        """Test the statements of a vote."""
+        update = {
+            "update_id": 1,
+            "poll_answer": {
+                "poll_id": "poll",
+                "user": {"id": 1, "is_bot": False, "first_name": "User 1"},
+                "option_ids": [0, 2],
+                "option_persistent_ids": ["0", "2"],
+            },
+        }
+        _handle(handle_poll_answer, update, max_statements, 2)
+
+    def test_poll_cmd(self, max_statements: MaxStatements) -> None:
+        """Test the statements of sending a new poll, closing the previous one."""
+        _handle(poll_cmd, _command("poll"), max_statements, 4)
+
+    def test_get_poll_results_cmd(self, max_statements: MaxStatements) -> None:
+        """Test the statements of sending the full report."""
+        _handle(get_poll_results_cmd, _command("get_poll_results"), max_statements, 2)
+
+    def test_whos_tomorrow_cmd(self, max_statements: MaxStatements) -> None:
+        """Test the statements of sending the daily report."""
+        _handle(whos_tomorrow_cmd, _command("whos_tomorrow"), max_statements, 2)
+
+    @pytest.mark.parametrize(("command", "limit"), [(DailyReportCommands.CONFIRM, 4), (DailyReportCommands.DRIVE, 4)])
+    def test_daily_report_button(self, max_statements: MaxStatements, command: DailyReportCommands, limit: int) -> None:
+        """Test the statements of a button of the daily report, updating the report."""
+        update = {
+            "update_id": 1,
+            "callback_query": {
+                "id": "1",
+                "from": {"id": 1, "is_bot": False, "first_name": "User 1"},
+                "chat_instance": "1",
+                "message": _message("Daily report"),
+                "data": command.value,
+            },
+        }
+        _handle(daily_poll_report_callback_handler, update, max_statements, limit)
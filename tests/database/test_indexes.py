@@ -0,0 +1,106 @@
+from collections.abc import Iterator
+from typing import Any
+
+import pytest
+from sqlalchemy import ClauseElement, Engine, select, text
+from sqlalchemy.dialects import postgresql
+
+from carpoolerbot.database.models import PollAnswer, PollReport, WeeklyPoll
+from carpoolerbot.database.repositories import poll as poll_repository
+from carpoolerbot.database.repositories import poll_answers as poll_answers_repository
+
+CHATS = 200
+WEEKS = 3 * 52
+REPORTS_PER_POLL = 5
+USERS_PER_CHAT = 4
+
+
+@pytest.fixture(scope="module")
+def seeded_engine(pg_engine: Engine) -> Iterator[Engine]:
+    """Seed three years of weekly polls, with their reports and answers, for many chats."""
+    with pg_engine.begin() as conn:
+        conn.execute(
+            text("""
+                INSERT INTO telegram_users (user_id, user_fullname)
+                SELECT u, 'User ' || u FROM generate_series(1, :chats * :users) AS u
+            """),
+            {"chats": CHATS, "users": USERS_PER_CHAT},
+        )
+        conn.execute(
+            text("""
+                INSERT INTO weekly_polls (poll_id, chat_id, message_id, options, is_open)
+                SELECT c || '_' || w, -c, w * 10, '["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]', w = :weeks
+                FROM generate_series(1, :chats) AS c, generate_series(1, :weeks) AS w
+            """),
+            {"chats": CHATS, "weeks": WEEKS},
+        )
+        conn.execute(
+            text("""
+                INSERT INTO poll_reports (poll_id, chat_id, message_id, poll_option_id, sent_timestamp)
+                SELECT c || '_' || w, -c, w * 10 + r, r - 1, 0
+                FROM generate_series(1, :chats) AS c, generate_series(1, :weeks) AS w,
+                    generate_series(1, :reports) AS r
+            """),
+            {"chats": CHATS, "weeks": WEEKS, "reports": REPORTS_PER_POLL},
+        )
+        conn.execute(
+            text("""
+                INSERT INTO poll_answers (user_id, poll_id, poll_option_id, poll_answer, return_time)
+                SELECT (c - 1) * :users + u, c || '_' || w, o, (u + o) % 2 = 0, 0
+                FROM generate_series(1, :chats) AS c, generate_series(1, :weeks) AS w,
+                    generate_series(1, :users) AS u, generate_series(0, 4) AS o
+            """),
+            {"chats": CHATS, "weeks": WEEKS, "users": USERS_PER_CHAT},
+        )
+        conn.execute(text("ANALYZE"))
+
+    yield pg_engine
+
+    with pg_engine.begin() as conn:
+        conn.execute(text("TRUNCATE poll_answers, poll_reports, weekly_polls, telegram_users"))
+
+
+def _plan_nodes(plan: dict[str, Any]) -> Iterator[dict[str, Any]]:
+    yield plan
+    for child in plan.get("Plans", []):
+        yield from _plan_nodes(child)
+
+
+def _assert_index_scan(engine: Engine, stmt: ClauseElement, table: str, index_name: str) -> None:
+    """Check that the table is only read through the given index, directly or with a bitmap scan."""
+    compiled = stmt.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True})
+    with engine.connect() as conn:
+        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {compiled}")).scalar_one()[0]["Plan"]
+
+    nodes = list(_plan_nodes(plan))
+    assert not [node for node in nodes if node["Node Type"] == "Seq Scan" and node["Relation Name"] == table], plan
+    assert [node for node in nodes if node.get("Index Name") == index_name], plan
+
+
+class TestIndexes:
+    """Check that the queries of the repositories are served by an index on a realistic dataset."""
+
+    def test_latest_poll(self, seeded_engine: Engine) -> None:
+        """Test the lookup of the latest poll of a chat."""
+        stmt = select(WeeklyPoll).where(WeeklyPoll.chat_id == -42).order_by(WeeklyPoll.message_id.desc()).limit(1)
+        _assert_index_scan(seeded_engine, stmt, "weekly_polls", "ix_weekly_polls_chat_id_message_id")
+
+    def test_close_open_polls(self, seeded_engine: Engine) -> None:
+        """Test the lookup of the open polls of a chat, closed when a new poll is sent."""
+        stmt = poll_repository._close_open_polls(-42)  # noqa: SLF001
+        _assert_index_scan(seeded_engine, stmt, "weekly_polls", "ix_weekly_polls_chat_id_message_id")
+
+    def test_latest_polls(self, seeded_engine: Engine) -> None:
+        """Test the lookup of the latest poll of many chats, for the daily reports sent as a batch."""
+        stmt = poll_answers_repository._latest_poll_ids(range(-50, 0))  # noqa: SLF001
+        _assert_index_scan(seeded_engine, stmt, "weekly_polls", "ix_weekly_polls_chat_id_message_id")
+
+    def test_poll_reports(self, seeded_engine: Engine) -> None:
+        """Test the lookup of all the reports of a poll."""
+        stmt = select(PollReport).where(PollReport.poll_id == "42_100")
+        _assert_index_scan(seeded_engine, stmt, "poll_reports", "ix_poll_reports_poll_id")
+
+    def test_poll_answers(self, seeded_engine: Engine) -> None:
+        """Test the lookup of all the answers of a poll."""
+        stmt = select(PollAnswer).where(PollAnswer.poll_id == "42_100")
+        _assert_index_scan(seeded_engine, stmt, "poll_answers", "ix_poll_answers_poll_id")
@@ -0,0 +1,54 @@
+import asyncio
+import multiprocessing
+
+from sqlalchemy import Engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from carpoolerbot.database.locks import chat_lock
+from carpoolerbot.database.session import AsyncSession
+
+PROCESSES = 4
+INCREMENTS = 20
+
+
+def _increment_counter(async_url: str, chat_id: int) -> None:
+    """Increment the counter with a racy read-modify-write, made safe by the chat lock."""
+    AsyncSession.configure(bind=create_async_engine(async_url, poolclass=NullPool))
+
+    async def _run() -> None:
+        for _ in range(INCREMENTS):
+            async with chat_lock(chat_id), AsyncSession.begin() as s:
+                value = await s.scalar(text("SELECT value FROM lock_counter"))
+                await asyncio.sleep(0.001)
+                await s.execute(text("UPDATE lock_counter SET value = :value"), {"value": value + 1})
+
+    asyncio.run(_run())
+
+
+class TestChatLock:
+    """Tests for chat_lock function."""
+
+    def test_serializes_processes(self, pg_engine: Engine) -> None:
+        """Test that read-modify-write sequences in different processes do not interleave."""
+        with pg_engine.begin() as conn:
+            conn.execute(text("CREATE TABLE lock_counter (value integer NOT NULL)"))
+            conn.execute(text("INSERT INTO lock_counter VALUES (0)"))
+
+        try:
+            async_url = pg_engine.url.set(drivername="postgresql+asyncpg").render_as_string(hide_password=False)
+            context = multiprocessing.get_context("spawn")
+            processes = [
+                context.Process(target=_increment_counter, args=(async_url, -1001234567890)) for _ in range(PROCESSES)
+            ]
+            for process in processes:
+                process.start()
+            for process in processes:
+                process.join(timeout=60)
+
+            assert [process.exitcode for process in processes] == [0] * PROCESSES
+            with pg_engine.connect() as conn:
+                assert conn.scalar(text("SELECT value FROM lock_counter")) == PROCESSES * INCREMENTS
+        finally:
+            with pg_engine.begin() as conn:
+                conn.execute(text("DROP TABLE lock_counter"))
@@ -0,0 +1,258 @@
+import asyncio
+
+import pytest
+from sqlalchemy import Engine, insert
+from telegram import User
+
+from carpoolerbot.database.models import PollAnswer, TelegramUser, WeeklyPoll
+from carpoolerbot.database.repositories.poll_answers import (
+    get_all_poll_answers,
+    get_latest_poll_answers,
+    get_latest_polls_answers,
+    set_driver_id,
+    set_override_answer,
+    set_return_time,
+    upsert_poll_answers,
+)
+from carpoolerbot.poll_report.types import NotVotedError, PollAnswerRow, ReturnTime
+
+OPTIONS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+@pytest.fixture
+def seeded_engine(pg_repositories: Engine) -> Engine:
+    """Seed two polls in a chat, the latest with answers of two users, and an empty poll in another chat."""
+    with pg_repositories.begin() as conn:
+        conn.execute(
+            insert(TelegramUser),
+            [{"user_id": 1, "user_fullname": "Alice"}, {"user_id": 2, "user_fullname": "Bob"}],
+        )
+        conn.execute(
+            insert(WeeklyPoll),
+            [
+                {"poll_id": "old", "chat_id": -1, "message_id": 10, "options": OPTIONS, "is_open": False},
+                {"poll_id": "new", "chat_id": -1, "message_id": 20, "options": OPTIONS, "is_open": True},
+                {"poll_id": "empty", "chat_id": -2, "message_id": 10, "options": OPTIONS, "is_open": True},
+            ],
+        )
+        answer_columns = (
+            "user_id",
+            "poll_id",
+            "poll_option_id",
+            "poll_answer",
+            "override_answer",
+            "driver_id",
+            "return_time",
+        )
+        conn.execute(
+            insert(PollAnswer),
+            [
+                dict(zip(answer_columns, values, strict=True))
+                for values in [
+                    (1, "old", 0, True, None, None, 0),
+                    (1, "new", 0, True, None, None, 1),
+                    (2, "new", 1, False, True, 1, 0),
+                ]
+            ],
+        )
+
+    return pg_repositories
+
+
+@pytest.mark.usefixtures("seeded_engine")
+class TestGetLatestPollAnswers:
+    """Tests for get_latest_poll_answers function."""
+
+    def test_returns_answers_of_latest_poll(self) -> None:
+        """Test that only the answers of the latest poll of the chat are returned, with the user names."""
+        latest_poll = asyncio.run(get_latest_poll_answers(-1))
+
+        assert latest_poll is not None
+        assert latest_poll.poll_id == "new"
+        assert sorted(latest_poll.answers) == [
+            PollAnswerRow(1, "Alice", "new", 0, poll_answer=True, override_answer=None, driver_id=None, return_time=1),
+            PollAnswerRow(2, "Bob", "new", 1, poll_answer=False, override_answer=True, driver_id=1, return_time=0),
+        ]
+
+    def test_poll_without_answers(self) -> None:
+        """Test that a poll without answers is returned with an empty list."""
+        latest_poll = asyncio.run(get_latest_poll_answers(-2))
+
+        assert latest_poll is not None
+        assert latest_poll.poll_id == "empty"
+        assert latest_poll.answers == []
+
+    def test_chat_without_polls(self) -> None:
+        """Test that None is returned when the chat has no polls."""
+        assert asyncio.run(get_latest_poll_answers(-3)) is None
+
+
+@pytest.mark.usefixtures("seeded_engine")
+class TestGetLatestPollsAnswers:
+    """Tests for get_latest_polls_answers function."""
+
+    def test_returns_latest_poll_of_each_chat(self) -> None:
+        """Test that the latest poll of every chat is returned, and the chats without polls are left out."""
+        latest_polls = asyncio.run(get_latest_polls_answers([-1, -2, -3]))
+
+        assert sorted(latest_polls) == [-2, -1]
+        assert latest_polls[-1].poll_id == "new"
+        assert len(latest_polls[-1].answers) == 2
+        assert latest_polls[-2].poll_id == "empty"
+        assert latest_polls[-2].answers == []
+
+    def test_no_chats(self) -> None:
+        """Test that no chats return no polls."""
+        assert asyncio.run(get_latest_polls_answers([])) == {}
+
+
+@pytest.mark.usefixtures("seeded_engine")
+class TestGetAllPollAnswers:
+    """Tests for get_all_poll_answers function."""
+
+    def test_returns_answer_rows(self) -> None:
+        """Test that the answers of the poll are returned as rows with the user names."""
+        assert sorted(asyncio.run(get_all_poll_answers("new"))) == [
+            PollAnswerRow(1, "Alice", "new", 0, poll_answer=True, override_answer=None, driver_id=None, return_time=1),
+            PollAnswerRow(2, "Bob", "new", 1, poll_answer=False, override_answer=True, driver_id=1, return_time=0),
+        ]
+
+    def test_poll_without_answers(self) -> None:
+        """Test that a poll without answers returns an empty list."""
+        assert asyncio.run(get_all_poll_answers("empty")) == []
+
+
+@pytest.mark.usefixtures("seeded_engine")
+class TestUpsertPollAnswers:
+    """Tests for upsert_poll_answers function."""
+
+    def test_first_vote(self) -> None:
+        """Test that the first vote of a new user inserts an answer per option, returning after work."""
+        asyncio.run(upsert_poll_answers("empty", [1, 3], User(3, "Carol", is_bot=False)))
+
+        assert sorted(asyncio.run(get_all_poll_answers("empty"))) == [
+            PollAnswerRow(
+                3,
+                "Carol",
+                "empty",
+                day,
+                poll_answer=day in {1, 3},
+                override_answer=None,
+                driver_id=None,
+                return_time=ReturnTime.AFTER_WORK,
+            )
+            for day in range(len(OPTIONS))
+        ]
+
+    def test_vote_again(self) -> None:
+        """Test that voting again replaces the vote and keeps the overrides and return times of the answers."""
+        asyncio.run(upsert_poll_answers("new", [1], User(1, "Alicia", is_bot=False)))
+        asyncio.run(upsert_poll_answers("new", [0], User(2, "Robert", is_bot=False)))
+
+        answers = {
+            (answer.user_id, answer.poll_option_id): answer for answer in asyncio.run(get_all_poll_answers("new"))
+        }
+        assert [answers[1, day].poll_answer for day in range(len(OPTIONS))] == [False, True, False, False, False]
+        assert [answers[2, day].poll_answer for day in range(len(OPTIONS))] == [True, False, False, False, False]
+        # The existing answer returning after dinner keeps it, the answers inserted now return after work
+        assert answers[1, 0] == PollAnswerRow(
+            1,
+            "Alicia",
+            "new",
+            0,
+            poll_answer=False,
+            override_answer=None,
+            driver_id=None,
+            return_time=ReturnTime.AFTER_DINNER,
+        )
+        assert answers[2, 1] == PollAnswerRow(
+            2,
+            "Robert",
+            "new",
+            1,
+            poll_answer=False,
+            override_answer=True,
+            driver_id=1,
+            return_time=ReturnTime.AFTER_WORK,
+        )
+        assert {answers[1, day].return_time for day in range(1, len(OPTIONS))} == {ReturnTime.AFTER_WORK}
+
+
+def _answer(user_id: int, poll_option_id: int) -> PollAnswerRow:
+    """Read back an answer of the latest poll."""
+    answers = asyncio.run(get_all_poll_answers("new"))
+    return next(a for a in answers if a.user_id == user_id and a.poll_option_id == poll_option_id)
+
+
+@pytest.mark.usefixtures("seeded_engine")
+class TestSetDriverId:
+    """Tests for set_driver_id function."""
+
+    def test_toggle_twice(self) -> None:
+        """Test that driving toggles the driver of the answer on, then off again."""
+        assert asyncio.run(set_driver_id(1, "new", 0, 1, toggle=True)).driver_id == 1
+        assert _answer(1, 0).driver_id == 1
+
+        assert asyncio.run(set_driver_id(1, "new", 0, 1, toggle=True)).driver_id is None
+        assert _answer(1, 0).driver_id is None
+
+    def test_toggle_other_driver(self) -> None:
+        """Test that going alone replaces the driver of the answer, and pressing it again clears it."""
+        assert asyncio.run(set_driver_id(2, "new", 1, -1, toggle=True)).driver_id == -1
+        assert asyncio.run(set_driver_id(2, "new", 1, -1, toggle=True)).driver_id is None
+        assert _answer(2, 1).driver_id is None
+
+    def test_without_toggle(self) -> None:
+        """Test that the driver is set twice without toggling."""
+        asyncio.run(set_driver_id(2, "new", 1, 1))
+        assert asyncio.run(set_driver_id(2, "new", 1, 1)).driver_id == 1
+
+    def test_not_voted(self) -> None:
+        """Test that toggling an answer that does not exist raises, twice, without inserting it."""
+        for _ in range(2):
+            with pytest.raises(NotVotedError):
+                asyncio.run(set_driver_id(1, "new", 3, 1, toggle=True))
+        assert all(answer.poll_option_id != 3 for answer in asyncio.run(get_all_poll_answers("new")))
+
+
+@pytest.mark.usefixtures("seeded_engine")
+class TestSetOverrideAnswer:
+    """Tests for set_override_answer function."""
+
+    def test_set_twice(self) -> None:
+        """Test that the override of the answer is replaced by the last press."""
+        assert asyncio.run(set_override_answer(1, "new", 0, value=False)).override_answer is False
+        assert asyncio.run(set_override_answer(1, "new", 0, value=True)).override_answer is True
+        assert _answer(1, 0).override_answer is True
+        # The other columns are left alone
+        assert _answer(1, 0).return_time == ReturnTime.AFTER_DINNER
+
+    def test_not_voted(self) -> None:
+        """Test that overriding an answer that does not exist raises."""
+        with pytest.raises(NotVotedError):
+            asyncio.run(set_override_answer(2, "new", 0, value=True))
+
+
+@pytest.mark.usefixtures("seeded_engine")
+class TestSetReturnTime:
+    """Tests for set_return_time function."""
+
+    def test_set_twice(self) -> None:
+        """Test that the return time of the answer is replaced by the last press."""
+        assert asyncio.run(set_return_time(2, "new", 1, ReturnTime.LATE)).return_time == ReturnTime.LATE
+        assert asyncio.run(set_return_time(2, "new", 1, ReturnTime.AFTER_WORK)).return_time == ReturnTime.AFTER_WORK
+        assert _answer(2, 1) == PollAnswerRow(
+            2,
+            "Bob",
+            "new",
+            1,
+            poll_answer=False,
+            override_answer=True,
+            driver_id=1,
+            return_time=ReturnTime.AFTER_WORK,
+        )
+
+    def test_not_voted(self) -> None:
+        """Test that setting the return time of an answer that does not exist raises."""
+        with pytest.raises(NotVotedError):
+            asyncio.run(set_return_time(1, "old", 1, ReturnTime.LATE))
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+
+from carpoolerbot.database import poll_cache as poll_cache_module
+from carpoolerbot.database.models import PollAnswer, PollReport, TelegramUser, WeeklyPoll
+from carpoolerbot.database.poll_cache import CachedPoll, PollStateCache
+
+
+def create_cached_poll(poll_id: str = "test_poll", *, is_open: bool = True) -> CachedPoll:
+    """Create a poll with one user that voted for Monday and one daily report."""
+    poll = WeeklyPoll(poll_id=poll_id, chat_id=-100, message_id=1, options=["Monday", "Tuesday"], is_open=is_open)
+    user = TelegramUser(user_id=1, user_fullname="Alice")
+    cached = CachedPoll(poll=poll, users={1: user})
+    for poll_option_id in range(2):
+        answer = PollAnswer(
+            user_id=1,
+            poll_id=poll_id,
+            poll_option_id=poll_option_id,
+            poll_answer=poll_option_id == 0,
+            override_answer=None,
+            driver_id=None,
+            return_time=0,
+        )
+        answer.user = user
+        cached.answers[1, poll_option_id] = answer
+    report = PollReport(poll_id=poll_id, chat_id=-100, message_id=2, poll_option_id=0, sent_timestamp=0)
+    cached.reports[-100, 2] = report
+    return cached
+
+
+@pytest.fixture
+def loads(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Replace the database load with one building the poll in memory and recording the loaded poll ids."""
+    calls: list[str] = []
+
+    async def _load_poll(poll_id: str) -> CachedPoll | None:
+        calls.append(poll_id)
+        await asyncio.sleep(0)
+        return create_cached_poll(poll_id, is_open=poll_id != "closed_poll")
+
+    monkeypatch.setattr(poll_cache_module, "_load_poll", _load_poll)
+    return calls
+
+
+class TestPollStateCache:
+    """Tests for PollStateCache class."""
+
+    def test_disabled(self, loads: list[str]) -> None:
+        """Test that a disabled cache never loads anything."""
+        cache = PollStateCache(enabled=False)
+        assert asyncio.run(cache.get("test_poll")) is None
+        assert loads == []
+
+    def test_loads_once(self, loads: list[str]) -> None:
+        """Test that a poll is read from the database only the first time."""
+        cache = PollStateCache(enabled=True)
+
+        async def _run() -> None:
+            await cache.get("test_poll")
+            await cache.get("test_poll")
+            assert await cache.get_by_report(-100, 2)
+
+        asyncio.run(_run())
+        assert loads == ["test_poll"]
+
+    def test_closed_poll_is_not_kept(self, loads: list[str]) -> None:
+        """Test that closed polls are always read from the database."""
+        cache = PollStateCache(enabled=True)
+
+        async def _run() -> None:
+            await cache.get("closed_poll")
+            await cache.get("closed_poll")
+
+        asyncio.run(_run())
+        assert loads == ["closed_poll", "closed_poll"]
+
+    def test_write_during_load_discards_load(self, loads: list[str]) -> None:
+        """Test that a state loaded concurrently with a write is not kept."""
+        cache = PollStateCache(enabled=True)
+
+        async def _run() -> None:
+            load = asyncio.create_task(cache.get("test_poll"))
+            await asyncio.sleep(0)
+            cache.invalidate("test_poll")
+            await load
+            await cache.get("test_poll")
+
+        asyncio.run(_run())
+        assert loads == ["test_poll", "test_poll"]
+
+    @pytest.mark.usefixtures("loads")
+    def test_upsert_answers(self) -> None:
+        """Test that a vote updates the existing answers and adds the ones of new users."""
+        cache = PollStateCache(enabled=True)
+
+        async def _run() -> CachedPoll | None:
+            await cache.get("test_poll")
+            cache.upsert_answers("test_poll", TelegramUser(user_id=1, user_fullname="Alice B."), {0: False, 1: True})
+            cache.upsert_answers("test_poll", TelegramUser(user_id=2, user_fullname="Bob"), {0: True, 1: False})
+            return await cache.get("test_poll")
+
+        cached = asyncio.run(_run())
+        assert cached
+        assert cached.answers[1, 0].poll_answer is False
+        assert cached.answers[1, 1].poll_answer is True
+        assert cached.answers[1, 1].user.user_fullname == "Alice B."
+        assert cached.answers[2, 0].poll_answer is True
+        assert cached.answers[2, 0].user.user_fullname == "Bob"
+        assert cached.answers[2, 0].return_time == 0
+
+    @pytest.mark.usefixtures("loads")
+    def test_update_answer(self) -> None:
+        """Test that the columns of an updated answer are copied onto the cached one."""
+        cache = PollStateCache(enabled=True)
+        updated = PollAnswer(
+            user_id=1,
+            poll_id="test_poll",
+            poll_option_id=0,
+            poll_answer=True,
+            override_answer=False,
+            driver_id=1,
+            return_time=2,
+        )
+
+        async def _run() -> CachedPoll | None:
+            await cache.get("test_poll")
+            cache.update_answer(updated)
+            return await cache.get("test_poll")
+
+        cached = asyncio.run(_run())
+        assert cached
+        answer = cached.answers[1, 0]
+        assert (answer.override_answer, answer.driver_id, answer.return_time) == (False, 1, 2)
+        assert answer.user.user_fullname == "Alice"
+
+    @pytest.mark.usefixtures("loads")
+    def test_add_report(self) -> None:
+        """Test that a new report is reachable from its message."""
+        cache = PollStateCache(enabled=True)
+        report = PollReport(poll_id="test_poll", chat_id=-100, message_id=3, poll_option_id=None, sent_timestamp=0)
+
+        async def _run() -> CachedPoll | None:
+            await cache.get("test_poll")
+            cache.add_report(report)
+            return await cache.get_by_report(-100, 3)
+
+        cached = asyncio.run(_run())
+        assert cached
+        assert cached.reports[-100, 3] is report
+        assert report.weekly_poll is cached.poll
+
+    def test_invalidate(self, loads: list[str]) -> None:
+        """Test that an invalidated poll is read again from the database."""
+        cache = PollStateCache(enabled=True)
+
+        async def _run() -> None:
+            await cache.get("test_poll")
+            cache.invalidate("test_poll")
+            assert await cache.get_by_report(-100, 2) is None
+            await cache.get("test_poll")
+
+        asyncio.run(_run())
+        assert loads == ["test_poll", "test_poll"]
@@ -0,0 +1,138 @@
+import asyncio
+from collections.abc import Callable, Coroutine
+from typing import Any
+
+import pytest
+from pydantic import ValidationError
+from sqlalchemy import Engine, insert, text
+from sqlalchemy.exc import DBAPIError
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from carpoolerbot.database.locks import chat_lock
+from carpoolerbot.database.models import WeeklyPoll
+from carpoolerbot.database.repositories.poll import get_latest_poll
+from carpoolerbot.database.repositories.poll_answers import set_driver_id
+from carpoolerbot.database.session import AsyncSession, async_connect_args, pool_options, retry_on_disconnect
+from carpoolerbot.settings import Settings
+
+OPTIONS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+def _terminate_other_connections(pg_engine: Engine) -> None:
+    """Close the connections of the pool on the server side, as a database restart does."""
+    with pg_engine.connect() as conn:
+        conn.execute(
+            text(
+                "SELECT pg_terminate_backend(pid) FROM pg_stat_activity "
+                "WHERE datname = current_database() AND pid <> pg_backend_pid()",
+            ),
+        )
+
+
+def _with_pooled_engine(pg_engine: Engine, config: Settings, body: Callable[[], Coroutine[Any, Any, None]]) -> None:
+    """Run the body with the sessions of the repositories bound to a pooled engine configured as the bot's."""
+
+    async def _run() -> None:
+        async_engine = create_async_engine(
+            pg_engine.url.set(drivername="postgresql+asyncpg"),
+            connect_args=async_connect_args(config),
+            **pool_options(config, pre_ping=config.DB_POOL_PRE_PING),
+        )
+        AsyncSession.configure(bind=async_engine)
+        try:
+            await body()
+        finally:
+            await async_engine.dispose()
+
+    original_bind = AsyncSession.kw["bind"]
+    try:
+        asyncio.run(_run())
+    finally:
+        AsyncSession.configure(bind=original_bind)
+
+
+@pytest.fixture
+def seeded_engine(pg_repositories: Engine) -> Engine:
+    with pg_repositories.begin() as conn:
+        conn.execute(
+            insert(WeeklyPoll),
+            [{"poll_id": "poll", "chat_id": -1, "message_id": 10, "options": OPTIONS, "is_open": True}],
+        )
+    return pg_repositories
+
+
+class TestRetryOnDisconnect:
+    """Tests for retry_on_disconnect function."""
+
+    def test_repository_after_restart(self, seeded_engine: Engine) -> None:
+        """Test that the repository functions and the chat lock run again on a new connection."""
+
+        async def _body() -> None:
+            assert await get_latest_poll(-1)
+            _terminate_other_connections(seeded_engine)
+            latest_poll = await get_latest_poll(-1)
+            assert latest_poll
+            assert latest_poll.poll_id == "poll"
+
+            _terminate_other_connections(seeded_engine)
+            async with chat_lock(-1):
+                pass
+
+        _with_pooled_engine(seeded_engine, Settings(DB_POOL_PRE_PING=False), _body)
+
+    def test_toggle_not_run_again(self, seeded_engine: Engine) -> None:
+        """Test that a write that cannot run twice, as toggling the driver, fails on a lost connection."""
+
+        async def _body() -> None:
+            assert await get_latest_poll(-1)
+            _terminate_other_connections(seeded_engine)
+            # Running it again would raise NotVotedError, as nobody voted
+            with pytest.raises(DBAPIError):
+                await set_driver_id(1, "poll", 0, 1, toggle=True)
+
+        _with_pooled_engine(seeded_engine, Settings(DB_POOL_PRE_PING=False), _body)
+
+    @pytest.mark.usefixtures("pg_repositories")
+    def test_other_errors_are_raised(self) -> None:
+        """Test that the errors other than a lost connection are raised without running the function again."""
+        calls = 0
+
+        @retry_on_disconnect
+        async def _failing() -> None:
+            nonlocal calls
+            calls += 1
+            async with AsyncSession() as s:
+                await s.execute(text("SELECT * FROM missing_table"))
+
+        with pytest.raises(DBAPIError):
+            asyncio.run(_failing())
+        assert calls == 1
+
+
+class TestPgBouncer:
+    """Tests for the PgBouncer transaction pooling mode."""
+
+    def test_statements_are_not_prepared_twice(self, seeded_engine: Engine) -> None:
+        """Test that the repository functions work with the prepared statement caches disabled."""
+
+        async def _body() -> None:
+            for _ in range(3):
+                latest_poll = await get_latest_poll(-1)
+                assert latest_poll
+                assert latest_poll.poll_id == "poll"
+
+        _with_pooled_engine(seeded_engine, Settings(DB_PGBOUNCER=True), _body)
+
+    def test_connect_args(self) -> None:
+        """Test that the prepared statements of asyncpg are only disabled in PgBouncer mode."""
+        assert async_connect_args(Settings()) == {}
+
+        connect_args = async_connect_args(Settings(DB_PGBOUNCER=True))
+        assert connect_args["statement_cache_size"] == 0
+        assert connect_args["prepared_statement_cache_size"] == 0
+        assert connect_args["prepared_statement_name_func"]() != connect_args["prepared_statement_name_func"]()
+
+    def test_replica_mode_rejected(self) -> None:
+        """Test that replica mode cannot be used through PgBouncer, the scheduler lock needs a session."""
+        with pytest.raises(ValidationError, match="DB_PGBOUNCER"):
+            Settings(REPLICA_MODE=True, DB_PGBOUNCER=True)
@@ -0,0 +1,274 @@
+import asyncio
+import itertools
+import json
+import random
+from collections import Counter
+from collections.abc import Callable
+from dataclasses import dataclass, field
+from typing import Any
+
+import tornado.web
+from telegram.request import BaseRequest, RequestData
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+type JSONDict = dict[str, Any]
+type Observer = Callable[[str, JSONDict, float], None]
+
+BOT_USER = {"id": 7000000001, "is_bot": True, "first_name": "CarpoolerBot", "username": "carpoolerbot"}
+DATE = 1792224000
+
+# Requests of the updater, which are neither delayed nor rate limited
+POLLING_METHODS = {"getMe", "getUpdates", "deleteWebhook", "close", "logOut"}
+_TRUE_METHODS = {
+    "answerCallbackQuery",
+    "deleteMessage",
+    "deleteWebhook",
+    "pinChatMessage",
+    "setMyCommands",
+    "setWebhook",
+    "unpinChatMessage",
+}
+
+
+@dataclass
+class FakeChat:
+    chat_id: int
+    messages: dict[int, JSONDict] = field(default_factory=dict)
+    polls: dict[str, JSONDict] = field(default_factory=dict)
+    _message_ids: "itertools.count[int]" = field(default_factory=lambda: itertools.count(1))
+
+    def add_message(self, sender: JSONDict, message_id: int | None = None, **content: Any) -> JSONDict:  # noqa: ANN401
+        """Add a message, the ID is only given for the messages sent before, e.g. those of a seeded database."""
+        message = {
+            "message_id": message_id or next(self._message_ids),
+            "date": DATE,
+            "chat": {"id": self.chat_id, "type": "supergroup", "title": f"Carpool {self.chat_id}"},
+            "from": sender,
+            **content,
+        }
+        self.messages[message["message_id"]] = message
+        return message
+
+    def add_poll(self, params: JSONDict, message_id: int | None = None) -> JSONDict:
+        """Add a message of the bot with a poll, given by the parameters of ``sendPoll``."""
+        message = self.add_message(BOT_USER, message_id)
+        poll = _poll(f"{self.chat_id}:{message['message_id']}", params)
+        self.polls[poll["id"]] = message["poll"] = poll
+        return message
+
+
+class FakeBotApiServer:
+    """
+    Local stand-in for the Bot API, for ``Application.builder().base_url(server.base_url)`` once started.
+
+    A bot can also send its requests straight to it, without HTTP, with ``.request(FakeBotApiRequest(server))``.
+    It answers the methods used by the bot with the messages and polls it keeps for each chat, and serves the updates
+    pushed with :meth:`push_update` through ``getUpdates``. Every other request is delayed by ``latency`` seconds and
+    answered with a 429 error carrying ``retry_after`` with a probability of ``rate_limit_ratio``. Observers are
+    called with the method, the parameters and the time of every request, on the event loop clock.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        rate_limit_ratio: float = 0.0,
+        retry_after: int = 1,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.rate_limit_ratio = rate_limit_ratio
+        self.retry_after = retry_after
+        self.chats: dict[int, FakeChat] = {}
+        self.calls: Counter[str] = Counter()
+        self.rate_limited: Counter[str] = Counter()
+        self.observers: list[Observer] = []
+        self._rng = random.Random(seed)
+        self._updates: list[JSONDict] = []
+        self._update_ids = itertools.count(1)
+        self._new_updates = asyncio.Event()
+        self._server: HTTPServer | None = None
+        self.port = 0
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/bot"
+
+    async def start(self) -> None:
+        app = tornado.web.Application([(r"/bot[^/]+/(\w+)", _MethodHandler)], api=self)
+        sockets = bind_sockets(0, "127.0.0.1")
+        self.port = sockets[0].getsockname()[1]
+        self._server = HTTPServer(app)
+        self._server.add_sockets(sockets)
+
+    async def stop(self) -> None:
+        # Answer the pending getUpdates, their requests are left to the event loop otherwise
+        self._new_updates.set()
+        if self._server:
+            self._server.stop()
+            await self._server.close_all_connections()
+
+    def chat(self, chat_id: int) -> FakeChat:
+        if chat_id not in self.chats:
+            self.chats[chat_id] = FakeChat(chat_id)
+        return self.chats[chat_id]
+
+    def push_update(self, **update: Any) -> int:  # noqa: ANN401
+        """Queue an update for the next ``getUpdates``, return its ID."""
+        update_id = next(self._update_ids)
+        self._updates.append({"update_id": update_id, **update})
+        self._new_updates.set()
+        return update_id
+
+    def push_command(self, chat_id: int, sender: JSONDict, command: str) -> int:
+        entities = [{"offset": 0, "length": len(command) + 1, "type": "bot_command"}]
+        return self.push_update(message=self.chat(chat_id).add_message(sender, text=f"/{command}", entities=entities))
+
+    async def get_updates(self, offset: int, limit: int, long_polling: float) -> list[JSONDict]:
+        # The updates before the offset have been received by the bot
+        self._updates = [update for update in self._updates if update["update_id"] >= offset]
+        if not self._updates:
+            self._new_updates.clear()
+            try:
+                await asyncio.wait_for(self._new_updates.wait(), long_polling)
+            except TimeoutError:
+                return []
+        return self._updates[:limit]
+
+    async def call(self, method: str, params: JSONDict) -> tuple[int, JSONDict]:
+        """Answer a request as the Bot API, return the status code and the body."""
+        self.calls[method] += 1
+        now = asyncio.get_running_loop().time()
+        for observer in self.observers:
+            observer(method, params, now)
+
+        if method == "getUpdates":
+            updates = await self.get_updates(
+                params.get("offset", 0),
+                params.get("limit", 100),
+                params.get("timeout", 0),
+            )
+            return 200, {"ok": True, "result": updates}
+
+        if method not in POLLING_METHODS:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if self._rng.random() < self.rate_limit_ratio:
+                self.rate_limited[method] += 1
+                return 429, {
+                    "ok": False,
+                    "error_code": 429,
+                    "description": f"Too Many Requests: retry after {self.retry_after}",
+                    "parameters": {"retry_after": self.retry_after},
+                }
+
+        try:
+            result = self._result(method, params)
+        except KeyError as exc:
+            # E.g. a message sent before the fake started, or a missing parameter
+            return 400, {"ok": False, "error_code": 400, "description": f"Bad Request: {exc} not found"}
+        if result is None:
+            return 404, {"ok": False, "error_code": 404, "description": "Not Found"}
+        return 200, {"ok": True, "result": result}
+
+    def _result(self, method: str, params: JSONDict) -> Any:  # noqa: ANN401
+        if method == "getMe":
+            return BOT_USER
+        if method in _TRUE_METHODS:
+            return True
+
+        if "chat_id" not in params:
+            return None
+
+        chat = self.chat(int(params["chat_id"]))
+        result = None
+        match method:
+            case "sendMessage":
+                result = chat.add_message(BOT_USER, text=str(params["text"]))
+                if "reply_markup" in params:
+                    result["reply_markup"] = params["reply_markup"]
+            case "editMessageText":
+                result = chat.messages[int(params["message_id"])]
+                result["text"] = str(params["text"])
+                if "reply_markup" in params:
+                    result["reply_markup"] = params["reply_markup"]
+            case "sendPoll":
+                result = chat.add_poll(params)
+            case "stopPoll":
+                result = chat.messages[int(params["message_id"])]["poll"]
+                result["is_closed"] = True
+        return result
+
+
+class FakeBotApiRequest(BaseRequest):
+    """Send the requests of a bot straight to the fake Bot API, in the event loop of the bot."""
+
+    def __init__(self, api: FakeBotApiServer) -> None:
+        self.api = api
+
+    @property
+    def read_timeout(self) -> float | None:
+        return None
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,  # noqa: ARG002
+        request_data: RequestData | None = None,
+        read_timeout: Any = None,  # noqa: ARG002, ANN401
+        write_timeout: Any = None,  # noqa: ARG002, ANN401
+        connect_timeout: Any = None,  # noqa: ARG002, ANN401
+        pool_timeout: Any = None,  # noqa: ARG002, ANN401
+    ) -> tuple[int, bytes]:
+        params = request_data.parameters if request_data else {}
+        status, body = await self.api.call(url.rsplit("/", 1)[-1], params)
+        return status, json.dumps(body).encode()
+
+
+class _MethodHandler(tornado.web.RequestHandler):
+    SUPPORTED_METHODS = ("POST",)
+
+    # The requests are answered as soon as they are read, post cannot be a coroutine for the type checkers
+    async def prepare(self) -> None:
+        # The method is the only group of the route
+        assert self.path_args
+        (method,) = self.path_args
+        api: FakeBotApiServer = self.settings["api"]
+        params = {name: _parse_value(values[0].decode()) for name, values in self.request.body_arguments.items()}
+        status, body = await api.call(method, params)
+        self.set_status(status)
+        self.set_header("Content-Type", "application/json")
+        self.finish(json.dumps(body))
+
+
+def _parse_value(value: str) -> Any:  # noqa: ANN401
+    """Decode a parameter, sent as a form field that is JSON encoded unless it is a string."""
+    try:
+        return json.loads(value)
+    except json.JSONDecodeError:
+        return value
+
+
+def _poll(poll_id: str, params: JSONDict) -> JSONDict:
+    return {
+        "id": poll_id,
+        "question": str(params["question"]),
+        "options": [
+            {"persistent_id": str(i), "text": option["text"], "voter_count": 0}
+            for i, option in enumerate(params["options"])
+        ],
+        "total_voter_count": 0,
+        "is_closed": False,
+        "is_anonymous": params.get("is_anonymous", True),
+        "type": "regular",
+        "allows_multiple_answers": params.get("allows_multiple_answers", False),
+        "allows_revoting": True,
+        "members_only": False,
+    }
@@ -0,0 +1,115 @@
+import asyncio
+import itertools
+from unittest.mock import AsyncMock, MagicMock
+
+from sqlalchemy import Engine, insert, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from carpoolerbot.database.models import WeeklyPoll
+from carpoolerbot.database.repositories import poll as poll_repository
+from carpoolerbot.database.repositories.poll import get_latest_polls
+from carpoolerbot.database.session import AsyncSession, pool_options
+from carpoolerbot.poll.common import send_poll, send_prefetched_poll
+from carpoolerbot.settings import Settings
+
+POOL_SETTINGS = Settings(DB_POOL_SIZE=2, DB_MAX_OVERFLOW=1)
+SENDS = 12
+OPTIONS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+
+
+def create_bot() -> AsyncMock:
+    """Create a bot whose sent polls take a while, so that the sends overlap."""
+    message_ids = itertools.count(1)
+
+    async def _send_poll(*_args: object, **_kwargs: object) -> MagicMock:
+        await asyncio.sleep(0.01)
+        message = MagicMock(id=next(message_ids))
+        message.poll.id = f"poll-{message.id}"
+        message.pin = AsyncMock()
+        return message
+
+    bot = AsyncMock()
+    bot.send_poll.side_effect = _send_poll
+    return bot
+
+
+def _send_polls(pg_engine: Engine, bot: AsyncMock, chat_ids: list[int]) -> None:
+    """Send the polls at the same time, with the repositories on a pool smaller than the number of sends."""
+
+    async def _run() -> None:
+        async_engine = create_async_engine(
+            pg_engine.url.set(drivername="postgresql+asyncpg"),
+            pool_timeout=5,
+            **pool_options(POOL_SETTINGS, pre_ping=False),
+        )
+        AsyncSession.configure(bind=async_engine)
+        try:
+            await asyncio.gather(*(send_poll(bot, chat_id) for chat_id in chat_ids))
+        finally:
+            await async_engine.dispose()
+
+    original_bind = AsyncSession.kw["bind"]
+    try:
+        asyncio.run(_run())
+    finally:
+        AsyncSession.configure(bind=original_bind)
+
+
+class TestSendPoll:
+    """Tests for send_poll function."""
+
+    def test_more_chats_than_connections(self, pg_repositories: Engine) -> None:
+        """Test that concurrent sends to more chats than pooled connections do not wait for a connection forever."""
+        _send_polls(pg_repositories, create_bot(), [-i for i in range(1, SENDS + 1)])
+
+        with pg_repositories.connect() as conn:
+            assert conn.scalar(text("SELECT count(*) FROM weekly_polls WHERE is_open")) == SENDS
+
+    def test_same_chat(self, pg_repositories: Engine) -> None:
+        """Test that concurrent sends to a chat leave a single open poll, the others are stopped."""
+        bot = create_bot()
+        _send_polls(pg_repositories, bot, [-1] * SENDS)
+
+        with pg_repositories.connect() as conn:
+            open_polls = conn.execute(text("SELECT message_id FROM weekly_polls WHERE is_open")).all()
+            assert conn.scalar(text("SELECT count(*) FROM weekly_polls")) == SENDS
+        assert len(open_polls) == 1
+        stopped = {call.args[1] for call in bot.stop_poll.await_args_list}
+        assert stopped == set(range(1, SENDS + 1)) - {open_polls[0].message_id}
+        # Only the open poll can get votes, the options count of the others is not kept
+        cached_poll_ids = set(poll_repository._poll_options_count)  # noqa: SLF001
+        assert f"poll-{open_polls[0].message_id}" in cached_poll_ids
+        assert not cached_poll_ids & {f"poll-{message_id}" for message_id in stopped}
+
+
+class TestSendPrefetchedPoll:
+    """Tests for get_latest_polls and send_prefetched_poll functions."""
+
+    def test_stops_prefetched_polls(self, pg_repositories: Engine) -> None:
+        """Test that the latest poll of each chat is read with one query, then stopped when the new poll is sent."""
+        with pg_repositories.begin() as conn:
+            conn.execute(
+                insert(WeeklyPoll),
+                [
+                    {"poll_id": "old", "chat_id": -1, "message_id": 10, "options": OPTIONS, "is_open": False},
+                    {"poll_id": "new", "chat_id": -1, "message_id": 20, "options": OPTIONS, "is_open": True},
+                    {"poll_id": "other", "chat_id": -2, "message_id": 30, "options": OPTIONS, "is_open": True},
+                ],
+            )
+        bot = create_bot()
+
+        async def _run() -> dict[int, WeeklyPoll]:
+            latest_polls = await get_latest_polls([-1, -2, -3])
+            for chat_id in (-1, -2, -3):
+                await send_prefetched_poll(bot, chat_id, latest_polls.get(chat_id))
+            return latest_polls
+
+        latest_polls = asyncio.run(_run())
+
+        assert {chat_id: latest_poll.poll_id for chat_id, latest_poll in latest_polls.items()} == {
+            -1: "new",
+            -2: "other",
+        }
+        assert [call.args[:2] for call in bot.stop_poll.await_args_list] == [(-1, 20), (-2, 30)]
+        with pg_repositories.connect() as conn:
+            assert conn.scalar(text("SELECT count(*) FROM weekly_polls WHERE is_open")) == 3
@@ -0,0 +1,120 @@
+import asyncio
+from unittest.mock import AsyncMock
+
+import pytest
+
+from carpoolerbot.database.models import PollReport
+from carpoolerbot.poll_report import common
+from carpoolerbot.poll_report.common import report_content_hash, update_poll_report
+from carpoolerbot.poll_report.types import PollAnswerRow
+
+# Full report of the answers of create_poll_answers
+REPORT_TEXT = '<b>Monday</b>:\n<a href="tg://user?id=1">Alice</a>'
+
+
+def create_poll_report(message_id: int, content_hash: str | None = None) -> PollReport:
+    """Create a full poll result report for testing."""
+    return PollReport(
+        poll_id="test_poll",
+        chat_id=-100,
+        message_id=message_id,
+        poll_option_id=None,
+        sent_timestamp=0,
+        content_hash=content_hash,
+    )
+
+
+def create_poll_answers() -> list[PollAnswerRow]:
+    """Create a single positive answer for testing."""
+    return [
+        PollAnswerRow(
+            1,
+            "Alice",
+            "test_poll",
+            0,
+            poll_answer=True,
+            override_answer=None,
+            driver_id=None,
+            return_time=0,
+        ),
+    ]
+
+
+@pytest.fixture(autouse=True)
+def persisted_hashes(monkeypatch: pytest.MonkeyPatch) -> dict[tuple[int, int], str]:
+    """Replace the database write of the content hashes and start from an empty in-memory state."""
+    persisted: dict[tuple[int, int], str] = {}
+
+    async def _set_poll_report_content_hash(chat_id: int, message_id: int, content_hash: str) -> None:
+        persisted[chat_id, message_id] = content_hash
+
+    monkeypatch.setattr(common, "set_poll_report_content_hash", _set_poll_report_content_hash)
+    monkeypatch.setattr(common, "_report_content_hashes", {})
+    return persisted
+
+
+class TestUpdatePollReport:
+    """Tests for update_poll_report function."""
+
+    def test_edits_changed_report(self, persisted_hashes: dict[tuple[int, int], str]) -> None:
+        """Test that a report with new content is edited and its hash kept in memory only."""
+        bot = AsyncMock()
+        asyncio.run(update_poll_report(bot, create_poll_answers(), create_poll_report(1)))
+
+        bot.edit_message_text.assert_awaited_once()
+        assert (-100, 1) in common._report_content_hashes  # noqa: SLF001
+        assert persisted_hashes == {}
+
+    def test_replica_mode_persists_hash(
+        self,
+        persisted_hashes: dict[tuple[int, int], str],
+        monkeypatch: pytest.MonkeyPatch,
+    ) -> None:
+        """Test that in replica mode the hash of the edited report is stored for the other replicas."""
+        monkeypatch.setattr(common.settings, "REPLICA_MODE", True)
+        bot = AsyncMock()
+        asyncio.run(update_poll_report(bot, create_poll_answers(), create_poll_report(1)))
+
+        bot.edit_message_text.assert_awaited_once()
+        assert (-100, 1) in persisted_hashes
+        assert common._report_content_hashes == {}  # noqa: SLF001
+
+    def test_skips_unchanged_report(self) -> None:
+        """Test that rendering the same content twice only edits the message once."""
+        bot = AsyncMock()
+        report = create_poll_report(1)
+        asyncio.run(update_poll_report(bot, create_poll_answers(), report))
+        asyncio.run(update_poll_report(bot, create_poll_answers(), report))
+
+        bot.edit_message_text.assert_awaited_once()
+
+    def test_replica_mode_skips_report_with_persisted_hash(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that in replica mode the hash stored on the report is used."""
+        monkeypatch.setattr(common.settings, "REPLICA_MODE", True)
+        bot = AsyncMock()
+        report = create_poll_report(1, content_hash=report_content_hash(REPORT_TEXT, None))
+        asyncio.run(update_poll_report(bot, create_poll_answers(), report))
+
+        bot.edit_message_text.assert_not_awaited()
+
+    def test_edits_report_unknown_in_memory(self) -> None:
+        """Test that the hash the report was sent with is not trusted, as later edits do not update it."""
+        bot = AsyncMock()
+        report = create_poll_report(1, content_hash=report_content_hash(REPORT_TEXT, None))
+        asyncio.run(update_poll_report(bot, create_poll_answers(), report))
+
+        bot.edit_message_text.assert_awaited_once()
+
+
+class TestRememberReportContent:
+    """Tests for remember_report_content function."""
+
+    def test_least_recently_sent_dropped(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that the hashes are bounded, the report sent the longest ago is dropped first."""
+        monkeypatch.setattr(common, "_MAX_REPORT_CONTENT_HASHES", 2)
+        common.remember_report_content(-100, 1, "a")
+        common.remember_report_content(-100, 2, "b")
+        common.remember_report_content(-100, 1, "c")
+        common.remember_report_content(-100, 3, "d")
+
+        assert common._report_content_hashes == {(-100, 1): "c", (-100, 3): "d"}  # noqa: SLF001
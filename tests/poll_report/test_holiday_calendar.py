@@ -0,0 +1,25 @@
+import datetime
+
+from carpoolerbot.poll_report.holiday_calendar import get_holiday
+from carpoolerbot.poll_report.message_serializers import whos_on_text
+
+
+class TestGetHoliday:
+    """Tests for get_holiday function."""
+
+    def test_holiday(self) -> None:
+        """Test that a holiday of the configured country is found."""
+        assert get_holiday(datetime.date(2025, 7, 4)) == "Independence Day"
+
+    def test_holiday_from_datetime(self) -> None:
+        """Test that a datetime is looked up by the day it falls on."""
+        assert get_holiday(datetime.datetime(2025, 7, 4, 18, 30)) == "Independence Day"
+
+    def test_working_day(self) -> None:
+        """Test that a working day is not a holiday."""
+        assert get_holiday(datetime.date(2025, 7, 3)) is None
+
+    def test_whos_on_text_on_holiday(self) -> None:
+        """Test the daily report on a holiday."""
+        result = whos_on_text([], datetime.datetime(2025, 7, 4))
+        assert result == "I hope you are on holiday tomorrow, happy <b>Independence Day</b>!"
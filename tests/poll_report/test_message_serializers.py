@@ -1,14 +1,14 @@
 import calendar
 import datetime
 
-from carpoolerbot.database.models import PollAnswer, TelegramUser
 from carpoolerbot.poll_report.message_serializers import (
     _format_user_answer,
     _sorted_positive_answers,
     full_poll_result,
     whos_on_text,
 )
-from carpoolerbot.poll_report.types import ReturnTime
+from carpoolerbot.poll_report.render_cache import report_render_cache
+from carpoolerbot.poll_report.types import PollAnswerRow, RenderKey, ReturnTime
 
 
 def create_poll_answer(
@@ -20,14 +20,11 @@ def create_poll_answer(
     override_answer: bool | None = None,
     driver_id: int | None = None,
     return_time: int = ReturnTime.AFTER_WORK,
-) -> PollAnswer:
-    """Create a PollAnswer object for testing."""
-    # Create a real TelegramUser instance
-    user = TelegramUser(user_id=user_id, user_fullname=user_fullname)
-
-    # Create a real PollAnswer instance
-    answer = PollAnswer(
+) -> PollAnswerRow:
+    """Create a PollAnswerRow for testing."""
+    return PollAnswerRow(
         user_id=user_id,
+        user_fullname=user_fullname,
         poll_id=poll_id,
         poll_option_id=poll_option_id,
         poll_answer=poll_answer,
@@ -35,10 +32,6 @@ def create_poll_answer(
         driver_id=driver_id,
         return_time=return_time,
     )
-    # Set the user relationship manually (without database)
-    answer.user = user
-
-    return answer
 
 
 class TestFormatUserAnswer:
@@ -99,8 +92,8 @@ class TestSortedPositiveAnswers:
         ]
         result = _sorted_positive_answers(answers)
         assert len(result) == 2
-        assert result[0].user.user_fullname == "Alice"
-        assert result[1].user.user_fullname == "Charlie"
+        assert result[0].user_fullname == "Alice"
+        assert result[1].user_fullname == "Charlie"
 
     def test_filters_out_override_false(self) -> None:
         """Test that override_answer=False filters out positive answers."""
@@ -111,8 +104,8 @@ class TestSortedPositiveAnswers:
         ]
         result = _sorted_positive_answers(answers)
         assert len(result) == 2
-        assert result[0].user.user_fullname == "Alice"
-        assert result[1].user.user_fullname == "Charlie"
+        assert result[0].user_fullname == "Alice"
+        assert result[1].user_fullname == "Charlie"
 
     def test_sorts_by_fullname(self) -> None:
         """Test that results are sorted by user fullname (case-insensitive)."""
@@ -123,9 +116,9 @@ class TestSortedPositiveAnswers:
         ]
         result = _sorted_positive_answers(answers)
         assert len(result) == 3
-        assert result[0].user.user_fullname == "alice"
-        assert result[1].user.user_fullname == "Bob"
-        assert result[2].user.user_fullname == "Zoe"
+        assert result[0].user_fullname == "alice"
+        assert result[1].user_fullname == "Bob"
+        assert result[2].user_fullname == "Zoe"
 
     def test_empty_list(self) -> None:
         """Test with empty list."""
@@ -340,3 +333,15 @@ class TestFullPollResult:
         wednesday_section = result.split("<b>Wednesday</b>:")[1]
         assert "🎯 Alice" in wednesday_section
         assert "Bob" not in wednesday_section
+
+    def test_cached_sections(self) -> None:
+        """Test that the report rendered from the cached day sections is the same as the uncached one."""
+        answers = [
+            create_poll_answer(1, "Alice", poll_option_id=0, driver_id=1),
+            create_poll_answer(2, "Bob", poll_option_id=1, driver_id=-1),
+            create_poll_answer(3, "Charlie", poll_option_id=1, poll_answer=False),
+        ]
+        render_key = RenderKey("test_cached_sections", report_render_cache.write_count)
+
+        assert full_poll_result(answers, render_key) == full_poll_result(answers)
+        assert full_poll_result(answers, render_key) == full_poll_result(answers)
@@ -0,0 +1,83 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from carpoolerbot.poll_report import refresher
+from carpoolerbot.poll_report.refresher import PollReportRefresher
+
+
+@pytest.fixture
+def refreshed_polls(monkeypatch: pytest.MonkeyPatch) -> list[str]:
+    """Replace the actual reports update with one recording the refreshed poll ids."""
+    calls: list[str] = []
+
+    async def _update_all_poll_reports(_: object, poll_id: str) -> None:
+        calls.append(poll_id)
+        await asyncio.sleep(0.02)
+
+    monkeypatch.setattr(refresher, "update_all_poll_reports", _update_all_poll_reports)
+    return calls
+
+
+class TestPollReportRefresher:
+    """Tests for PollReportRefresher."""
+
+    def test_burst_is_collapsed(self, refreshed_polls: list[str]) -> None:
+        """Test that many answers within the delay cause a single refresh."""
+
+        async def _run() -> None:
+            poll_refresher = PollReportRefresher(delay=0.2)
+            bot = MagicMock()
+            for _ in range(10):
+                poll_refresher.schedule(bot, "poll")
+                await asyncio.sleep(0.001)
+            await asyncio.sleep(0.4)
+
+        asyncio.run(_run())
+        assert refreshed_polls == ["poll"]
+
+    def test_polls_are_independent(self, refreshed_polls: list[str]) -> None:
+        """Test that different polls are refreshed separately."""
+
+        async def _run() -> None:
+            poll_refresher = PollReportRefresher(delay=0.05)
+            poll_refresher.schedule(MagicMock(), "poll_a")
+            poll_refresher.schedule(MagicMock(), "poll_b")
+            await asyncio.sleep(0.2)
+
+        asyncio.run(_run())
+        assert sorted(refreshed_polls) == ["poll_a", "poll_b"]
+
+    def test_answer_during_refresh_triggers_another_one(self, refreshed_polls: list[str]) -> None:
+        """Test that an answer received while editing the reports is not lost."""
+
+        async def _run() -> None:
+            poll_refresher = PollReportRefresher(delay=0.05)
+            poll_refresher.schedule(MagicMock(), "poll")
+            await asyncio.sleep(0.06)  # Now the reports are being updated
+            poll_refresher.schedule(MagicMock(), "poll")
+            await asyncio.sleep(0.2)
+
+        asyncio.run(_run())
+        assert refreshed_polls == ["poll", "poll"]
+
+    def test_failed_refresh_does_not_stop_scheduling(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        """Test that an error while refreshing is logged and the poll can be refreshed again."""
+        calls: list[str] = []
+
+        async def _failing_update(_: object, poll_id: str) -> None:
+            calls.append(poll_id)
+            raise RuntimeError
+
+        monkeypatch.setattr(refresher, "update_all_poll_reports", _failing_update)
+
+        async def _run() -> None:
+            poll_refresher = PollReportRefresher(delay=0.01)
+            poll_refresher.schedule(MagicMock(), "poll")
+            await asyncio.sleep(0.05)
+            poll_refresher.schedule(MagicMock(), "poll")
+            await asyncio.sleep(0.05)
+
+        asyncio.run(_run())
+        assert calls == ["poll", "poll"]
@@ -0,0 +1,100 @@
+from collections.abc import Sequence
+
+from carpoolerbot.poll_report.render_cache import ReportRenderCache
+from carpoolerbot.poll_report.types import PollAnswerRow, RenderKey
+
+ANSWERS = [
+    PollAnswerRow(1, "Alice", "poll", 0, poll_answer=True, override_answer=None, driver_id=None, return_time=0),
+    PollAnswerRow(2, "Bob", "poll", 0, poll_answer=True, override_answer=None, driver_id=None, return_time=0),
+    PollAnswerRow(1, "Alice", "poll", 2, poll_answer=True, override_answer=None, driver_id=None, return_time=0),
+]
+
+
+class _CountingRender:
+    """Render the names of the day answers, counting the renders."""
+
+    def __init__(self) -> None:
+        self.calls = 0
+
+    def __call__(self, day_answers: Sequence[PollAnswerRow]) -> str:
+        self.calls += 1
+        return ",".join(answer.user_fullname for answer in day_answers)
+
+
+class TestReportRenderCache:
+    """Tests for ReportRenderCache class."""
+
+    def test_sections_are_reused(self) -> None:
+        """Test that the section of a day is rendered once, then reused."""
+        cache = ReportRenderCache(enabled=True)
+        render = _CountingRender()
+        key = RenderKey("poll", cache.write_count)
+
+        assert cache.section(key, 0, ANSWERS, render) == "Alice,Bob"
+        assert cache.section(key, 0, ANSWERS, render) == "Alice,Bob"
+        assert cache.days(key, ANSWERS) == [0, 2]
+        assert render.calls == 1
+
+    def test_only_the_written_day_is_rendered_again(self) -> None:
+        """Test that a write to the answers of a day only renders that day again."""
+        cache = ReportRenderCache(enabled=True)
+        render = _CountingRender()
+        key = RenderKey("poll", cache.write_count)
+        cache.section(key, 0, ANSWERS, render)
+        cache.section(key, 2, ANSWERS, render)
+
+        cache.answers_changed("poll", 2)
+        key = RenderKey("poll", cache.write_count)
+        cache.section(key, 0, ANSWERS, render)
+        cache.section(key, 2, ANSWERS, render)
+        assert render.calls == 3
+
+        cache.answers_changed("poll")
+        key = RenderKey("poll", cache.write_count)
+        cache.section(key, 0, ANSWERS, render)
+        cache.section(key, 2, ANSWERS, render)
+        assert render.calls == 5
+
+    def test_answers_read_before_a_write_are_not_cached(self) -> None:
+        """Test that the answers read before a write are rendered, but not cached."""
+        cache = ReportRenderCache(enabled=True)
+        render = _CountingRender()
+        stale_key = RenderKey("poll", cache.write_count)
+        cache.answers_changed("poll", 0)
+
+        cache.section(stale_key, 0, ANSWERS, render)
+        cache.section(RenderKey("poll", cache.write_count), 0, ANSWERS, render)
+        assert render.calls == 2
+
+    def test_renamed_user(self) -> None:
+        """Test that a user changing name drops the cached sections."""
+        cache = ReportRenderCache(enabled=True)
+        render = _CountingRender()
+        cache.section(RenderKey("poll", cache.write_count), 0, ANSWERS, render)
+
+        cache.user_seen(1, "Alice")
+        cache.section(RenderKey("poll", cache.write_count), 0, ANSWERS, render)
+        assert render.calls == 1
+
+        cache.user_seen(1, "Alicia")
+        cache.section(RenderKey("poll", cache.write_count), 0, ANSWERS, render)
+        assert render.calls == 2
+
+    def test_evicted_polls(self) -> None:
+        """Test that only the most recently cached polls are kept."""
+        cache = ReportRenderCache(enabled=True, max_polls=1)
+        render = _CountingRender()
+        cache.section(RenderKey("poll", cache.write_count), 0, ANSWERS, render)
+        cache.section(RenderKey("other_poll", cache.write_count), 0, ANSWERS, render)
+
+        cache.section(RenderKey("poll", cache.write_count), 0, ANSWERS, render)
+        assert render.calls == 3
+
+    def test_disabled(self) -> None:
+        """Test that a disabled cache always renders."""
+        cache = ReportRenderCache(enabled=False)
+        render = _CountingRender()
+        key = RenderKey("poll", cache.write_count)
+        cache.section(key, 0, ANSWERS, render)
+        cache.section(key, 0, ANSWERS, render)
+        assert render.calls == 2
@@ -0,0 +1,90 @@
+import asyncio
+from unittest.mock import MagicMock
+
+import pytest
+
+from carpoolerbot.scheduling.batching import BatchDispatcher
+
+
+class _Recorder:
+    """Prefetch and send functions recording their calls, the send fails for the chats in ``failing``."""
+
+    def __init__(self, failing: frozenset[int] = frozenset()) -> None:
+        self.failing = failing
+        self.prefetched: list[list[int]] = []
+        self.sent: list[tuple[int, str]] = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    async def prefetch(self, chat_ids: list[int]) -> str:
+        self.prefetched.append(sorted(chat_ids))
+        return f"batch {len(self.prefetched)}"
+
+    async def send(self, _bot: object, chat_id: int, prefetched: str) -> None:
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        if chat_id in self.failing:
+            msg = f"Chat {chat_id} is gone"
+            raise RuntimeError(msg)
+        self.sent.append((chat_id, prefetched))
+
+
+def _dispatcher(recorder: _Recorder, concurrency: int = 10) -> BatchDispatcher[str]:
+    return BatchDispatcher(recorder.prefetch, recorder.send, window=0.05, concurrency=concurrency)
+
+
+class TestBatchDispatcher:
+    """Tests for BatchDispatcher class."""
+
+    def test_chats_due_together_are_batched(self) -> None:
+        """Test that the chats submitted within the window share a single prefetch."""
+        recorder = _Recorder()
+
+        async def _run() -> None:
+            dispatcher = _dispatcher(recorder)
+            await asyncio.gather(*(dispatcher.submit(MagicMock(), chat_id) for chat_id in range(5)))
+
+        asyncio.run(_run())
+        assert recorder.prefetched == [[0, 1, 2, 3, 4]]
+        assert sorted(recorder.sent) == [(chat_id, "batch 1") for chat_id in range(5)]
+
+    def test_later_chats_start_a_new_batch(self) -> None:
+        """Test that a chat submitted once the batch is running goes to the next one."""
+        recorder = _Recorder()
+
+        async def _run() -> None:
+            dispatcher = _dispatcher(recorder)
+            await dispatcher.submit(MagicMock(), 1)
+            await dispatcher.submit(MagicMock(), 2)
+
+        asyncio.run(_run())
+        assert recorder.prefetched == [[1], [2]]
+
+    def test_failure_is_raised_in_its_chat_only(self) -> None:
+        """Test that a failed send is raised to the job of its chat, while the others succeed."""
+        recorder = _Recorder(failing=frozenset({2}))
+
+        async def _run() -> list[BaseException | None]:
+            dispatcher = _dispatcher(recorder)
+            return await asyncio.gather(
+                *(dispatcher.submit(MagicMock(), chat_id) for chat_id in range(4)),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(_run())
+        assert [type(result) for result in results] == [type(None), type(None), RuntimeError, type(None)]
+        assert sorted(chat_id for chat_id, _ in recorder.sent) == [0, 1, 3]
+
+    @pytest.mark.parametrize("concurrency", [1, 3])
+    def test_concurrency(self, concurrency: int) -> None:
+        """Test that at most the given number of sends are in flight at the same time."""
+        recorder = _Recorder()
+
+        async def _run() -> None:
+            dispatcher = _dispatcher(recorder, concurrency)
+            await asyncio.gather(*(dispatcher.submit(MagicMock(), chat_id) for chat_id in range(10)))
+
+        asyncio.run(_run())
+        assert recorder.max_in_flight == concurrency
@@ -0,0 +1,142 @@
+import asyncio
+import datetime
+import functools
+import multiprocessing
+import os
+import time
+
+from apscheduler.events import EVENT_JOB_SUBMITTED, JobSubmissionEvent
+from apscheduler.jobstores.sqlalchemy import SQLAlchemyJobStore
+from apscheduler.schedulers.asyncio import AsyncIOScheduler
+from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.schedulers.base import STATE_RUNNING
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import NullPool
+
+from carpoolerbot.scheduling.leader import SchedulerLeader
+
+JOBS_TABLE = "test_leader_jobs"
+REPLICAS = 3
+
+
+def noop_job() -> None:
+    """Job of the replicas, its runs are recorded when they are submitted."""
+
+
+def _record_runs(url: str, event: JobSubmissionEvent) -> None:
+    """Record which process runs the job and the time each run was scheduled at."""
+    engine = create_engine(url, poolclass=NullPool)
+    with engine.begin() as conn:
+        conn.execute(
+            text("INSERT INTO leader_job_runs (pid, scheduled_at) VALUES (:pid, :scheduled_at)"),
+            [{"pid": os.getpid(), "scheduled_at": scheduled_at} for scheduled_at in event.scheduled_run_times],
+        )
+    engine.dispose()
+
+
+def _run_replica(url: str, seconds: float) -> None:
+    async def _run() -> None:
+        scheduler = AsyncIOScheduler(jobstores={"default": SQLAlchemyJobStore(url=url, tablename=JOBS_TABLE)})
+        scheduler.add_listener(functools.partial(_record_runs, url), EVENT_JOB_SUBMITTED)
+        async_engine = create_async_engine(url.replace("postgresql://", "postgresql+asyncpg://", 1))
+        leader = SchedulerLeader(scheduler, async_engine, check_interval=0.2)
+        await leader.start()
+        await asyncio.sleep(seconds)
+        await leader.stop()
+        scheduler.shutdown(wait=False)
+        await async_engine.dispose()
+
+    asyncio.run(_run())
+
+
+def _job_runs(pg_engine: Engine) -> list[tuple[int, datetime.datetime]]:
+    with pg_engine.connect() as conn:
+        return [
+            (row.pid, row.scheduled_at)
+            for row in conn.execute(text("SELECT pid, scheduled_at FROM leader_job_runs ORDER BY scheduled_at"))
+        ]
+
+
+class TestSchedulerLeader:
+    """Tests for SchedulerLeader class, with replicas in separate processes sharing a job store."""
+
+    def test_jobs_run_once_and_fail_over(self, pg_engine: Engine) -> None:
+        """Test that only one replica runs the jobs, and another one takes over when it dies."""
+        url = pg_engine.url.render_as_string(hide_password=False)
+        with pg_engine.begin() as conn:
+            conn.execute(text("CREATE TABLE leader_job_runs (pid integer NOT NULL, scheduled_at timestamptz NOT NULL)"))
+        # Add the job to the shared store without running it
+        scheduler = BackgroundScheduler(jobstores={"default": SQLAlchemyJobStore(url=url, tablename=JOBS_TABLE)})
+        scheduler.start(paused=True)
+        scheduler.add_job(noop_job, "interval", seconds=1, id="noop_job")
+        scheduler.shutdown()
+
+        context = multiprocessing.get_context("spawn")
+        replicas = [context.Process(target=_run_replica, args=(url, 8)) for _ in range(REPLICAS)]
+        try:
+            for replica in replicas:
+                replica.start()
+
+            time.sleep(4)
+            runs = _job_runs(pg_engine)
+            assert runs, "No replica ran the job"
+            assert len({pid for pid, _ in runs}) == 1
+            first_leader = next(replica for replica in replicas if replica.pid == runs[0][0])
+            first_leader.kill()
+
+            for replica in replicas:
+                replica.join(timeout=30)
+            runs = _job_runs(pg_engine)
+        finally:
+            for replica in replicas:
+                replica.kill()
+            with pg_engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS leader_job_runs, {JOBS_TABLE}"))
+
+        pids = [pid for pid, _ in runs]
+        takeover = pids.index(next(pid for pid in pids if pid != first_leader.pid))
+        # The first leader ran the job until it was killed, then a single other replica took over
+        assert set(pids[:takeover]) == {first_leader.pid}
+        assert len(set(pids[takeover:])) == 1
+        # No run was duplicated, every scheduled time of the job was submitted by a single replica
+        scheduled_times = [scheduled_at for _, scheduled_at in runs]
+        assert len(scheduled_times) == len(set(scheduled_times))
+
+    def test_no_overlap_when_connection_dropped(self, pg_engine: Engine) -> None:
+        """Test that a replica taking the lock dropped by the server only runs the jobs once the leader paused."""
+        url = pg_engine.url.set(drivername="postgresql+asyncpg")
+
+        async def _run() -> list[tuple[bool, bool]]:
+            async_engine = create_async_engine(url, poolclass=NullPool)
+            leaders = [SchedulerLeader(AsyncIOScheduler(), async_engine, check_interval=0.2) for _ in range(2)]
+            await leaders[0].start()
+            # Past the takeover delay of the first leader
+            await asyncio.sleep(0.6)
+            assert leaders[0].scheduler.state == STATE_RUNNING
+            await leaders[1].start()
+
+            with pg_engine.connect() as conn:
+                conn.execute(
+                    text(
+                        "SELECT pg_terminate_backend(pid) FROM pg_locks "
+                        "WHERE locktype = 'advisory' AND classid = 1 AND objid = 0 AND granted",
+                    ),
+                )
+
+            states = []
+            for _ in range(200):
+                first, second = (leader.scheduler.state == STATE_RUNNING for leader in leaders)
+                states.append((first, second))
+                await asyncio.sleep(0.01)
+
+            for leader in leaders:
+                await leader.stop()
+                leader.scheduler.shutdown(wait=False)
+            await async_engine.dispose()
+            return states
+
+        states = asyncio.run(_run())
+
+        assert (True, True) not in states
+        assert states[-1] == (False, True)
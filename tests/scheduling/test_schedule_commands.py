@@ -0,0 +1,80 @@
+import asyncio
+import contextlib
+from collections.abc import AsyncGenerator, Callable, Coroutine
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from carpoolerbot.scheduling import handlers
+
+CHAT_ID = -1001234567890
+
+type Command = Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]]
+
+
+@pytest.fixture
+def held_locks(monkeypatch: pytest.MonkeyPatch) -> list[int]:
+    """Replace the chat lock with one recording the chats locked at the moment."""
+    held: list[int] = []
+
+    @contextlib.asynccontextmanager
+    async def _chat_lock(chat_id: int) -> AsyncGenerator[None]:
+        held.append(chat_id)
+        try:
+            yield
+        finally:
+            held.remove(chat_id)
+
+    monkeypatch.setattr(handlers, "chat_lock", _chat_lock)
+    return held
+
+
+def _run_command(command: Command, args: list[str], held_locks: list[int], *, jobs: bool) -> MagicMock:
+    """Run the command, return its job queue, asserting that the jobs are only looked up while the chat is locked."""
+    update = MagicMock()
+    update.effective_message.chat_id = CHAT_ID
+
+    async def _send_message(*_args: object, **_kwargs: object) -> None:
+        assert held_locks == []
+
+    update.effective_chat.send_message = AsyncMock(side_effect=_send_message)
+    context = MagicMock()
+    context.args = args
+
+    def _get_jobs_by_name(_name: str) -> tuple[MagicMock, ...]:
+        assert held_locks == [CHAT_ID]
+        return (MagicMock(),) if jobs else ()
+
+    context.job_queue.get_jobs_by_name.side_effect = _get_jobs_by_name
+
+    asyncio.run(command(update, context))
+
+    update.effective_chat.send_message.assert_awaited_once()
+    return context.job_queue
+
+
+class TestScheduleCommands:
+    """Tests for enable_schedule_cmd and disable_schedule_cmd functions."""
+
+    def test_enable(self, held_locks: list[int]) -> None:
+        """Test that the jobs of the chat are added."""
+        job_queue = _run_command(handlers.enable_schedule_cmd, ["18", "20"], held_locks, jobs=False)
+        assert job_queue.run_custom.call_count == 2
+
+    def test_enable_already_present(self, held_locks: list[int]) -> None:
+        """Test that no job is added when the chat has a schedule, and the answer is sent after the lock."""
+        job_queue = _run_command(handlers.enable_schedule_cmd, ["18", "20"], held_locks, jobs=True)
+        job_queue.run_custom.assert_not_called()
+
+    def test_enable_usage(self, held_locks: list[int]) -> None:
+        """Test that the usage is answered without taking the lock."""
+        job_queue = _run_command(handlers.enable_schedule_cmd, ["18", "evening"], held_locks, jobs=False)
+        job_queue.run_custom.assert_not_called()
+
+    def test_disable(self, held_locks: list[int]) -> None:
+        """Test that the jobs of the chat are removed under the lock."""
+        job_queue = _run_command(handlers.disable_schedule_cmd, [], held_locks, jobs=True)
+        job_queue.get_jobs_by_name.assert_called_once_with(str(CHAT_ID))
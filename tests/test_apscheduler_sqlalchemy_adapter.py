@@ -0,0 +1,257 @@
+import asyncio
+import datetime
+import logging
+import pickle
+from collections.abc import Callable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any
+
+import pytest
+from apscheduler.triggers.cron import CronTrigger
+from apscheduler.util import datetime_to_utc_timestamp
+from sqlalchemy import Engine, create_engine, event, inspect, select, text
+from telegram.ext import Application, CallbackContext, Job
+
+from carpoolerbot.apscheduler_sqlalchemy_adapter import PTBSQLAlchemyJobQueue, PTBSQLAlchemyJobStore
+
+
+async def _scheduled_callback(_context: CallbackContext[Any, Any, Any, Any]) -> None:
+    pass
+
+
+async def _unregistered_callback(_context: CallbackContext[Any, Any, Any, Any]) -> None:
+    pass
+
+
+CALLBACKS = {"scheduled": _scheduled_callback}
+
+type AnyApplication = Application[Any, Any, Any, Any, Any, Any]
+
+
+@pytest.fixture
+def engine(tmp_path: Path) -> Iterator[Engine]:
+    engine = create_engine(f"sqlite:///{tmp_path / 'jobs.sqlite'}")
+    yield engine
+    engine.dispose()
+
+
+def _with_store(engine: Engine, body: Callable[[AnyApplication, PTBSQLAlchemyJobStore], Any]) -> Any:  # noqa: ANN401
+    """Run the body with a paused scheduler using the job store."""
+
+    async def _run() -> Any:  # noqa: ANN401
+        application = Application.builder().token("123:test").updater(None).job_queue(PTBSQLAlchemyJobQueue()).build()
+        assert application.job_queue
+        store = PTBSQLAlchemyJobStore(application=application, callbacks=CALLBACKS, engine=engine)
+        application.job_queue.scheduler.add_jobstore(store)
+        application.job_queue.scheduler.start(paused=True)
+        try:
+            return body(application, store)
+        finally:
+            application.job_queue.scheduler.shutdown(wait=False)
+
+    return asyncio.run(_run())
+
+
+def _schedule(
+    application: AnyApplication,
+    callback: Any = _scheduled_callback,  # noqa: ANN401
+    chat_id: int = -1001234567890,
+) -> Job[Any]:
+    assert application.job_queue
+    return application.job_queue.run_custom(
+        callback,
+        {"trigger": CronTrigger(day_of_week="sun", hour=18)},
+        chat_id=chat_id,
+        name=str(chat_id),
+    )
+
+
+def _stored_state(engine: Engine, store: PTBSQLAlchemyJobStore) -> dict[str, Any]:
+    with engine.connect() as conn:
+        job_state = conn.scalar(select(store.jobs_t.c.job_state))
+
+    assert job_state
+    return pickle.loads(job_state)  # noqa: S301
+
+
+class TestPTBSQLAlchemyJobStore:
+    """Tests for PTBSQLAlchemyJobStore class."""
+
+    def test_registered_callback_is_stored_by_key(self, engine: Engine) -> None:
+        """Test that a registered callback is stored as its key, and restored from it."""
+
+        def _body(application: AnyApplication, store: PTBSQLAlchemyJobStore) -> None:
+            job = _schedule(application)
+
+            state = _stored_state(engine, store)
+            assert state["args"] == (
+                {
+                    "callback": "scheduled",
+                    "name": "-1001234567890",
+                    "data": None,
+                    "chat_id": -1001234567890,
+                    "user_id": None,
+                },
+            )
+            assert "next_run_time" not in state
+
+            restored = store.lookup_job(job.job.id)
+            assert restored is not None
+            restored_job = Job.from_aps_job(restored)
+            assert restored_job.callback is _scheduled_callback
+            assert restored_job.chat_id == -1001234567890
+            assert restored_job.name == "-1001234567890"
+            assert restored.next_run_time == job.next_t
+
+        _with_store(engine, _body)
+
+    def test_unregistered_callback_is_pickled(self, engine: Engine) -> None:
+        """Test that a callback missing from the registry is still stored, pickled as before."""
+
+        def _body(application: AnyApplication, store: PTBSQLAlchemyJobStore) -> None:
+            job = _schedule(application, _unregistered_callback)
+
+            assert _stored_state(engine, store)["args"][-1] is _unregistered_callback
+            restored = store.lookup_job(job.job.id)
+            assert restored is not None
+            assert Job.from_aps_job(restored).callback is _unregistered_callback
+
+        _with_store(engine, _body)
+
+    def test_original_format(self, engine: Engine) -> None:
+        """Test that the rows written in the original format of the adapter are still read."""
+
+        def _body(application: AnyApplication, store: PTBSQLAlchemyJobStore) -> None:
+            job = _schedule(application)
+            state = job.job.__getstate__()
+            state["args"] = ("-1001234567890", None, -1001234567890, None, _scheduled_callback)
+            with engine.begin() as conn:
+                conn.execute(store.jobs_t.update().values(job_state=pickle.dumps(state)))
+
+            restored = store.get_all_jobs()
+            assert len(restored) == 1
+            assert Job.from_aps_job(restored[0]).callback is _scheduled_callback
+            assert restored[0].next_run_time == job.next_t
+
+        _with_store(engine, _body)
+
+    def test_next_run_time_only_update(self, engine: Engine) -> None:
+        """Test that an update only changing the next run time only writes that column."""
+        statements: list[str] = []
+
+        def _body(application: AnyApplication, store: PTBSQLAlchemyJobStore) -> None:
+            job = _schedule(application)
+            aps_job = store.lookup_job(job.job.id)
+            assert aps_job is not None
+            next_run_time = aps_job.next_run_time + datetime.timedelta(days=7)
+            aps_job._modify(next_run_time=next_run_time)  # noqa: SLF001
+
+            event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+            store.update_job(aps_job)
+
+            with engine.connect() as conn:
+                assert conn.scalar(select(store.jobs_t.c.next_run_time)) == datetime_to_utc_timestamp(next_run_time)
+            restored = store.lookup_job(job.job.id)
+            assert restored is not None
+            assert restored.next_run_time == next_run_time
+
+        _with_store(engine, _body)
+
+        updates = [statement for statement in statements if statement.startswith("UPDATE")]
+        assert len(updates) == 1
+        assert "job_state" not in updates[0]
+
+    def test_changed_state_update(self, engine: Engine) -> None:
+        """Test that an update changing more than the next run time writes the whole state."""
+
+        def _body(application: AnyApplication, store: PTBSQLAlchemyJobStore) -> None:
+            job = _schedule(application)
+            job.job.modify(trigger=CronTrigger(day_of_week="sun", hour=20))
+
+            assert str(_stored_state(engine, store)["trigger"]) == "cron[day_of_week='sun', hour='20']"
+
+        _with_store(engine, _body)
+
+    def test_start_loads_jobs_due_soon(self, engine: Engine, caplog: pytest.LogCaptureFixture) -> None:
+        """Test that starting the store only loads the jobs due within the startup horizon."""
+
+        def _body(application: AnyApplication, _store: PTBSQLAlchemyJobStore) -> str:
+            assert application.job_queue
+            application.job_queue.run_once(_scheduled_callback, datetime.timedelta(days=2))
+            return application.job_queue.run_once(_scheduled_callback, datetime.timedelta(minutes=5)).job.id
+
+        due_soon_id = _with_store(engine, _body)
+
+        def _restart(_application: AnyApplication, store: PTBSQLAlchemyJobStore) -> set[str]:
+            return set(store._state_digests)  # noqa: SLF001
+
+        with caplog.at_level(logging.INFO):
+            loaded_ids = _with_store(engine, _restart)
+
+        assert loaded_ids == {due_soon_id}
+        assert "with 2 jobs, 1 due in the next 1:00:00" in caplog.text
+
+    def test_get_jobs_by_name(self, engine: Engine) -> None:
+        """Test that the job queue only reads the jobs with the given name from the store."""
+        statements: list[str] = []
+
+        def _body(application: AnyApplication, _store: PTBSQLAlchemyJobStore) -> None:
+            assert application.job_queue
+            jobs = [_schedule(application), _schedule(application), _schedule(application, chat_id=-1009876543210)]
+
+            event.listen(engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+            found = application.job_queue.get_jobs_by_name("-1001234567890")
+
+            assert sorted(job.job.id for job in found) == sorted(job.job.id for job in jobs[:2])
+            assert application.job_queue.get_jobs_by_name("-1000000000000") == ()
+
+        _with_store(engine, _body)
+
+        assert statements
+        assert all("WHERE apscheduler_jobs.name = ?" in statement for statement in statements)
+
+    def test_name_column_added(self, engine: Engine) -> None:
+        """Test that the name column is added to a table created without it, and filled in."""
+
+        def _body(application: AnyApplication, _store: PTBSQLAlchemyJobStore) -> str:
+            return _schedule(application).job.id
+
+        job_id = _with_store(engine, _body)
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX ix_apscheduler_jobs_name"))
+            conn.execute(text("ALTER TABLE apscheduler_jobs DROP COLUMN name"))
+
+        def _restart(application: AnyApplication, _store: PTBSQLAlchemyJobStore) -> list[str]:
+            assert application.job_queue
+            return [job.job.id for job in application.job_queue.get_jobs_by_name("-1001234567890")]
+
+        assert _with_store(engine, _restart) == [job_id]
+        assert "ix_apscheduler_jobs_name" in {
+            index["name"] for index in inspect(engine).get_indexes("apscheduler_jobs")
+        }
+
+    def test_name_column_added_by_one_replica(self, pg_engine: Engine) -> None:
+        """Test that the replicas starting at the same time on a table without the name column all start."""
+
+        def _body(application: AnyApplication, _store: PTBSQLAlchemyJobStore) -> str:
+            return _schedule(application).job.id
+
+        def _restart(application: AnyApplication, _store: PTBSQLAlchemyJobStore) -> list[str]:
+            assert application.job_queue
+            return [job.job.id for job in application.job_queue.get_jobs_by_name("-1001234567890")]
+
+        with pg_engine.begin() as conn:
+            conn.execute(text("DROP TABLE IF EXISTS apscheduler_jobs"))
+        try:
+            job_id = _with_store(pg_engine, _body)
+            with pg_engine.begin() as conn:
+                conn.execute(text("ALTER TABLE apscheduler_jobs DROP COLUMN name"))
+
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                restarts = list(executor.map(lambda _: _with_store(pg_engine, _restart), range(4)))
+        finally:
+            with pg_engine.begin() as conn:
+                conn.execute(text("DROP TABLE IF EXISTS apscheduler_jobs"))
+
+        assert restarts == [[job_id]] * 4
@@ -0,0 +1,188 @@
+import asyncio
+import functools
+import logging
+import socket
+from pathlib import Path
+
+import httpx
+import pytest
+from sqlalchemy import Engine, create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from carpoolerbot.metrics import (
+    MetricsRegistry,
+    callable_name,
+    counted_statements,
+    db_statements,
+    handler_duration,
+    instrument_engine,
+    registry,
+    start_metrics_server,
+    timed_callback,
+    tracked_queries,
+)
+from carpoolerbot.settings import settings
+
+
+class TestMetricsRegistry:
+    """Tests for MetricsRegistry class."""
+
+    def test_render(self) -> None:
+        """Test that the metrics are rendered in the Prometheus text format."""
+        metrics = MetricsRegistry()
+        counter = metrics.counter("calls_total", "Calls.", ("method",))
+        histogram = metrics.histogram("duration_seconds", "Duration.")
+        counter.inc(method='say "hi"')
+        counter.inc(2, method='say "hi"')
+        histogram.observe(0.003)
+        histogram.observe(0.2)
+        histogram.observe(60)
+
+        rendered = metrics.render()
+
+        assert rendered.startswith(
+            "# HELP calls_total Calls.\n"
+            "# TYPE calls_total counter\n"
+            'calls_total{method="say \\"hi\\""} 3.0\n'
+            "# HELP duration_seconds Duration.\n"
+            "# TYPE duration_seconds histogram\n"
+            'duration_seconds_bucket{le="0.005"} 1\n',
+        )
+        assert 'duration_seconds_bucket{le="0.1"} 1\n' in rendered
+        assert 'duration_seconds_bucket{le="0.25"} 2\n' in rendered
+        assert rendered.endswith(
+            'duration_seconds_bucket{le="10.0"} 2\n'
+            'duration_seconds_bucket{le="+Inf"} 3\n'
+            "duration_seconds_sum 60.203\n"
+            "duration_seconds_count 3\n",
+        )
+
+    def test_duplicate_name(self) -> None:
+        """Test that a metric name cannot be registered twice."""
+        metrics = MetricsRegistry()
+        metrics.counter("calls_total", "Calls.")
+        with pytest.raises(ValueError, match="already registered"):
+            metrics.histogram("calls_total", "Calls.")
+
+
+def test_callable_name() -> None:
+    """Test that functions are named by their qualified name, and other callables by their repr."""
+    partial = functools.partial(int, base=2)
+
+    assert callable_name(test_callable_name) == "test_callable_name"
+    assert callable_name(partial) == repr(partial)
+
+
+def test_timed_callback() -> None:
+    """Test that the calls of a timed callback are observed under its name, also when it raises."""
+
+    @timed_callback
+    async def failing_test_callback() -> None:
+        raise RuntimeError
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing_test_callback())
+
+    assert handler_duration.value(handler=failing_test_callback.__qualname__) == 1
+
+
+def test_tracked_queries(tmp_path: Path) -> None:
+    """Test that the statements are counted under the repository function running them."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.sqlite'}")
+    instrument_engine(engine)
+
+    @tracked_queries
+    async def tracked_test_function() -> None:
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+            conn.execute(text("SELECT 2"))
+
+    asyncio.run(tracked_test_function())
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 3"))
+
+    assert db_statements.value(function=tracked_test_function.__qualname__) == 2
+    assert db_statements.value(function="other") >= 1
+
+
+def test_failed_statement(tmp_path: Path) -> None:
+    """Test that a failed statement leaves no start time behind on its connection."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'metrics.sqlite'}")
+    instrument_engine(engine)
+
+    with engine.connect() as conn:
+        with pytest.raises(OperationalError):
+            conn.execute(text("SELECT * FROM missing_table"))
+        conn.execute(text("SELECT 1"))
+
+        assert isinstance(conn.info["statement_started_at"], float)
+
+
+class TestCountedStatements:
+    """Tests for counted_statements function."""
+
+    @pytest.fixture
+    def engine(self, tmp_path: Path) -> Engine:
+        engine = create_engine(f"sqlite:///{tmp_path / 'statements.sqlite'}")
+        instrument_engine(engine)
+        return engine
+
+    def test_counts_by_function(self, engine: Engine) -> None:
+        """Test that the statements of the block are counted by repository function, not those of an outer block."""
+
+        @tracked_queries
+        async def counted_test_function() -> None:
+            with engine.connect() as conn:
+                conn.execute(text("SELECT 1"))
+
+        with counted_statements("outer") as outer:
+            with counted_statements("inner") as inner, engine.connect() as conn:
+                asyncio.run(counted_test_function())
+                conn.execute(text("SELECT 2"))
+            asyncio.run(counted_test_function())
+
+        assert inner.total == 2
+        assert inner.by_function() == {counted_test_function.__qualname__: 1, "other": 1}
+        assert outer.by_function() == {counted_test_function.__qualname__: 1}
+
+    def test_warnings(self, engine: Engine, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+        """Test that a warning is logged over the budget, and for a statement repeated over the limit."""
+        monkeypatch.setattr(settings, "SQL_STATEMENT_BUDGET", 4)
+        monkeypatch.setattr(settings, "SQL_REPEATED_STATEMENT_LIMIT", 3)
+
+        with caplog.at_level(logging.WARNING), counted_statements("test_handler"), engine.connect() as conn:
+            for user_id in range(4):
+                conn.execute(text("SELECT :user_id"), {"user_id": user_id})
+            conn.execute(text("SELECT 1"))
+
+        assert [record.getMessage() for record in caplog.records] == [
+            "test_handler executed 5 SQL statements, over the budget of 4, by repository function: {'other': 5}",
+            "test_handler executed the same SQL statement 4 times in other, likely an N+1 query: SELECT ?",
+        ]
+
+    def test_within_budget(self, engine: Engine, caplog: pytest.LogCaptureFixture) -> None:
+        """Test that nothing is logged within the budget."""
+        with caplog.at_level(logging.WARNING), counted_statements("test_handler"), engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+
+        assert not caplog.records
+
+
+def test_metrics_server() -> None:
+    """Test that the metrics are served on /metrics."""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+
+    async def _run() -> httpx.Response:
+        server = start_metrics_server(port, "127.0.0.1")
+        try:
+            async with httpx.AsyncClient() as client:
+                return await client.get(f"http://127.0.0.1:{port}/metrics")
+        finally:
+            server.stop()
+
+    response = asyncio.run(_run())
+    assert response.status_code == 200
+    assert response.headers["Content-Type"].startswith("text/plain; version=0.0.4")
+    assert response.text == registry.render()
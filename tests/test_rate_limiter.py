@@ -0,0 +1,144 @@
+import asyncio
+import datetime
+
+import pytest
+from telegram.error import BadRequest, RetryAfter
+
+from carpoolerbot.metrics import telegram_api_calls
+from carpoolerbot.rate_limiter import TokenBucket, TokenBucketRateLimiter
+
+
+async def _process(limiter: TokenBucketRateLimiter, chat_id: int | None) -> None:
+    async def _callback() -> bool:
+        return True
+
+    data = {} if chat_id is None else {"chat_id": chat_id}
+    await limiter.process_request(_callback, (), {}, "sendMessage", data, None)
+
+
+class TestTokenBucket:
+    """Tests for TokenBucket class."""
+
+    def test_burst_then_throttle(self) -> None:
+        """Test that the capacity is handed out at once and then tokens come at the given rate."""
+
+        async def _run() -> float:
+            bucket = TokenBucket(rate=20, capacity=2)
+            start = asyncio.get_running_loop().time()
+            for _ in range(4):
+                await bucket.acquire()
+            return asyncio.get_running_loop().time() - start
+
+        elapsed = asyncio.run(_run())
+        assert 0.09 <= elapsed < 0.5
+
+    def test_pause(self) -> None:
+        """Test that no token is handed out while the bucket is paused."""
+
+        async def _run() -> float:
+            bucket = TokenBucket(rate=100, capacity=1)
+            bucket.pause(0.1)
+            start = asyncio.get_running_loop().time()
+            await bucket.acquire()
+            return asyncio.get_running_loop().time() - start
+
+        assert asyncio.run(_run()) >= 0.09
+
+
+class TestTokenBucketRateLimiter:
+    """Tests for TokenBucketRateLimiter class."""
+
+    def test_same_chat_is_throttled(self) -> None:
+        """Test that requests to the same private chat are spaced out."""
+
+        async def _run() -> float:
+            limiter = TokenBucketRateLimiter(private_chat_max_rate=20)
+            await limiter.initialize()
+            start = asyncio.get_running_loop().time()
+            await asyncio.gather(*(_process(limiter, 1) for _ in range(3)))
+            return asyncio.get_running_loop().time() - start
+
+        assert asyncio.run(_run()) >= 0.09
+
+    def test_different_chats_are_concurrent(self) -> None:
+        """Test that requests to different chats do not wait for each other."""
+
+        async def _run() -> float:
+            limiter = TokenBucketRateLimiter(private_chat_max_rate=1)
+            await limiter.initialize()
+            start = asyncio.get_running_loop().time()
+            await asyncio.gather(*(_process(limiter, chat_id) for chat_id in range(1, 11)))
+            return asyncio.get_running_loop().time() - start
+
+        assert asyncio.run(_run()) < 0.5
+
+    def test_requests_without_chat_are_not_throttled(self) -> None:
+        """Test that e.g. callback query answers are sent right away."""
+
+        async def _run() -> float:
+            limiter = TokenBucketRateLimiter(overall_max_rate=1)
+            await limiter.initialize()
+            start = asyncio.get_running_loop().time()
+            await asyncio.gather(*(_process(limiter, None) for _ in range(10)))
+            return asyncio.get_running_loop().time() - start
+
+        assert asyncio.run(_run()) < 0.5
+
+    def test_retry_after_is_retried(self) -> None:
+        """Test that a RetryAfter error is waited out and the request is sent again."""
+        attempts = 0
+
+        async def _flaky_callback() -> bool:
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise RetryAfter(datetime.timedelta(milliseconds=10))
+            return True
+
+        async def _run() -> object:
+            limiter = TokenBucketRateLimiter()
+            await limiter.initialize()
+            return await limiter.process_request(_flaky_callback, (), {}, "editMessageText", {"chat_id": -1}, None)
+
+        assert asyncio.run(_run()) is True
+        assert attempts == 2
+
+    def test_retry_after_gives_up(self) -> None:
+        """Test that the RetryAfter error is raised once the retries are exhausted."""
+
+        async def _callback() -> bool:
+            raise RetryAfter(datetime.timedelta(milliseconds=1))
+
+        async def _run() -> object:
+            limiter = TokenBucketRateLimiter(max_retries=2)
+            await limiter.initialize()
+            return await limiter.process_request(_callback, (), {}, "sendMessage", {"chat_id": 1}, None)
+
+        with pytest.raises(RetryAfter):
+            asyncio.run(_run())
+
+    def test_calls_are_counted(self) -> None:
+        """Test that every attempt is counted by method and by error class."""
+        attempts = 0
+
+        async def _flaky_callback() -> bool:
+            nonlocal attempts
+            attempts += 1
+            if attempts == 1:
+                raise RetryAfter(datetime.timedelta(milliseconds=1))
+            if attempts == 2:
+                msg = "Message to edit not found"
+                raise BadRequest(msg)
+            return True
+
+        async def _run() -> None:
+            limiter = TokenBucketRateLimiter()
+            await limiter.initialize()
+            with pytest.raises(BadRequest):
+                await limiter.process_request(_flaky_callback, (), {}, "countedMethod", {"chat_id": -1}, None)
+            await limiter.process_request(_flaky_callback, (), {}, "countedMethod", {"chat_id": -1}, None)
+
+        asyncio.run(_run())
+        assert telegram_api_calls.value(method="countedMethod", error="RetryAfter") == 1
+        assert telegram_api_calls.value(method="countedMethod", error="BadRequest") == 1
+        assert telegram_api_calls.value(method="countedMethod", error="") == 1
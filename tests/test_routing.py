@@ -0,0 +1,167 @@
+import asyncio
+import json
+from pathlib import Path
+from typing import Any
+
+import pytest
+from telegram import Bot, Update
+from telegram.ext import (
+    Application,
+    CallbackQueryHandler,
+    CommandHandler,
+    ContextTypes,
+    MessageHandler,
+    PollAnswerHandler,
+    filters,
+)
+
+from carpoolerbot.poll import handlers as poll_handlers
+from carpoolerbot.poll_report import handlers as poll_report_handlers
+from carpoolerbot.routing import IndexedRouter, PrefixCallbackQueryHandler, allowed_updates
+from carpoolerbot.scheduling import handlers as scheduling_handlers
+from carpoolerbot.utils import TypedBaseHandler, version_command_handler
+
+RECORDED_UPDATES: list[dict[str, Any]] = json.loads((Path(__file__).parent / "data" / "updates.json").read_text())
+
+
+async def _noop(_update: Update, _context: ContextTypes.DEFAULT_TYPE) -> None:
+    pass
+
+
+def _bot_handlers() -> list[TypedBaseHandler]:
+    return [
+        *poll_handlers.handlers(),
+        *poll_report_handlers.handlers(),
+        *scheduling_handlers.handlers(),
+        version_command_handler(),
+    ]
+
+
+def _message(text: str, *, command_length: int | None = None) -> dict[str, Any]:
+    message = {
+        "message_id": 1,
+        "date": 1792224000,
+        "chat": {"id": -1001234567890, "type": "supergroup", "title": "Carpool"},
+        "from": {"id": 112233445, "is_bot": False, "first_name": "Alice"},
+        "text": text,
+    }
+    if command_length:
+        message["entities"] = [{"offset": 0, "length": command_length, "type": "bot_command"}]
+    return {"update_id": 1, "message": message}
+
+
+def _linear_dispatch(handlers: list[TypedBaseHandler], update: Update) -> TypedBaseHandler | None:
+    """Return the first matching handler, as PTB does with the handlers of a group."""
+    for handler in handlers:
+        check_result = handler.check_update(update)
+        if check_result is not None and check_result is not False:
+            return handler
+    return None
+
+
+class TestAllowedUpdates:
+    """Tests for allowed_updates function."""
+
+    def test_bot_handlers(self) -> None:
+        """Test that the bot only subscribes to the messages, callback queries and poll answers."""
+        assert allowed_updates(_bot_handlers()) == [
+            Update.CALLBACK_QUERY,
+            Update.EDITED_MESSAGE,
+            Update.MESSAGE,
+            Update.POLL_ANSWER,
+        ]
+
+    def test_unknown_handler(self) -> None:
+        """Test that a handler with unknown update types is rejected rather than silently unsubscribed."""
+        with pytest.raises(TypeError, match="MessageHandler"):
+            allowed_updates([MessageHandler(filters.ALL, _noop)])
+
+
+class TestIndexedRouter:
+    """Tests for IndexedRouter class."""
+
+    @pytest.mark.parametrize(
+        "update_data",
+        [
+            *RECORDED_UPDATES,
+            _message("/poll", command_length=5),
+            _message("/POLL extra args", command_length=5),
+            _message("/poll@carpoolerbot", command_length=18),
+            _message("/poll@otherbot", command_length=14),
+            _message("/unknown", command_length=8),
+            _message("just chatting"),
+            _message("/poll without entities"),
+            {
+                "update_id": 2,
+                "callback_query": {
+                    "id": "1",
+                    "from": {"id": 1, "is_bot": False, "first_name": "Bob"},
+                    "chat_instance": "1",
+                    "data": "daily_msg:unknown",
+                },
+            },
+        ],
+    )
+    def test_same_handler_as_linear_dispatch(self, bot: Bot, update_data: dict[str, Any]) -> None:
+        """Test that the router picks the same handler as checking all of them in order."""
+        handlers = _bot_handlers()
+        router = IndexedRouter(handlers)
+        update = Update.de_json(update_data, bot)
+
+        check_result = router.check_update(update)
+
+        expected = _linear_dispatch(handlers, update)
+        assert (check_result[0] if check_result else None) is expected
+
+    def test_first_matching_handler_wins(self, bot: Bot) -> None:
+        """Test that, as within a group, the first handler registered for a command handles it."""
+        first = CommandHandler("poll", _noop)
+        router = IndexedRouter([first, CommandHandler(["poll", "other"], _noop)])
+
+        check_result = router.check_update(Update.de_json(_message("/poll", command_length=5), bot))
+
+        assert check_result is not None
+        assert check_result[0] is first
+
+    def test_poll_answer(self, bot: Bot) -> None:
+        """Test that poll answers are routed to the poll answer handler."""
+        handler = PollAnswerHandler(_noop)
+        router = IndexedRouter([handler])
+
+        check_result = router.check_update(Update.de_json(RECORDED_UPDATES[1], bot))
+
+        assert check_result is not None
+        assert check_result[0] is handler
+
+    def test_callback_prefix(self, bot: Bot) -> None:
+        """Test that callback queries are routed by the prefix of their data."""
+        handler = PrefixCallbackQueryHandler("daily_msg", _noop)
+        router = IndexedRouter([PrefixCallbackQueryHandler("other", _noop), handler])
+
+        check_result = router.check_update(Update.de_json(RECORDED_UPDATES[3], bot))
+
+        assert check_result is not None
+        assert check_result[0] is handler
+
+    def test_handle_update(self, bot: Bot) -> None:
+        """Test that the routed handler handles the update, with its own additional context."""
+        received_args: list[list[str] | None] = []
+
+        async def _callback(_update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+            received_args.append(context.args)
+
+        router = IndexedRouter([CommandHandler("poll", _callback)])
+        application = Application.builder().bot(bot).updater(None).job_queue(None).build()
+        update = Update.de_json(_message("/poll now please", command_length=5), bot)
+
+        check_result = router.check_update(update)
+        assert check_result is not None
+        context = ContextTypes.DEFAULT_TYPE.from_update(update, application)
+        asyncio.run(router.handle_update(update, application, check_result, context))
+
+        assert received_args == [["now", "please"]]
+
+    def test_unindexable_handler(self) -> None:
+        """Test that handlers which cannot be looked up are rejected."""
+        with pytest.raises(TypeError, match="CallbackQueryHandler"):
+            IndexedRouter([CallbackQueryHandler(_noop)])
@@ -0,0 +1,76 @@
+import logging
+import os
+import subprocess
+import sys
+
+import pytest
+
+import carpoolerbot.main
+from carpoolerbot.startup import PROFILED_IMPORTS, StartupProfile, run, startup_profile
+
+
+def _imported_modules(code: str) -> set[str]:
+    """Return the modules imported by running the code in a new interpreter."""
+    result = subprocess.run(  # noqa: S603
+        [sys.executable, "-c", f"{code}\nimport sys\nprint(' '.join(sys.modules))"],
+        capture_output=True,
+        check=True,
+        env=os.environ,
+        text=True,
+    )
+    return set(result.stdout.split())
+
+
+class TestStartupProfile:
+    """Tests for StartupProfile class."""
+
+    def test_steps_only_recorded_when_enabled(self) -> None:
+        """Test that the steps are recorded and reported only when the profile is enabled."""
+        profile = StartupProfile()
+        with profile.step("disabled step"):
+            pass
+        profile.enabled = True
+        with profile.step("enabled step"):
+            pass
+
+        assert [name for name, _ in profile.steps] == ["enabled step"]
+        lines = profile.report().splitlines()
+        assert lines[0].startswith("enabled step ")
+        assert lines[0].endswith(" ms")
+        assert lines[1].startswith("started in ")
+
+    def test_run(self, monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+        """Test that --startup-profile times the imports before running the bot, which logs the report once started."""
+        monkeypatch.setattr(startup_profile, "steps", [])
+        monkeypatch.setattr(startup_profile, "enabled", False)
+        monkeypatch.setattr(carpoolerbot.main, "main", startup_profile.log_report)
+
+        with caplog.at_level(logging.INFO):
+            run(["--startup-profile"])
+
+        assert [name for name, _ in startup_profile.steps] == [f"import {module}" for module in PROFILED_IMPORTS]
+        assert "import carpoolerbot.main" in caplog.text
+
+
+def test_models_import() -> None:
+    """Test that importing the models, as the Alembic migrations do, does not import the bot nor create the engines."""
+    modules = _imported_modules("import carpoolerbot.database.models")
+
+    assert "carpoolerbot.database.session" not in modules
+    assert "carpoolerbot.main" not in modules
+    assert "telegram" not in modules
+    assert "holidays" not in modules
+
+
+def test_bot_import() -> None:
+    """Test that the holidays are only imported once needed, and then only the configured country."""
+    assert "holidays" not in _imported_modules("import carpoolerbot.main")
+
+    modules = _imported_modules(
+        "import datetime\n"
+        "from carpoolerbot.poll_report.holiday_calendar import get_holiday\n"
+        "get_holiday(datetime.date(2025, 7, 4))",
+    )
+    assert [module for module in modules if module.startswith("holidays.countries.")] == [
+        "holidays.countries.united_states",
+    ]
@@ -0,0 +1,179 @@
+import asyncio
+import json
+import socket
+from collections.abc import AsyncGenerator, Callable, Coroutine
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any
+
+import httpx
+import pytest
+from fake_bot_api import FakeBotApiRequest, FakeBotApiServer
+from pydantic import ValidationError
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from carpoolerbot.main import webhook_options
+from carpoolerbot.settings import RunMode, Settings
+
+RECORDED_UPDATES: list[dict[str, Any]] = json.loads((Path(__file__).parent / "data" / "updates.json").read_text())
+SECRET_TOKEN = "test-secret"  # noqa: S105
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _webhook_settings(**kwargs: Any) -> Settings:  # noqa: ANN401
+    return Settings(
+        RUN_MODE=RunMode.WEBHOOK,
+        WEBHOOK_URL="https://bot.example.com/telegram/webhook",
+        WEBHOOK_LISTEN="127.0.0.1",
+        WEBHOOK_PORT=_free_port(),
+        WEBHOOK_SECRET_TOKEN=SECRET_TOKEN,
+        **kwargs,
+    )
+
+
+@asynccontextmanager
+async def _serve_webhook(
+    config: Settings,
+    callback: Callable[[Update, ContextTypes.DEFAULT_TYPE], Coroutine[Any, Any, None]],
+    bot_api: FakeBotApiServer,
+) -> AsyncGenerator[httpx.AsyncClient]:
+    """Run the webhook of an application handling every update with the callback, yield a client posting to it."""
+    application = (
+        Application.builder()
+        .token("123:test")
+        .request(FakeBotApiRequest(bot_api))
+        .get_updates_request(FakeBotApiRequest(bot_api))
+        .job_queue(None)
+        .concurrent_updates(config.CONCURRENT_UPDATES)
+        .build()
+    )
+    application.add_handler(TypeHandler(Update, callback))
+    options = webhook_options(config)
+
+    async with application:
+        assert application.updater
+        await application.updater.start_webhook(**options, allowed_updates=Update.ALL_TYPES)
+        await application.start()
+        try:
+            async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{options['port']}") as client:
+                yield client
+        finally:
+            await application.updater.stop()
+            await application.stop()
+
+
+async def _post_updates(client: httpx.AsyncClient, updates: list[dict[str, Any]], secret_token: str) -> list[int]:
+    responses = await asyncio.gather(
+        *(
+            client.post(
+                "/telegram/webhook",
+                json=update,
+                headers={"X-Telegram-Bot-Api-Secret-Token": secret_token},
+            )
+            for update in updates
+        ),
+    )
+    return [response.status_code for response in responses]
+
+
+class TestWebhookOptions:
+    """Tests for webhook_options function."""
+
+    def test_url_path_from_webhook_url(self) -> None:
+        """Test that the local server listens on the path of the public URL."""
+        config = _webhook_settings()
+
+        options = webhook_options(config)
+
+        assert options["url_path"] == "/telegram/webhook"
+        assert options["webhook_url"] == "https://bot.example.com/telegram/webhook"
+        assert options["secret_token"] == SECRET_TOKEN
+
+    def test_webhook_mode_requires_secret_token(self) -> None:
+        """Test that the webhook mode cannot be configured without a secret token."""
+        with pytest.raises(ValidationError, match="WEBHOOK_SECRET_TOKEN"):
+            Settings(RUN_MODE=RunMode.WEBHOOK, WEBHOOK_URL="https://bot.example.com/telegram/webhook")
+
+
+class TestWebhookServer:
+    """Tests for the webhook server fed with the recorded updates."""
+
+    def test_recorded_updates_are_handled(self) -> None:
+        """Test that every posted update is parsed and handled, and the webhook is registered with Telegram."""
+        received: list[Update] = []
+        all_received = asyncio.Event()
+        bot_api = FakeBotApiServer()
+        requests: list[tuple[str, dict[str, Any]]] = []
+        bot_api.observers.append(lambda method, params, _time: requests.append((method, params)))
+
+        async def _callback(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+            received.append(update)
+            if len(received) == len(RECORDED_UPDATES):
+                all_received.set()
+
+        async def _run() -> list[int]:
+            async with _serve_webhook(_webhook_settings(), _callback, bot_api) as client:
+                statuses = await _post_updates(client, RECORDED_UPDATES, SECRET_TOKEN)
+                await all_received.wait()
+                return statuses
+
+        statuses = asyncio.run(asyncio.wait_for(_run(), timeout=10))
+
+        assert statuses == [200] * len(RECORDED_UPDATES)
+        assert sorted(update.update_id for update in received) == [update["update_id"] for update in RECORDED_UPDATES]
+        assert received[0].message or received[0].poll_answer or received[0].callback_query
+
+        set_webhook_parameters = next(parameters for endpoint, parameters in requests if endpoint == "setWebhook")
+        assert set_webhook_parameters["url"] == "https://bot.example.com/telegram/webhook"
+        assert set_webhook_parameters["secret_token"] == SECRET_TOKEN
+        assert set_webhook_parameters["max_connections"] == 40
+
+    def test_wrong_secret_token_is_rejected(self) -> None:
+        """Test that updates without the right secret token are not handled."""
+        received: list[Update] = []
+
+        async def _callback(update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+            received.append(update)
+
+        async def _run() -> list[int]:
+            async with _serve_webhook(_webhook_settings(), _callback, FakeBotApiServer()) as client:
+                statuses = await _post_updates(client, RECORDED_UPDATES[:1], "wrong-secret")
+                await asyncio.sleep(0.1)
+                return statuses
+
+        assert asyncio.run(asyncio.wait_for(_run(), timeout=10)) == [403]
+        assert received == []
+
+    def test_concurrent_updates(self) -> None:
+        """Test that a burst of updates is handled concurrently, up to CONCURRENT_UPDATES at a time."""
+        in_flight = 0
+        max_in_flight = 0
+        handled = 0
+        burst = [{**RECORDED_UPDATES[1], "update_id": update_id} for update_id in range(20)]
+        all_handled = asyncio.Event()
+
+        async def _callback(_update: Update, _: ContextTypes.DEFAULT_TYPE) -> None:
+            nonlocal in_flight, max_in_flight, handled
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.05)
+            in_flight -= 1
+            handled += 1
+            if handled == len(burst):
+                all_handled.set()
+
+        async def _run() -> None:
+            config = _webhook_settings(CONCURRENT_UPDATES=4)
+            async with _serve_webhook(config, _callback, FakeBotApiServer()) as client:
+                await _post_updates(client, burst, SECRET_TOKEN)
+                await all_handled.wait()
+
+        asyncio.run(asyncio.wait_for(_run(), timeout=10))
+
+        assert max_in_flight == 4